@@ -0,0 +1,192 @@
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import threading
+import statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'cenozavr'))
+
+from mock_server import CATEGORIES, Catalog, start_server  # noqa: E402
+from sinks import Sink  # noqa: E402
+from log_config import setup_logging  # noqa: E402
+
+
+MODES = ('elements', 'js', 'html', 'network', 'http', 'async')
+ADDRESS = 'Москва, Малая Бронная улица, 32'
+RSS_INTERVAL = 0.2
+
+
+def tree_rss(pid: int) -> int:
+    '''
+    Функция считает память (RSS) процесса и всех его потомков.
+
+    :param pid: int id корневого процесса.
+    :return: int RSS в байтах (0, если /proc недоступен).
+    '''
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as file:
+                ppid = int(file.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as file:
+                for line in file:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return total
+
+
+class RssSampler(threading.Thread):
+    '''
+    Фоновый замер пиковой памяти дерева процессов бенчмарка
+    (python, chromedriver и chrome).
+    '''
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = 0
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.is_set():
+            self.peak = max(self.peak, tree_rss(os.getpid()))
+            self._done.wait(RSS_INTERVAL)
+
+    def stop(self) -> int:
+        self._done.set()
+        self.join()
+        return self.peak
+
+
+def percentile(values: list, share: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+class BenchSink(Sink):
+    '''
+    Приёмник, который считает строки и запоминает время каждой страницы.
+    '''
+
+    def __init__(self):
+        self.rows = 0
+        self.pages = []
+
+    def write_rows(self, rows: list) -> None:
+        self.rows += len(rows)
+        self.pages.append(time.perf_counter())
+
+
+def run_mode(scrapper, mode: str, categories: list, pages: int,
+             headless: bool) -> dict:
+    '''
+    Функция замеряет один режим извлечения на mock сервере.
+
+    :return: dict результаты замера.
+    '''
+    scrapper.METRICS.reset()
+    sampler = RssSampler()
+    sampler.start()
+    sink = BenchSink()
+    start = time.perf_counter()
+    driver = scrapper.create_webdriver(
+        user_agent=scrapper.USER_AGENT, headless=headless, proxy=False,
+        capture_network=mode == 'network')
+    started = time.perf_counter()
+    driver = scrapper.select_delivery_address(driver, ADDRESS)
+    address = time.perf_counter()
+    scrapper.parse_products(driver, categories, pages, mode,
+                            proxy=False, sink=sink)
+    finished = time.perf_counter()
+    peak = sampler.stop()
+    crawl = finished - address
+    latencies = [b - a for a, b in zip([address] + sink.pages, sink.pages)]
+    return {
+        'mode': mode,
+        'pages': len(sink.pages),
+        'products': sink.rows,
+        'pages_per_sec': len(sink.pages) / crawl if crawl else 0.0,
+        'products_per_sec': sink.rows / crawl if crawl else 0.0,
+        'startup_sec': started - start,
+        'address_sec': address - started,
+        'crawl_sec': crawl,
+        'page_p50_sec': statistics.median(latencies) if latencies else 0.0,
+        'page_p95_sec': percentile(latencies, 0.95),
+        'peak_rss_mb': peak / 1024 ** 2,
+        'stages': scrapper.METRICS.summary()['stages'],
+    }
+
+
+def print_table(results: list) -> None:
+    columns = ('mode', 'pages', 'products', 'pages_per_sec',
+               'products_per_sec', 'startup_sec', 'address_sec',
+               'crawl_sec', 'page_p50_sec', 'page_p95_sec', 'peak_rss_mb')
+    print(' | '.join(columns))
+    for result in results:
+        print(' | '.join(
+            f'{result[column]:.2f}' if isinstance(result[column], float)
+            else str(result[column]) for column in columns))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Бенчмарк режимов извлечения на mock сервере')
+    parser.add_argument('--modes', nargs='+', default=list(MODES),
+                        choices=MODES)
+    parser.add_argument('--categories', type=int, default=2,
+                        help='кол-во категорий mock каталога')
+    parser.add_argument('--products', type=int, default=120,
+                        help='кол-во товаров в обычной категории')
+    parser.add_argument('--per-page', type=int, default=24)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='задержка ответа mock сервера, сек.')
+    parser.add_argument('--no-headless', dest='headless',
+                        action='store_false')
+    parser.add_argument('--output', default=None,
+                        help='json файл для результатов')
+    args = parser.parse_args()
+
+    server = start_server(0, args.products, args.per_page, args.latency)
+    os.environ['URL_MAIN'] = f'http://127.0.0.1:{server.server_address[1]}'
+    listener = setup_logging(os.path.join('logs', 'bench.log'))
+    # адрес mock сервера должен быть задан до импорта scrapper
+    scrapper = importlib.import_module('scrapper')
+
+    catalog = Catalog(args.products, args.per_page)
+    selected = CATEGORIES[:args.categories]
+    categories = [name for _, name in selected]
+    # по всем страницам самой короткой категории, без выхода за последнюю
+    pages = min(catalog.page_count(slug) for slug, _ in selected)
+
+    results = []
+    for mode in args.modes:
+        results.append(run_mode(scrapper, mode, categories, pages,
+                                args.headless))
+    server.shutdown()
+    listener.stop()
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
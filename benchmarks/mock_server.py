@@ -0,0 +1,238 @@
+import time
+import argparse
+import threading
+
+from html import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit, parse_qs, unquote
+
+
+CATEGORIES = (
+    ('skidki', 'Товары со скидками'),
+    ('bytovaia-khimiia', 'Бытовая химия'),
+    ('molochnye-produkty', 'Молочные продукты, сыры, яйцо'),
+    ('ovoshchi-i-frukty', 'Овощи и фрукты'),
+)
+DISCOUNT_SLUG = 'skidki'
+BLANK_GIF = (
+    b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04'
+    b'\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D'
+    b'\x01\x00;'
+)
+
+HOME_PAGE = '''<!DOCTYPE html>
+<html lang="ru"><head><meta charset="utf-8"><title>ОКЕЙ</title>
+<style>
+#addressModal {{display: none}}
+#addressModal.open {{display: block}}
+.ui-autocomplete {{display: none}}
+.ui-autocomplete.open {{display: block}}
+</style></head>
+<body>
+<header>
+  <button id="availableReceiptTimeslot">{address}</button>
+</header>
+<div class="cookie-banner">
+  <button onclick="this.parentNode.remove()">Принять</button>
+</div>
+<div id="addressModal">
+  <input id="addressSelectionQuery" autocomplete="off">
+  <ul class="ui-autocomplete"></ul>
+  <button id="addressSelectionButton">Сохранить</button>
+</div>
+<nav class="categories">
+{tiles}
+</nav>
+<script>
+const modal = document.getElementById('addressModal');
+const query = document.getElementById('addressSelectionQuery');
+const suggest = document.querySelector('.ui-autocomplete');
+document.getElementById('availableReceiptTimeslot').onclick = () => {{
+  modal.classList.add('open');
+  query.focus();
+}};
+query.oninput = () => {{
+  suggest.innerHTML = '<li>' + query.value + '</li>';
+  suggest.classList.add('open');
+}};
+document.getElementById('addressSelectionButton').onclick = () => {{
+  document.cookie = 'address=' + encodeURIComponent(query.value) + '; path=/';
+  localStorage.setItem('address', query.value);
+  document.getElementById('availableReceiptTimeslot').textContent =
+    query.value;
+  suggest.classList.remove('open');
+  modal.classList.remove('open');
+}};
+</script>
+</body></html>
+'''
+TILE = '<a href="/msk/{slug}"><div class="tile">{name}</div></a>'
+CATEGORY_PAGE = '''<!DOCTYPE html>
+<html lang="ru"><head><meta charset="utf-8"><title>{name}</title></head>
+<body>
+<header>
+  <button id="availableReceiptTimeslot">{address}</button>
+</header>
+<h1>{name}</h1>
+<div class="product-listing">
+{cards}
+</div>
+<div class="pagination">
+{pages}
+</div>
+</body></html>
+'''
+CARD = '''<div class="product ok-theme">
+  <a href="/msk/{prefix}product-{pid}">{title}</a>
+  <img src="/img/blank.gif"
+       data-src="/wcsstore/OKMarketCAS/cat_entries/{pid}/{pid}_thumbnail.jpg">
+  <script>var product = {{id: "{pid}", category: "{category}"}};</script>
+  <div class="product-price">
+    <span class="old">{full_price} ₽</span><span class="new">{price} ₽</span>
+  </div>
+</div>'''
+
+
+class Catalog:
+    '''
+    Синтетический каталог с разметкой как у okeydostavka.ru.
+
+    Описание:
+        у каждой обычной категории products товаров, категория скидок
+        содержит каждый третий товар остальных категорий (как на сайте,
+        где скидки пересекаются со всеми категориями). Товары
+        показываются по per_page на страницу.
+    '''
+
+    def __init__(self, products: int = 200, per_page: int = 24):
+        self.per_page = per_page
+        self.names = dict(CATEGORIES)
+        self.items = {}
+        regular = [slug for slug, _ in CATEGORIES if slug != DISCOUNT_SLUG]
+        for index, slug in enumerate(regular, 1):
+            self.items[slug] = [
+                (100000 * index + number, slug) for number in range(products)
+            ]
+        self.items[DISCOUNT_SLUG] = [
+            item for slug in regular for item in self.items[slug][::3]
+        ]
+
+    def page_count(self, slug: str) -> int:
+        return max(1, -(-len(self.items[slug]) // self.per_page))
+
+    def page(self, slug: str, page: int) -> list:
+        start = (page - 1) * self.per_page
+        return self.items[slug][start:start + self.per_page]
+
+
+def render_card(pid: int, slug: str, listing: str) -> str:
+    full_price = 100 + pid % 900
+    return CARD.format(
+        prefix='skidki/' if listing == DISCOUNT_SLUG else '',
+        pid=pid,
+        title=f'Товар {pid} {slug}',
+        category=f'{dict(CATEGORIES)[slug]}/Подкатегория {pid % 7}',
+        full_price=f'{full_price},99',
+        price=f'{full_price - pid % 50},49',
+    )
+
+
+def render_pages(page: int, count: int) -> str:
+    links = [f'<a href="?page={number}">{number}</a>'
+             for number in range(1, count + 1)]
+    if page < count:
+        links.append(f'<a class="right_arrow" href="?page={page + 1}">'
+                     '&rsaquo;</a>')
+    return '\n'.join(links)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    catalog = Catalog()
+    latency = 0.0
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlsplit(self.path)
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        address = (unquote(cookie['address'].value) if 'address' in cookie
+                   else 'Выберите адрес доставки')
+        if url.path == '/':
+            tiles = '\n'.join(TILE.format(slug=slug, name=name)
+                              for slug, name in CATEGORIES)
+            self.send_html(HOME_PAGE.format(address=escape(address),
+                                            tiles=tiles))
+        elif url.path == '/img/blank.gif':
+            self.send_body(BLANK_GIF, 'image/gif')
+        elif url.path.startswith('/msk/') and \
+                url.path[5:] in self.catalog.items:
+            self.send_category(url.path[5:], url.query, address)
+        else:
+            self.send_error(404)
+
+    def send_category(self, slug: str, query: str, address: str) -> None:
+        count = self.catalog.page_count(slug)
+        try:
+            page = int(parse_qs(query).get('page', ['1'])[0])
+        except ValueError:
+            page = 1
+        page = min(max(page, 1), count)
+        cards = '\n'.join(render_card(pid, item_slug, slug)
+                          for pid, item_slug in self.catalog.page(slug, page))
+        self.send_html(CATEGORY_PAGE.format(
+            name=self.catalog.names[slug],
+            address=escape(address),
+            cards=cards,
+            pages=render_pages(page, count)))
+
+    def send_html(self, html: str) -> None:
+        self.send_body(html.encode('utf-8'), 'text/html; charset=utf-8')
+
+    def send_body(self, body: bytes, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def start_server(port: int = 0, products: int = 200, per_page: int = 24,
+                 latency: float = 0.0) -> ThreadingHTTPServer:
+    '''
+    Функция запускает mock сервер в фоновом потоке.
+
+    :param port: int порт, 0 - любой свободный.
+    :param products: int кол-во товаров в каждой обычной категории.
+    :param per_page: int кол-во товаров на странице.
+    :param latency: float задержка ответа в секундах.
+    :return: ThreadingHTTPServer сервер, адрес - server.server_address.
+    '''
+    handler = type('Handler', (MockHandler,), {
+        'catalog': Catalog(products, per_page),
+        'latency': latency,
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mock okeydostavka.ru')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--per-page', type=int, default=24)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+    server = start_server(args.port, args.products, args.per_page,
+                          args.latency)
+    print(f'serving on http://127.0.0.1:{server.server_address[1]}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
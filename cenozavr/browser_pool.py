@@ -0,0 +1,224 @@
+import time
+import logging
+import threading
+
+from collections import deque
+from contextlib import contextmanager
+
+from metrics import METRICS
+
+
+logger = logging.getLogger(name=__name__)
+
+POOL_SIZE = 2
+MAX_PAGES = 200
+MAX_AGE = 30 * 60
+LEASE_TIMEOUT = 300
+REFILL_RETRY = 10
+
+
+class PooledBrowser:
+    '''
+    Браузер пула и его счётчики использования.
+
+    Описание:
+        pages - кол-во страниц, обработанных браузером, увеличивается
+        заданием; broken - признак того, что задание завершилось
+        ошибкой и браузер нужно пересоздать.
+    '''
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.created = time.monotonic()
+        self.pages = 0
+        self.jobs = 0
+        self.broken = False
+
+    def expired(self, max_pages: int, max_age: float) -> bool:
+        '''
+        Метод проверяет, пора ли пересоздать браузер.
+
+        :param max_pages: int предельное кол-во страниц.
+        :param max_age: float предельный возраст в секундах.
+        :return: bool True, если один из пределов достигнут.
+        '''
+        return (self.pages >= max_pages
+                or time.monotonic() - self.created >= max_age)
+
+
+class BrowserPool:
+    '''
+    Пул заранее запущенных браузеров с выбранным адресом доставки.
+
+    Описание:
+        фоновый поток поддерживает size браузеров (свободных и выданных),
+        создавая их по одному функцией factory. Задание берёт браузер
+        методом lease и возвращает его по завершении. Возвращённый
+        браузер проверяется функцией health_check; неисправный,
+        отработавший max_pages страниц или старше max_age секунд браузер
+        закрывается функцией destroy, что ограничивает рост памяти
+        Chrome, а поток пополнения создаёт ему замену.
+    '''
+
+    def __init__(self, factory: callable,
+                 size: int = POOL_SIZE,
+                 max_pages: int = MAX_PAGES,
+                 max_age: float = MAX_AGE,
+                 health_check: callable = None,
+                 destroy: callable = None):
+        self.factory = factory
+        self.size = size
+        self.max_pages = max_pages
+        self.max_age = max_age
+        self.health_check = health_check
+        self.destroy = destroy
+        self._idle = deque()
+        self._total = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._refiller = threading.Thread(target=self._refill, daemon=True)
+
+    def start(self) -> 'BrowserPool':
+        '''
+        Метод запускает фоновое пополнение пула.
+
+        :return: BrowserPool этот пул.
+        '''
+        self._refiller.start()
+        return self
+
+    def _refill(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed and self._total >= self.size:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                self._total += 1
+            try:
+                with METRICS.timer('pool_browser_start'):
+                    driver = self.factory()
+            except Exception as e:
+                logger.error(f'browser start failed: {e}', exc_info=True)
+                driver = None
+            with self._cond:
+                if driver is None:
+                    self._total -= 1
+                    self._cond.wait(REFILL_RETRY)
+                    continue
+                if not self._closed:
+                    self._idle.append(PooledBrowser(driver))
+                    self._cond.notify_all()
+                    logger.info(f'browser added to pool: {self.stats()}')
+                    continue
+            self._discard(PooledBrowser(driver))
+
+    def acquire(self, timeout: float = LEASE_TIMEOUT) -> PooledBrowser:
+        '''
+        Метод выдаёт свободный браузер, ожидая его при необходимости.
+
+        :param timeout: float предельное время ожидания в секундах.
+        :return: PooledBrowser браузер пула.
+        '''
+        deadline = time.monotonic() + timeout
+        with METRICS.timer('pool_wait'):
+            while True:
+                with self._cond:
+                    while not self._idle:
+                        remaining = deadline - time.monotonic()
+                        if self._closed:
+                            raise RuntimeError('browser pool is closed')
+                        if remaining <= 0:
+                            raise TimeoutError('no browser available')
+                        self._cond.wait(remaining)
+                    browser = self._idle.popleft()
+                if not browser.expired(self.max_pages, self.max_age):
+                    return browser
+                self._discard(browser)
+
+    def release(self, browser: PooledBrowser) -> None:
+        '''
+        Метод возвращает браузер в пул или пересоздаёт его.
+
+        :param browser: PooledBrowser браузер, полученный через acquire.
+        '''
+        browser.jobs += 1
+        if (browser.broken
+                or browser.expired(self.max_pages, self.max_age)
+                or not self._healthy(browser)):
+            self._discard(browser)
+            return
+        with self._cond:
+            if not self._closed:
+                self._idle.append(browser)
+                self._cond.notify_all()
+                return
+        self._discard(browser)
+
+    @contextmanager
+    def lease(self, timeout: float = LEASE_TIMEOUT):
+        '''
+        Контекстный менеджер выдаёт браузер на время задания.
+
+        :param timeout: float предельное время ожидания браузера.
+        :return: PooledBrowser браузер пула; при исключении в задании
+                 браузер пересоздаётся.
+        '''
+        browser = self.acquire(timeout)
+        try:
+            yield browser
+        except BaseException:
+            browser.broken = True
+            raise
+        finally:
+            self.release(browser)
+
+    def _healthy(self, browser: PooledBrowser) -> bool:
+        if self.health_check is None:
+            return True
+        try:
+            return bool(self.health_check(browser.driver))
+        except Exception as e:
+            logger.warning(f'browser health check failed: {e}')
+            return False
+
+    def _discard(self, browser: PooledBrowser) -> None:
+        # браузер закрывается до пополнения, чтобы не превысить память
+        logger.info(f'recycle browser after {browser.jobs} jobs '
+                    f'and {browser.pages} pages')
+        METRICS.inc('browsers_recycled')
+        if self.destroy is not None:
+            try:
+                self.destroy(browser.driver)
+            except Exception as e:
+                logger.warning(f'browser close failed: {e}')
+        with self._cond:
+            self._total -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        '''
+        Метод возвращает состояние пула.
+
+        :return: dict кол-во свободных и всех браузеров.
+        '''
+        return {'idle': len(self._idle), 'total': self._total}
+
+    def close(self) -> None:
+        '''
+        Метод останавливает пополнение и закрывает свободные браузеры,
+        выданные браузеры закрываются при возврате.
+        '''
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for browser in idle:
+            self._discard(browser)
+
+    def __enter__(self) -> 'BrowserPool':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import logging
+import threading
+
+from urllib.parse import urlsplit
+
+from parsers import parse_links
+
+
+logger = logging.getLogger(name=__name__)
+
+CATEGORY_FILE = 'categories.json'
+CATEGORY_TTL = 24 * 60 * 60
+
+
+def build_category_map(html: str, page_url: str) -> dict:
+    '''
+    Функция собирает названия и адреса категорий с главной страницы.
+
+    :param html: str html главной страницы (с меню категорий).
+    :param page_url: str адрес главной страницы.
+    :return: dict название -> адрес для ссылок с текстом на том же
+             сайте (первая ссылка с данным текстом).
+    '''
+    host = urlsplit(page_url).hostname
+    categories = {}
+    for link in parse_links(html, page_url):
+        url = urlsplit(link['href'])
+        if (not link['text'] or url.hostname != host
+                or url.path.strip('/') == ''):
+            continue
+        categories.setdefault(link['text'], link['href'].split('#')[0])
+    return categories
+
+
+def build_category_tree(urls) -> dict:
+    '''
+    Функция строит дерево подкатегорий по вложенности путей адресов.
+
+    :param urls: адреса категорий.
+    :return: dict адрес -> list адресов прямых подкатегорий (категория
+             верхнего уровня - под ключом '').
+    '''
+    paths = {urlsplit(url).path.rstrip('/'): url for url in urls}
+    tree = {}
+    for path, url in sorted(paths.items()):
+        parent = ''
+        prefix = path
+        while '/' in prefix:
+            prefix = prefix.rsplit('/', 1)[0]
+            if prefix in paths:
+                parent = paths[prefix]
+                break
+        tree.setdefault(parent, []).append(url)
+    return tree
+
+
+class CategoryResolver:
+    '''
+    Кэш адресов категорий сайта.
+
+    Описание:
+        меню категорий разбирается с главной страницы один раз
+        (refresh), карта название -> адрес и дерево подкатегорий
+        сохраняются в файл и используются, пока не устареют (ttl),
+        в том числе последующими запусками и процессами-воркерами.
+        Категории затем открываются прямым переходом по адресу,
+        без загрузки главной страницы и поиска текста в DOM.
+    '''
+
+    def __init__(self, path: str = CATEGORY_FILE,
+                 ttl: float = CATEGORY_TTL,
+                 base_url: str | None = None):
+        self.path = path
+        self.ttl = ttl
+        self.base_url = base_url
+        self.categories = {}
+        self.tree = {}
+        self.saved_at = 0.0
+        self._lock = threading.Lock()
+        self.load()
+
+    def fresh(self) -> bool:
+        '''
+        Метод проверяет, можно ли пользоваться картой категорий.
+
+        :return: bool True, если карта загружена и не устарела.
+        '''
+        return (bool(self.categories)
+                and time.time() - self.saved_at <= self.ttl)
+
+    def load(self) -> bool:
+        '''
+        Метод загружает сохранённую карту категорий.
+
+        :return: bool True, если карта загружена и не устарела.
+        '''
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f'category file {self.path} is broken: {e}')
+            return False
+        if self.base_url and state.get('base_url') != self.base_url:
+            return False
+        with self._lock:
+            self.categories = state.get('categories', {})
+            self.tree = state.get('tree', {})
+            self.saved_at = state.get('saved_at', 0.0)
+        return self.fresh()
+
+    def invalidate(self) -> None:
+        '''
+        Метод удаляет карту категорий, чтобы она была построена заново.
+        '''
+        with self._lock:
+            self.categories = {}
+            self.tree = {}
+            self.saved_at = 0.0
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def save(self) -> None:
+        '''
+        Метод сохраняет карту категорий атомарной заменой файла.
+        '''
+        with self._lock:
+            state = {
+                'saved_at': self.saved_at,
+                'base_url': self.base_url,
+                'categories': self.categories,
+                'tree': self.tree,
+            }
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(state, file, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self, html: str, page_url: str) -> int:
+        '''
+        Метод строит карту категорий по html главной страницы
+        и сохраняет её.
+
+        :param html: str html главной страницы.
+        :param page_url: str адрес главной страницы.
+        :return: int кол-во найденных категорий.
+        '''
+        categories = build_category_map(html, page_url)
+        with self._lock:
+            self.categories = categories
+            self.tree = build_category_tree(set(categories.values()))
+            self.saved_at = time.time()
+        self.save()
+        logger.info(f'category map refreshed: {len(categories)} links')
+        return len(categories)
+
+    def add(self, category: str, url: str) -> None:
+        '''
+        Метод запоминает адрес категории, найденной другим способом.
+
+        :param category: str название категории.
+        :param url: str адрес категории.
+        '''
+        with self._lock:
+            self.categories[category] = url
+            self.tree = build_category_tree(set(self.categories.values()))
+        self.save()
+
+    def resolve(self, category: str) -> str | None:
+        '''
+        Метод определяет адрес категории по названию.
+
+        :param category: str название категории.
+        :return: str адрес категории или None: сначала ищется точное
+                 совпадение названия, затем ссылка, содержащая его.
+        '''
+        with self._lock:
+            if category in self.categories:
+                return self.categories[category]
+            for text, url in self.categories.items():
+                if category in text:
+                    return url
+        return None
+
+    def subcategories(self, url: str = '') -> list:
+        '''
+        Метод возвращает прямые подкатегории.
+
+        :param url: str адрес категории, '' - категории верхнего уровня.
+        :return: list адреса подкатегорий.
+        '''
+        with self._lock:
+            return list(self.tree.get(url, []))
@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import logging
+
+
+logger = logging.getLogger(name=__name__)
+
+CHECKPOINT_FILE = 'checkpoint.json'
+
+
+class Checkpoint:
+    '''
+    Контрольная точка сбора товаров.
+
+    Описание:
+        хранит в json файле обработанные пары (категория, страница),
+        найденное кол-во страниц категорий и кол-во уже записанных
+        строк. Страница отмечается только после
+        того, как её товары переданы в приёмник, файл перезаписывается
+        атомарно, поэтому после сбоя сбор можно продолжить с первой
+        необработанной страницы. Если приёмник ещё не сохранил товары
+        страницы на диск, отметка откладывается (pending) до commit.
+        rows - кол-во строк файла результатов, принадлежащих отмеченным
+        страницам: при продолжении сбора строки после них удаляются
+        (см. sinks.CsvSink), т.к. их страницы собираются заново.
+    '''
+
+    def __init__(self, path: str = CHECKPOINT_FILE, output: str = ''):
+        self.path = path
+        self.output = output
+        self.rows = 0
+        self.done = set()
+        self.page_counts = {}
+        self.pending = []
+        self.resumed = False
+
+    @classmethod
+    def load(cls, path: str = CHECKPOINT_FILE,
+             output: str = '') -> 'Checkpoint':
+        '''
+        Метод загружает контрольную точку из файла.
+
+        :param path: str путь к файлу контрольной точки.
+        :param output: str файл с результатами текущего запуска.
+        :return: Checkpoint контрольная точка (пустая, если файла нет);
+                 resumed - True, если она записана для того же файла
+                 результатов.
+        '''
+        checkpoint = cls(path, output)
+        try:
+            with open(path, encoding='utf-8') as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            logger.info(f'checkpoint {path} not found, start from scratch')
+            return checkpoint
+        if state.get('output') != output:
+            logger.warning(f'checkpoint was written for {state.get("output")}'
+                           f', resuming into {output}')
+        checkpoint.rows = state.get('rows', 0)
+        checkpoint.done = {tuple(item) for item in state.get('done', [])}
+        checkpoint.page_counts = state.get('page_counts', {})
+        checkpoint.resumed = state.get('output') == output
+        logger.info(f'resume: {len(checkpoint.done)} pages and '
+                    f'{checkpoint.rows} rows already done')
+        return checkpoint
+
+    def is_done(self, category: str, page: int) -> bool:
+        '''
+        Метод проверяет, обработана ли страница категории.
+
+        :param category: str название категории.
+        :param page: int номер страницы, считая с 0.
+        :return: bool True, если страница уже обработана.
+        '''
+        return (category, page) in self.done
+
+    def page_limit(self, category: str, pages: int | None) -> int | None:
+        '''
+        Метод определяет, сколько страниц категории нужно обработать.
+
+        :param category: str название категории.
+        :param pages: int кол-во необходимых страниц, None - все.
+        :return: int кол-во страниц с учётом найденного кол-ва страниц
+                 категории или None, если оно неизвестно.
+        '''
+        count = self.page_counts.get(category)
+        if pages is None or count is None:
+            return pages if count is None else count
+        return min(pages, count)
+
+    def next_page(self, category: str, pages: int | None) -> int:
+        '''
+        Метод определяет первую необработанную страницу категории.
+
+        :param category: str название категории.
+        :param pages: int кол-во необходимых страниц, None - все.
+        :return: int номер страницы, равен page_limit, если категория
+                 обработана полностью.
+        '''
+        limit = self.page_limit(category, pages)
+        page = 0
+        while ((limit is None or page < limit)
+               and self.is_done(category, page)):
+            page += 1
+        return page
+
+    def is_complete(self, category: str, pages: int | None) -> bool:
+        '''
+        Метод проверяет, обработана ли категория полностью.
+
+        :param category: str название категории.
+        :param pages: int кол-во необходимых страниц, None - все.
+        :return: bool True, если все страницы категории обработаны.
+        '''
+        limit = self.page_limit(category, pages)
+        return limit is not None and self.next_page(category, pages) >= limit
+
+    def undone_ranges(self, category: str, first: int,
+                      last: int) -> list:
+        '''
+        Метод делит диапазон страниц на части без обработанных страниц.
+
+        :param category: str название категории.
+        :param first: int первая страница диапазона.
+        :param last: int последняя страница не включительно.
+        :return: list пары (первая страница, последняя страница
+                 не включительно) подряд идущих необработанных страниц.
+        '''
+        ranges = []
+        for page in range(first, last):
+            if self.is_done(category, page):
+                continue
+            if ranges and ranges[-1][1] == page:
+                ranges[-1] = (ranges[-1][0], page + 1)
+            else:
+                ranges.append((page, page + 1))
+        return ranges
+
+    def set_page_count(self, category: str, count: int) -> None:
+        '''
+        Метод запоминает кол-во страниц категории.
+
+        :param category: str название категории.
+        :param count: int кол-во страниц категории.
+        '''
+        if self.page_counts.get(category) != count:
+            self.page_counts[category] = count
+            self.save()
+
+    def mark_done(self, category: str, page: int, rows: int,
+                  durable: bool = True) -> None:
+        '''
+        Метод отмечает страницу обработанной и сохраняет файл.
+
+        :param category: str название категории.
+        :param page: int номер страницы, считая с 0.
+        :param rows: int кол-во записанных строк страницы.
+        :param durable: bool товары страницы уже сохранены на диск,
+                        иначе отметка откладывается до commit.
+        '''
+        self.pending.append((category, page, rows))
+        if durable:
+            self.commit()
+
+    def commit(self) -> None:
+        '''
+        Метод отмечает отложенные страницы, товары которых приёмник
+        сохранил на диск, и сохраняет файл.
+        '''
+        if not self.pending:
+            return
+        for category, page, rows in self.pending:
+            self.done.add((category, page))
+            self.rows += rows
+        self.pending = []
+        self.save()
+
+    def save(self) -> None:
+        '''
+        Метод атомарно перезаписывает файл контрольной точки.
+        '''
+        state = {
+            'output': self.output,
+            'updated_at': time.time(),
+            'rows': self.rows,
+            'done': sorted(self.done),
+            'page_counts': self.page_counts,
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(state, file, ensure_ascii=False)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
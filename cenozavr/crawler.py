@@ -0,0 +1,161 @@
+import asyncio
+import logging
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from http_client import PageFetcher
+from metrics import METRICS
+from parsers import (
+    parse_page_source,
+    parse_next_page_url,
+    parse_page_urls,
+    cards_signature
+)
+
+
+logger = logging.getLogger(name=__name__)
+
+MAX_CONCURRENCY = 8
+PER_HOST_CONCURRENCY = 4
+
+
+class AsyncCrawler:
+    '''
+    Асинхронный обход страниц категорий с ограничением параллельности.
+
+    Описание:
+        категории обходятся одновременно. Если по пагинатору первой
+        страницы известны адреса всех страниц, они загружаются
+        параллельно, иначе - последовательно по ссылке на следующую
+        страницу до пустой или повторной страницы. Кол-во
+        одновременных запросов ограничено как в целом, так и для
+        каждого хоста. Загрузка и разбор страниц выполняются в пуле
+        потоков, т.к. PageFetcher работает с блокирующей http-сессией.
+    '''
+
+    def __init__(self, fetcher: PageFetcher,
+                 max_concurrency: int = MAX_CONCURRENCY,
+                 per_host: int = PER_HOST_CONCURRENCY):
+        self.fetcher = fetcher
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self._total = None
+        self._hosts = None
+        self._executor = None
+        self.page_counts = {}
+
+    async def fetch(self, url: str) -> str:
+        '''
+        Метод загружает страницу с учётом ограничений параллельности.
+
+        :param url: str адрес страницы.
+        :return: str html страницы.
+        '''
+        loop = asyncio.get_running_loop()
+        async with self._hosts[urlsplit(url).netloc], self._total:
+            return await loop.run_in_executor(
+                self._executor, self.fetcher.fetch, url)
+
+    async def crawl_category(self, url: str, pages: int | None,
+                             queue: asyncio.Queue,
+                             is_done: callable = None) -> None:
+        '''
+        Метод обходит страницы одной категории.
+
+        :param url: str адрес первой страницы категории.
+        :param pages: int кол-во необходимых страниц, None - все.
+        :param queue: asyncio.Queue очередь для карточек товаров.
+        :param is_done: callable is_done(url категории, номер страницы)
+                        для пропуска уже обработанных страниц.
+        '''
+        loop = asyncio.get_running_loop()
+        category_url = url
+        html = await self.fetch(url)
+        cards = await loop.run_in_executor(
+            self._executor, parse_page_source, html, url)
+        if not (is_done and is_done(category_url, 0)):
+            await queue.put((category_url, 0, cards))
+        urls = parse_page_urls(html, url)
+        if urls is not None:
+            self.page_counts[category_url] = len(urls)
+            await asyncio.gather(*(
+                self.crawl_page(category_url, page, page_url, queue)
+                for page, page_url in enumerate(urls[:pages], 0)
+                if page and not (is_done and is_done(category_url, page))))
+            return
+        page, previous = 0, cards_signature(cards)
+        while pages is None or page + 1 < pages:
+            url = parse_next_page_url(html, url)
+            if url is None:
+                logger.debug('next page dosnt exist')
+                self.page_counts[category_url] = page + 1
+                break
+            page += 1
+            html = await self.fetch(url)
+            cards = await loop.run_in_executor(
+                self._executor, parse_page_source, html, url)
+            if not cards or cards_signature(cards) == previous:
+                logger.info(f'category {category_url} ends at page {page}')
+                self.page_counts[category_url] = page
+                break
+            previous = cards_signature(cards)
+            if not (is_done and is_done(category_url, page)):
+                await queue.put((category_url, page, cards))
+
+    async def crawl_page(self, category_url: str, page: int, url: str,
+                         queue: asyncio.Queue) -> None:
+        '''
+        Метод загружает одну страницу категории по известному адресу.
+
+        :param category_url: str адрес первой страницы категории.
+        :param page: int номер страницы.
+        :param url: str адрес страницы.
+        :param queue: asyncio.Queue очередь для карточек товаров.
+        '''
+        loop = asyncio.get_running_loop()
+        html = await self.fetch(url)
+        cards = await loop.run_in_executor(
+            self._executor, parse_page_source, html, url)
+        if cards:
+            await queue.put((category_url, page, cards))
+        else:
+            logger.info(f'category {category_url} page {page} is empty')
+
+    async def crawl(self, category_urls: list, pages: int | None,
+                    is_done: callable = None):
+        '''
+        Метод обходит категории и по мере загрузки отдаёт карточки
+        товаров постранично.
+
+        :param category_urls: list адреса первых страниц категорий.
+        :param pages: int кол-во необходимых страниц в категории,
+                      None - все страницы.
+        :param is_done: callable is_done(url категории, номер страницы)
+                        для пропуска уже обработанных страниц.
+        :return: асинхронный генератор кортежей (url категории,
+                 номер страницы, список карточек товаров).
+        '''
+        category_urls = list(category_urls)
+        self._total = asyncio.Semaphore(self.max_concurrency)
+        self._hosts = defaultdict(
+            lambda: asyncio.Semaphore(self.per_host))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency)
+        queue = asyncio.Queue()
+        tasks = asyncio.gather(
+            *(self.crawl_category(url, pages, queue, is_done)
+              for url in category_urls),
+            return_exceptions=True)
+        tasks.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while (page := await queue.get()) is not None:
+                yield page
+            for url, result in zip(category_urls, tasks.result()):
+                if isinstance(result, Exception):
+                    METRICS.inc('errors')
+                    logger.error(f'category {url} failed: {result}')
+        finally:
+            tasks.cancel()
+            self._executor.shutdown(wait=False, cancel_futures=True)
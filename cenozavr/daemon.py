@@ -0,0 +1,395 @@
+import json
+import time
+import uuid
+import logging
+import argparse
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import scrapper
+from log_config import LOG_FILE, setup_logging
+from browser_pool import POOL_SIZE, BrowserPool
+
+
+logger = logging.getLogger(name=__name__)
+
+DAEMON_HOST = '127.0.0.1'
+DAEMON_PORT = 8765
+RESULT_TTL = 10 * 60
+MAX_PAGES = 100
+MAX_WAIT = 60
+MAX_POOLS = 4
+JOB_MODES = ('elements', 'js', 'html', 'http', 'async')
+RESULT_FIELDS = ('name', 'url', 'image_url', 'category', 'full_price',
+                 'price')
+
+
+def validate_job(params: dict) -> dict:
+    '''
+    Функция проверяет параметры задания и подставляет значения
+    по умолчанию.
+
+    :param params: dict параметры из тела запроса: address, categories,
+                   pages, mode.
+    :return: dict проверенные параметры.
+    '''
+    address = params.get('address', scrapper.ADDRESS)
+    categories = params.get('categories', list(scrapper.CATEGORIES))
+    pages = params.get('pages', 2)
+    mode = params.get('mode', scrapper.EXTRACTION_MODE)
+    if not isinstance(address, str) or not address.strip():
+        raise ValueError('address must be a non-empty string')
+    if (not isinstance(categories, list) or not categories
+            or not all(isinstance(cat, str) and cat for cat in categories)):
+        raise ValueError('categories must be a non-empty list of strings')
+    if pages is not None and (not isinstance(pages, int)
+                              or not 1 <= pages <= MAX_PAGES):
+        raise ValueError(f'pages must be null (all pages) or an integer '
+                         f'from 1 to {MAX_PAGES}')
+    if mode not in JOB_MODES:
+        raise ValueError(f'mode must be one of {", ".join(JOB_MODES)}')
+    return {'address': address.strip(),
+            'categories': sorted(set(categories)),
+            'pages': pages,
+            'mode': mode}
+
+
+def job_key(params: dict) -> tuple:
+    '''
+    Функция формирует ключ задания для объединения одинаковых заданий.
+
+    :param params: dict проверенные параметры (см. validate_job).
+    :return: tuple ключ задания.
+    '''
+    return (params['address'], tuple(params['categories']),
+            params['pages'], params['mode'])
+
+
+class Job:
+    '''
+    Задание на сбор товаров и его результат.
+    '''
+
+    def __init__(self, params: dict):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.key = job_key(params)
+        self.status = 'queued'
+        self.created = time.time()
+        self.finished = None
+        self.rows = None
+        self.error = None
+        self.done = threading.Event()
+
+    def to_dict(self, rows: bool = True) -> dict:
+        '''
+        Метод формирует ответ API о задании.
+
+        :param rows: bool включить в ответ собранные товары.
+        :return: dict состояние задания.
+        '''
+        result = {
+            'id': self.id,
+            'status': self.status,
+            'params': self.params,
+            'created': self.created,
+            'finished': self.finished,
+            'error': self.error,
+            'products': len(self.rows) if self.rows is not None else None,
+        }
+        if rows and self.rows is not None:
+            result['rows'] = [dict(zip(RESULT_FIELDS, row))
+                              for row in self.rows]
+        return result
+
+
+class JobManager:
+    '''
+    Очередь заданий с объединением одинаковых заданий и кэшем
+    результатов.
+
+    Описание:
+        задание с теми же параметрами, что и выполняемое или ожидающее,
+        не запускается повторно - возвращается уже существующее.
+        Успешный результат отдаётся на повторные запросы в течение ttl
+        секунд, после чего задание удаляется.
+    '''
+
+    def __init__(self, run_job: callable, workers: int = POOL_SIZE,
+                 ttl: float = RESULT_TTL):
+        self.run_job = run_job
+        self.ttl = ttl
+        self._jobs = {}
+        self._by_key = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def submit(self, params: dict) -> tuple:
+        '''
+        Метод ставит задание в очередь.
+
+        :param params: dict проверенные параметры (см. validate_job).
+        :return: tuple (Job задание, bool True, если задание новое).
+        '''
+        key = job_key(params)
+        with self._lock:
+            self._prune()
+            job = self._by_key.get(key)
+            if job is not None and job.status != 'failed':
+                logger.info(f'job {job.id} reused ({job.status})')
+                return job, False
+            job = Job(params)
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+        self._executor.submit(self._run, job)
+        logger.info(f'job {job.id} queued: {params}')
+        return job, True
+
+    def get(self, job_id: str) -> Job | None:
+        '''
+        Метод возвращает задание по id.
+
+        :param job_id: str id задания.
+        :return: Job задание или None.
+        '''
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job) -> None:
+        job.status = 'running'
+        start = time.perf_counter()
+        try:
+            rows = self.run_job(**job.params)
+            error = None if rows is not None else 'scraping failed, see log'
+        except Exception as e:
+            logger.error(f'job {job.id} failed: {e}', exc_info=True)
+            rows, error = None, str(e)
+        job.rows, job.error = rows, error
+        job.status = 'done' if rows is not None else 'failed'
+        job.finished = time.time()
+        job.done.set()
+        logger.info(f'job {job.id} {job.status} in '
+                    f'{time.perf_counter() - start:.2f}s')
+
+    def _prune(self) -> None:
+        now = time.time()
+        for job in list(self._jobs.values()):
+            if job.finished is not None and now - job.finished > self.ttl:
+                del self._jobs[job.id]
+                if self._by_key.get(job.key) is job:
+                    del self._by_key[job.key]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class Scraper:
+    '''
+    Выполняет задания на пулах прогретых браузеров, по одному пулу
+    на адрес доставки.
+
+    Описание:
+        пулов не больше max_pools: для нового адреса закрывается пул,
+        который дольше всех не использовался и не выполняет заданий;
+        если все пулы заняты, задание завершается ошибкой.
+    '''
+
+    def __init__(self, size: int = POOL_SIZE, headless: bool = True,
+                 proxy: bool = True, block_resources: bool = False,
+                 profile: bool = False, max_pools: int = MAX_POOLS):
+        self.size = size
+        self.headless = headless
+        self.proxy = proxy
+        self.block_resources = block_resources
+        self.profile = profile
+        self.max_pools = max_pools
+        self.pools = OrderedDict()
+        self._active = {}
+        self._lock = threading.Lock()
+
+    def _get_pool(self, address: str) -> tuple:
+        # вызывается под self._lock
+        if address in self.pools:
+            self.pools.move_to_end(address)
+            return self.pools[address], None
+        evicted = None
+        if len(self.pools) >= self.max_pools:
+            idle = [key for key in self.pools if not self._active.get(key)]
+            if not idle:
+                raise RuntimeError(f'all {self.max_pools} browser pools '
+                                   'are busy, try later')
+            evicted = self.pools.pop(idle[0])
+            self._active.pop(idle[0], None)
+            logger.info(f'browser pool for {idle[0]} evicted')
+        self.pools[address] = scrapper.create_browser_pool(
+            address, self.size, self.headless, self.proxy,
+            self.block_resources, self.profile)
+        return self.pools[address], evicted
+
+    def pool(self, address: str) -> BrowserPool:
+        '''
+        Метод возвращает пул браузеров адреса, создавая его при
+        необходимости.
+
+        :param address: str адрес доставки.
+        :return: BrowserPool пул браузеров.
+        '''
+        with self._lock:
+            pool, evicted = self._get_pool(address)
+        if evicted is not None:
+            evicted.close()
+        return pool
+
+    def __call__(self, address: str, categories: list, pages: int | None,
+                 mode: str) -> list | None:
+        with self._lock:
+            pool, evicted = self._get_pool(address)
+            self._active[address] = self._active.get(address, 0) + 1
+        if evicted is not None:
+            evicted.close()
+        try:
+            return scrapper.parse_products_pooled(
+                pool, categories, pages, mode, self.proxy)
+        finally:
+            with self._lock:
+                self._active[address] -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {address: pool.stats()
+                    for address, pool in self.pools.items()}
+
+    def close(self) -> None:
+        for pool in self.pools.values():
+            pool.close()
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    '''
+    HTTP API демона:
+        POST /jobs - поставить задание (json: address, categories,
+                     pages, mode), ответ - состояние задания;
+        GET /jobs/<id>?wait=<сек.> - состояние и результат задания,
+                     с ожиданием завершения не дольше wait секунд;
+        GET /health - состояние пулов браузеров.
+    '''
+    manager = None
+    scraper = None
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self) -> None:
+        if urlsplit(self.path).path != '/jobs':
+            self.send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            params = validate_job(json.loads(self.rfile.read(length) or '{}'))
+        except (ValueError, AttributeError) as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        job, created = self.manager.submit(params)
+        self.send_json(202 if created else 200, job.to_dict(rows=False))
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path == '/health':
+            self.send_json(200, {'pools': self.scraper.stats()})
+            return
+        if not url.path.startswith('/jobs/'):
+            self.send_json(404, {'error': 'not found'})
+            return
+        job = self.manager.get(url.path[len('/jobs/'):])
+        if job is None:
+            self.send_json(404, {'error': 'job not found'})
+            return
+        try:
+            wait = float(parse_qs(url.query).get('wait', ['0'])[0])
+        except ValueError:
+            wait = 0
+        job.done.wait(min(max(wait, 0), MAX_WAIT))
+        self.send_json(200, job.to_dict())
+
+    def send_json(self, status: int, data: dict) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(format % args)
+
+
+def serve(host: str = DAEMON_HOST, port: int = DAEMON_PORT,
+          scraper: Scraper | None = None,
+          ttl: float = RESULT_TTL) -> ThreadingHTTPServer:
+    '''
+    Функция создаёт HTTP сервер демона.
+
+    :param host: str адрес, по умолчанию только localhost.
+    :param port: int порт.
+    :param scraper: Scraper исполнитель заданий.
+    :param ttl: float время хранения результатов в секундах.
+    :return: ThreadingHTTPServer сервер, запускается serve_forever.
+    '''
+    scraper = scraper or Scraper()
+    handler = type('Handler', (DaemonHandler,), {
+        'manager': JobManager(scraper, scraper.size, ttl),
+        'scraper': scraper,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main() -> None:
+    '''
+    Функция запускает демон сбора товаров.
+    '''
+    parser = argparse.ArgumentParser(description='Демон парсера')
+    parser.add_argument('--host', default=DAEMON_HOST)
+    parser.add_argument('--port', type=int, default=DAEMON_PORT)
+    parser.add_argument('--pool-size', type=int, default=POOL_SIZE,
+                        help='кол-во браузеров на адрес доставки')
+    parser.add_argument('--max-pools', type=int, default=MAX_POOLS,
+                        help='кол-во адресов доставки с пулом браузеров')
+    parser.add_argument('--ttl', type=float, default=RESULT_TTL,
+                        help='время хранения результатов, сек.')
+    parser.add_argument('--no-headless', dest='headless',
+                        action='store_false')
+    parser.add_argument('--no-proxy', dest='proxy', action='store_false')
+    parser.add_argument('--proxies', default=scrapper.PROXY_FILE,
+                        help='файл со списком proxy servers')
+    parser.add_argument('--block-resources', action='store_true')
+    parser.add_argument('--profile', action='store_true',
+                        help='постоянные профили Chrome с дисковым кэшем')
+    parser.add_argument('--log-file', default=LOG_FILE)
+    args = parser.parse_args()
+    listener = setup_logging(args.log_file)
+    if args.proxy:
+        scrapper.configure_proxies(args.proxies)
+    scraper = Scraper(args.pool_size, args.headless, args.proxy,
+                      args.block_resources, args.profile, args.max_pools)
+    # браузеры для адреса по умолчанию прогреваются сразу
+    scraper.pool(scrapper.ADDRESS)
+    server = serve(args.host, args.port, scraper, args.ttl)
+    logger.info(f'daemon listening on {args.host}:{server.server_port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.RequestHandlerClass.manager.close()
+        scraper.close()
+        listener.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+import os
+import csv
+import math
+import hashlib
+import logging
+import threading
+
+from metrics import METRICS
+from sinks import product_id
+
+
+logger = logging.getLogger(name=__name__)
+
+IMAGE_COLUMN = 2
+MEMBERSHIP_FILE = 'memberships.csv'
+MEMBERSHIP_HEADER = ('product_id', 'category')
+BLOOM_THRESHOLD = 200_000
+BLOOM_CAPACITY = 2_000_000
+BLOOM_ERROR_RATE = 0.001
+
+
+class BloomFilter:
+    '''
+    Фильтр Блума на bytearray.
+
+    Описание:
+        для capacity элементов и доли ложных срабатываний error_rate
+        подбираются размер битового массива и кол-во хэш-функций.
+        Позиции битов получаются двойным хэшированием из одного
+        дайджеста blake2b. Элемент, которого нет в фильтре, может
+        с вероятностью error_rate считаться уже добавленным.
+    '''
+
+    def __init__(self, capacity: int = BLOOM_CAPACITY,
+                 error_rate: float = BLOOM_ERROR_RATE):
+        self.size = max(8, int(-capacity * math.log(error_rate)
+                               / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(str(key).encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        for number in range(self.hashes):
+            yield (first + number * second) % self.size
+
+    def add(self, key) -> bool:
+        '''
+        Метод добавляет элемент.
+
+        :param key: элемент (сравнивается по str).
+        :return: bool True, если элемента не было в фильтре.
+        '''
+        new = False
+        for position in self._positions(key):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                new = True
+        return new
+
+    def __contains__(self, key) -> bool:
+        return all(self.bits[position // 8] & (1 << position % 8)
+                   for position in self._positions(key))
+
+
+class ProductIndex:
+    '''
+    Индекс товаров, уже собранных в этом запуске.
+
+    Описание:
+        товары определяются по id из ссылки на изображение
+        (sinks.product_id), который одинаков для адресов /msk/...
+        и /msk/skidki/... Повторно встреченный товар не записывается,
+        а его принадлежность к ещё одной категории дописывается
+        после каждой страницы в отдельный csv (path) строкой
+        (id товара, категория); append - дописывать в существующий
+        файл при продолжении сбора, товары прерванного запуска
+        добавляются в индекс методом load_products.
+        Пока товаров меньше threshold, id хранятся точно, затем
+        индекс переходит на BloomFilter, который занимает
+        несколько байт на товар, но с вероятностью error_rate
+        принимает новый товар за повторный.
+    '''
+
+    def __init__(self, path: str | None = None,
+                 append: bool = False,
+                 threshold: int = BLOOM_THRESHOLD,
+                 capacity: int = BLOOM_CAPACITY,
+                 error_rate: float = BLOOM_ERROR_RATE):
+        self.path = path
+        self.append = append
+        self.threshold = threshold
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.ids = set()
+        self.bloom = None
+        self.unique = 0
+        self.loaded = 0
+        self.duplicates = 0
+        self.memberships = []
+        self._file = None
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.unique
+
+    def seen(self, pid: int) -> bool:
+        '''
+        Метод проверяет, собран ли уже товар.
+
+        :param pid: int id товара.
+        :return: bool True, если товар уже встречался.
+        '''
+        with self._lock:
+            if self.bloom is not None:
+                return pid in self.bloom
+            return pid in self.ids
+
+    def add(self, pid: int | None, category: str) -> bool:
+        '''
+        Метод отмечает товар собранным.
+
+        :param pid: int id товара или None (товар без id не проверяется).
+        :param category: str категория, в которой встречен товар.
+        :return: bool True, если товар новый и его нужно записать,
+                 False, если это повтор (принадлежность к категории
+                 сохраняется).
+        '''
+        if pid is None:
+            return True
+        with self._lock:
+            if self._insert(pid):
+                self.unique += 1
+                return True
+            self.duplicates += 1
+            self.memberships.append((pid, category))
+        METRICS.inc('duplicates')
+        return False
+
+    def _insert(self, pid: int) -> bool:
+        if self.bloom is not None:
+            return self.bloom.add(pid)
+        new = pid not in self.ids
+        self.ids.add(pid)
+        if len(self.ids) >= self.threshold:
+            self._switch_to_bloom()
+        return new
+
+    def load_products(self, path: str) -> int:
+        '''
+        Метод добавляет в индекс товары, уже записанные в csv файл
+        прерванным запуском.
+
+        :param path: str csv файл с товарами (см. sinks.CsvSink).
+        :return: int кол-во добавленных товаров.
+        '''
+        try:
+            file = open(path, newline='', encoding='utf-8')
+        except FileNotFoundError:
+            return 0
+        loaded = 0
+        with file, self._lock:
+            reader = csv.reader(file)
+            next(reader, None)
+            for row in reader:
+                if len(row) <= IMAGE_COLUMN:
+                    continue
+                pid = product_id(row[IMAGE_COLUMN])
+                if pid is not None and self._insert(pid):
+                    loaded += 1
+            self.loaded += loaded
+        logger.info(f'product index: {loaded} products loaded from {path}')
+        return loaded
+
+    def _switch_to_bloom(self) -> None:
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        for pid in self.ids:
+            bloom.add(pid)
+        self.bloom = bloom
+        self.ids = set()
+        logger.info(f'product index switched to bloom filter: '
+                    f'{len(bloom.bits)} bytes')
+
+    def filter_rows(self, rows: list, category: str) -> list:
+        '''
+        Метод убирает из строк товары, уже собранные в этом запуске,
+        и дописывает принадлежности к категориям в csv файл.
+
+        :param rows: list строки товаров одной страницы (см. make_row).
+        :param category: str категория, в которой встречены товары.
+        :return: list строки новых товаров.
+        '''
+        rows = [row for row in rows
+                if self.add(product_id(row[IMAGE_COLUMN]), category)]
+        self.flush()
+        return rows
+
+    def record(self, memberships: list) -> None:
+        '''
+        Метод добавляет принадлежности к категориям, найденные
+        в другом процессе.
+
+        :param memberships: list пары (id товара, категория).
+        '''
+        with self._lock:
+            self.memberships.extend(memberships)
+            self.duplicates += len(memberships)
+
+    def pop_memberships(self) -> list:
+        '''
+        Метод забирает накопленные принадлежности к категориям.
+
+        :return: list пары (id товара, категория).
+        '''
+        with self._lock:
+            memberships, self.memberships = self.memberships, []
+        return memberships
+
+    def flush(self) -> None:
+        '''
+        Метод дописывает накопленные принадлежности в csv файл;
+        без файла (path=None) они остаются в памяти до pop_memberships.
+        '''
+        if self.path is None:
+            return
+        memberships = self.pop_memberships()
+        if not memberships and self._file is not None:
+            return
+        if self._file is None:
+            header = not (self.append and os.path.exists(self.path))
+            self._file = open(self.path, 'a' if self.append else 'w',
+                              newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
+            if header:
+                self._writer.writerow(MEMBERSHIP_HEADER)
+        self._writer.writerows(memberships)
+        self._file.flush()
+
+    def close(self) -> None:
+        '''
+        Метод записывает оставшиеся принадлежности и закрывает файл.
+        '''
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        logger.info(f'product index: {self.unique} unique, '
+                    f'{self.loaded} loaded, '
+                    f'{self.duplicates} duplicates skipped')
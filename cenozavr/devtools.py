@@ -0,0 +1,202 @@
+import json
+import logging
+
+from collections import Counter
+
+import undetected_chromedriver as uc
+from selenium.common.exceptions import WebDriverException
+
+
+logger = logging.getLogger(name=__name__)
+
+BLOCKED_EXTENSIONS = (
+    'png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'svg', 'ico',
+    'woff', 'woff2', 'ttf', 'otf', 'eot',
+    'mp4', 'webm', 'mp3', 'ogg',
+)
+BLOCKED_DOMAINS = (
+    'google-analytics.com',
+    'googletagmanager.com',
+    'doubleclick.net',
+    'mc.yandex.ru',
+    'an.yandex.ru',
+    'top-fwz1.mail.ru',
+    'vk.com',
+    'facebook.net',
+    'criteo.com',
+    'mindbox.ru',
+    'tiqcdn.com',
+)
+CATALOG_HOSTS = ('okeydostavka.ru',)
+CATALOG_RESOURCE_TYPES = ('Document', 'XHR', 'Fetch')
+CATALOG_MIME_TYPES = ('application/json', 'text/html', 'text/javascript')
+# средний размер ответа по типу ресурса для оценки сэкономленного трафика
+AVERAGE_SIZES = {
+    'Image': 20_000,
+    'Font': 40_000,
+    'Media': 500_000,
+    'Script': 60_000,
+    'Other': 5_000,
+}
+
+
+def blocked_url_patterns(domains: tuple = BLOCKED_DOMAINS) -> list:
+    '''
+    Функция формирует шаблоны адресов для Network.setBlockedURLs.
+
+    :param domains: tuple сторонние домены для блокировки.
+    :return: list шаблоны адресов.
+    '''
+    patterns = [f'*.{ext}' for ext in BLOCKED_EXTENSIONS]
+    patterns += [f'*.{ext}?*' for ext in BLOCKED_EXTENSIONS]
+    patterns += [f'*{domain}*' for domain in domains]
+    return patterns
+
+
+def is_catalog_response(params: dict,
+                        hosts: tuple = CATALOG_HOSTS) -> bool:
+    '''
+    Функция определяет, относится ли ответ к страницам каталога сайта.
+
+    :param params: dict параметры события Network.responseReceived.
+    :param hosts: tuple хосты сайта.
+    :return: bool True для html и json ответов сайта на навигацию
+             и XHR/fetch запросы.
+    '''
+    response = params.get('response', {})
+    return (params.get('type') in CATALOG_RESOURCE_TYPES
+            and any(host in response.get('url', '') for host in hosts)
+            and response.get('mimeType', '') in CATALOG_MIME_TYPES)
+
+
+def enable_blocking(driver: uc.Chrome,
+                    domains: tuple = BLOCKED_DOMAINS) -> None:
+    '''
+    Функция запрещает браузеру загружать изображения, шрифты,
+    медиа и сторонние трекеры.
+
+    :param driver: веб-драйвер для управления браузером.
+    :param domains: tuple сторонние домены для блокировки.
+    '''
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd(
+        'Network.setBlockedURLs', {'urls': blocked_url_patterns(domains)})
+    logger.debug('resource blocking enabled')
+
+
+class NetworkMonitor:
+    '''
+    Учёт сетевых запросов браузера по журналу performance.
+
+    Описание:
+        журнал performance очищается при каждом чтении, поэтому его
+        читает только монитор (метод poll) и отдаёт прочитанные события
+        вызывающему коду. Для учёта браузер должен быть создан
+        с capability goog:loggingPrefs {'performance': 'ALL'}.
+        В режиме capture монитор сохраняет тела html и json ответов
+        сайта (см. is_catalog_response) для разбора без обращения к DOM.
+    '''
+
+    def __init__(self, driver: uc.Chrome, capture: bool = False,
+                 hosts: tuple = CATALOG_HOSTS):
+        self.driver = driver
+        self.capture = capture
+        self.hosts = hosts
+        self.requests = 0
+        self.bytes = 0
+        self.blocked = Counter()
+        self.responses = []
+        self._types = {}
+        self._pending = {}
+
+    def poll(self) -> list:
+        '''
+        Метод читает накопленные события сети.
+
+        :return: list события вида (method, params).
+        '''
+        try:
+            entries = self.driver.get_log('performance')
+        except WebDriverException as e:
+            logger.warning(f'performance log unavailable: {e}')
+            return []
+        events = []
+        for entry in entries:
+            message = json.loads(entry['message'])['message']
+            method = message.get('method', '')
+            params = message.get('params', {})
+            self._count(method, params)
+            events.append((method, params))
+        return events
+
+    def _count(self, method: str, params: dict) -> None:
+        request_id = params.get('requestId')
+        match method:
+            case 'Network.requestWillBeSent':
+                self._types[request_id] = params.get('type') or 'Other'
+            case 'Network.responseReceived':
+                if self.capture and is_catalog_response(params, self.hosts):
+                    response = params['response']
+                    self._pending[request_id] = (
+                        response['url'], response.get('mimeType', ''))
+            case 'Network.loadingFinished':
+                self.requests += 1
+                self.bytes += int(params.get('encodedDataLength') or 0)
+                self._types.pop(request_id, None)
+                if request_id in self._pending:
+                    self._store_body(request_id)
+            case 'Network.loadingFailed':
+                resource = (params.get('type')
+                            or self._types.pop(request_id, 'Other'))
+                self._pending.pop(request_id, None)
+                if params.get('blockedReason'):
+                    self.blocked[resource] += 1
+
+    def _store_body(self, request_id: str) -> None:
+        url, mime = self._pending.pop(request_id)
+        try:
+            body = self.driver.execute_cdp_cmd(
+                'Network.getResponseBody', {'requestId': request_id})
+        except WebDriverException as e:
+            logger.debug(f'response body of {url} unavailable: {e}')
+            return
+        if body.get('base64Encoded'):
+            return
+        self.responses.append((url, mime, body['body']))
+
+    def pop_responses(self) -> list:
+        '''
+        Метод отдаёт перехваченные ответы каталога и очищает их список.
+
+        :return: list ответы вида (url, mime type, тело ответа).
+        '''
+        responses, self.responses = self.responses, []
+        return responses
+
+    def clear(self) -> None:
+        '''
+        Метод учитывает накопленные события и отбрасывает перехваченные
+        ответы, чтобы pop_responses вернул только ответы следующей
+        навигации.
+        '''
+        self.poll()
+        self.responses = []
+        self._pending.clear()
+
+    def summary(self) -> dict:
+        '''
+        Метод возвращает итоги учёта трафика.
+
+        :return: dict кол-во загруженных запросов и байт, кол-во
+                 заблокированных запросов по типам и оценка
+                 сэкономленных байт.
+        '''
+        saved = sum(count * AVERAGE_SIZES.get(resource, AVERAGE_SIZES['Other'])
+                    for resource, count in self.blocked.items())
+        return {
+            'requests': self.requests,
+            'bytes': self.bytes,
+            'blocked_requests': sum(self.blocked.values()),
+            'blocked_by_type': dict(self.blocked),
+            'saved_bytes_estimate': saved,
+        }
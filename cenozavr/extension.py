@@ -2,10 +2,7 @@ import os
 
 
 def proxies(username, password, host, port, path):
-    try:
-        os.mkdir(path)
-    except FileExistsError:
-        pass
+    os.makedirs(path, exist_ok=True)
     manifest_json = """
     {
         "version": "1.0.0",
@@ -58,7 +55,7 @@ def proxies(username, password, host, port, path):
     );
     """ % (host, port, username, password)
 
-    with open(path+"\\manifest.json", 'w') as m_file:
+    with open(os.path.join(path, "manifest.json"), 'w') as m_file:
         m_file.write(manifest_json)
-    with open(path+"\\background.js", 'w') as b_file:
+    with open(os.path.join(path, "background.js"), 'w') as b_file:
         b_file.write(background_js)
@@ -0,0 +1,398 @@
+import time
+import base64
+import asyncio
+import logging
+import threading
+
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+from metrics import METRICS
+from proxy_pool import Proxy, ProxyPool
+
+
+logger = logging.getLogger(name=__name__)
+
+LISTEN_HOST = '127.0.0.1'
+UPSTREAM_POOL_SIZE = 4
+UPSTREAM_IDLE_TTL = 30
+CONNECT_TIMEOUT = 15
+HEADER_TIMEOUT = 30
+BUFFER_SIZE = 64 * 1024
+MAX_ATTEMPTS = 3
+HOP_HEADERS = ('proxy-authorization', 'proxy-connection', 'connection',
+               'keep-alive')
+
+
+class UpstreamError(Exception):
+    '''Не удалось установить соединение через upstream proxy.'''
+
+
+def proxy_authorization(proxy: Proxy) -> str:
+    '''
+    Функция формирует заголовок авторизации на upstream proxy.
+
+    :param proxy: Proxy upstream proxy.
+    :return: str строка заголовка с \\r\\n или пустая строка,
+             если proxy без авторизации.
+    '''
+    if not proxy.user:
+        return ''
+    token = base64.b64encode(
+        f'{proxy.user}:{proxy.password or ""}'.encode()).decode()
+    return f'Proxy-Authorization: Basic {token}\r\n'
+
+
+class ForwardProxy:
+    '''
+    Локальный asyncio forward proxy перед upstream proxy servers.
+
+    Описание:
+        слушает 127.0.0.1 и принимает CONNECT (https) и обычные http
+        запросы с абсолютным адресом. Запросы передаются через текущий
+        upstream proxy с добавлением Proxy-Authorization, поэтому
+        браузеру и http-сессии достаточно --proxy-server без
+        авторизации и расширения Chrome. Для каждого upstream заранее
+        открываются и держатся keep-alive TCP соединения. Upstream,
+        который не отвечает или забанен в пуле, заменяется лучшим
+        из пула. Для каждого запроса считаются отправленные
+        и полученные байты. Без upstream запросы идут напрямую.
+    '''
+
+    def __init__(self, pool: ProxyPool | None = None,
+                 upstream: Proxy | None = None,
+                 host: str = LISTEN_HOST, port: int = 0,
+                 pool_size: int = UPSTREAM_POOL_SIZE):
+        self.pool = pool
+        self.upstream = upstream
+        self.host = host
+        self.port = port
+        self.pool_size = pool_size
+        self.requests = 0
+        self.failures = 0
+        self.rotations = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.hosts = defaultdict(lambda: [0, 0])
+        self._idle = defaultdict(deque)
+        self._refilling = set()
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    def start(self) -> 'ForwardProxy':
+        '''
+        Метод запускает proxy в отдельном потоке со своим event loop.
+
+        :return: ForwardProxy этот proxy, порт - self.port.
+        '''
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        name='forward-proxy', daemon=True)
+        self._thread.start()
+        self._server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._handle, self.host, self.port),
+            self._loop).result()
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.upstream is not None:
+            self._loop.call_soon_threadsafe(self._warm, self.upstream)
+        logger.info(f'forward proxy on {self.url}, upstream '
+                    f'{self.upstream.key if self.upstream else "direct"}')
+        return self
+
+    def stop(self) -> None:
+        '''
+        Метод останавливает proxy и закрывает соединения.
+        '''
+        if self._loop is None:
+            return
+
+        async def shutdown() -> None:
+            self._server.close()
+            for connections in self._idle.values():
+                for _, writer, _ in connections:
+                    writer.close()
+            self._idle.clear()
+            tasks = [task for task in asyncio.all_tasks()
+                     if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+        logger.info(f'forward proxy traffic: {self.summary()}')
+
+    def report(self, ok: bool, latency: float | None = None,
+               challenge: bool = False) -> None:
+        '''
+        Метод учитывает в пуле результат запроса через текущий upstream
+        и заменяет upstream, если тот забанен.
+
+        :param ok: bool запрос выполнен успешно.
+        :param latency: float время ответа в секундах.
+        :param challenge: bool сайт вернул страницу проверки.
+        '''
+        upstream = self.upstream
+        if self.pool is None or upstream is None:
+            return
+        self.pool.report(upstream, ok, latency, challenge)
+        if self.pool.is_banned(upstream) and self.upstream is upstream:
+            self.rotate()
+
+    def rotate(self) -> None:
+        '''
+        Метод переключает proxy на лучший upstream из пула.
+        '''
+        ranked = self.pool.ranked() if self.pool is not None else []
+        if not ranked or ranked[0] is self.upstream:
+            return
+        previous, self.upstream = self.upstream, ranked[0]
+        self.rotations += 1
+        METRICS.inc('proxy_rotations')
+        logger.info(f'upstream rotated: {previous.key if previous else None}'
+                    f' -> {self.upstream.key}')
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._warm, self.upstream)
+
+    def summary(self) -> dict:
+        '''
+        Метод возвращает статистику трафика.
+
+        :return: dict кол-во запросов, ошибок, смен upstream, байт
+                 и трафик по хостам.
+        '''
+        return {
+            'requests': self.requests,
+            'failures': self.failures,
+            'rotations': self.rotations,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'hosts': {host: {'sent': sent, 'received': received}
+                      for host, (sent, received) in self.hosts.items()},
+        }
+
+    def _warm(self, proxy: Proxy) -> None:
+        if proxy.key not in self._refilling:
+            self._refilling.add(proxy.key)
+            self._loop.create_task(self._refill(proxy))
+
+    async def _refill(self, proxy: Proxy) -> None:
+        idle = self._idle[proxy.key]
+        try:
+            while len(idle) < self.pool_size and proxy is self.upstream:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(proxy.host, int(proxy.port)),
+                    CONNECT_TIMEOUT)
+                idle.append((reader, writer, time.monotonic()))
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.warning(f'upstream {proxy.key} warm up failed: {e}')
+            self._report_upstream(proxy, False)
+        finally:
+            self._refilling.discard(proxy.key)
+
+    async def _upstream_connection(self, proxy: Proxy) -> tuple:
+        idle = self._idle[proxy.key]
+        now = time.monotonic()
+        connection = None
+        while idle:
+            reader, writer, created = idle.popleft()
+            if (not reader.at_eof() and not writer.is_closing()
+                    and now - created < UPSTREAM_IDLE_TTL):
+                connection = reader, writer
+                break
+            writer.close()
+        self._warm(proxy)
+        if connection is not None:
+            return connection
+        return await asyncio.wait_for(
+            asyncio.open_connection(proxy.host, int(proxy.port)),
+            CONNECT_TIMEOUT)
+
+    def _candidates(self) -> list:
+        if self.upstream is None:
+            return []
+        if self.pool is not None and self.pool.is_banned(self.upstream):
+            self.rotate()
+        candidates = [self.upstream]
+        if self.pool is not None:
+            candidates += [proxy for proxy in self.pool.ranked()
+                           if proxy is not self.upstream]
+        return candidates[:MAX_ATTEMPTS]
+
+    async def _open(self, host: str, port: int) -> tuple:
+        '''
+        Метод открывает соединение с upstream proxy, при ошибке пробуя
+        следующий по рейтингу, или напрямую с сервером.
+
+        :param host: str хост назначения.
+        :param port: int порт назначения.
+        :return: tuple (reader, writer, Proxy или None без upstream).
+        '''
+        candidates = self._candidates()
+        if not candidates:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), CONNECT_TIMEOUT)
+            return reader, writer, None
+        for proxy in candidates:
+            try:
+                reader, writer = await self._upstream_connection(proxy)
+                return reader, writer, proxy
+            except (OSError, asyncio.TimeoutError) as e:
+                logger.warning(f'upstream {proxy.key} failed: {e}')
+                self._report_upstream(proxy, False)
+        raise UpstreamError(f'{host}:{port}')
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        try:
+            await self._serve(reader, writer)
+        except asyncio.CancelledError:
+            # proxy остановлен, соединение просто закрывается
+            pass
+        finally:
+            writer.close()
+
+    async def _serve(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await asyncio.wait_for(
+                reader.readuntil(b'\r\n\r\n'), HEADER_TIMEOUT)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                asyncio.TimeoutError, ConnectionError):
+            return
+        request_line, *headers = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = request_line.split(' ', 2)
+            if method == 'CONNECT':
+                await self._tunnel(target, reader, writer)
+            else:
+                await self._forward(method, target, version,
+                                    [line for line in headers if line],
+                                    reader, writer)
+        except (UpstreamError, OSError, asyncio.TimeoutError,
+                asyncio.IncompleteReadError, ValueError) as e:
+            self.failures += 1
+            logger.debug(f'proxy request {request_line} failed: {e}')
+            if not writer.is_closing():
+                try:
+                    writer.write(b'HTTP/1.1 502 Bad Gateway\r\n'
+                                 b'Content-Length: 0\r\n\r\n')
+                    await writer.drain()
+                except ConnectionError:
+                    pass
+
+    async def _tunnel(self, target: str,
+                      reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        host, port = target.rsplit(':', 1)
+        start = time.perf_counter()
+        for _ in range(MAX_ATTEMPTS):
+            up_reader, up_writer, proxy = await self._open(host, int(port))
+            if proxy is None:
+                break
+            attempt = time.perf_counter()
+            up_writer.write((f'CONNECT {target} HTTP/1.1\r\n'
+                             f'Host: {target}\r\n'
+                             f'{proxy_authorization(proxy)}\r\n').encode())
+            try:
+                await up_writer.drain()
+                response = await asyncio.wait_for(
+                    up_reader.readuntil(b'\r\n\r\n'), CONNECT_TIMEOUT)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                # keep-alive соединение закрыто upstream, берём новое
+                up_writer.close()
+                continue
+            status = int(response.split(b' ', 2)[1])
+            if status == 200:
+                self._report_upstream(proxy, True,
+                                      time.perf_counter() - attempt)
+                break
+            logger.warning(f'upstream {proxy.key} answered {status}')
+            up_writer.close()
+            self._report_upstream(proxy, False,
+                                  challenge=status in (403, 407, 429))
+            if proxy is self.upstream:
+                self.rotate()
+        else:
+            raise UpstreamError(target)
+        writer.write(b'HTTP/1.1 200 Connection established\r\n\r\n')
+        await writer.drain()
+        sent, received = await asyncio.gather(
+            self._pipe(reader, up_writer), self._pipe(up_reader, writer))
+        self._account(host, sent, received, start)
+
+    async def _forward(self, method: str, target: str, version: str,
+                       headers: list, reader: asyncio.StreamReader,
+                       writer: asyncio.StreamWriter) -> None:
+        url = urlsplit(target)
+        if url.scheme != 'http' or not url.hostname:
+            raise ValueError(f'unsupported request target {target}')
+        # запросы передаются по одному на соединение,
+        # ответ читается до закрытия соединения сервером
+        headers = [line for line in headers
+                   if line.split(':', 1)[0].strip().lower()
+                   not in HOP_HEADERS]
+        length = 0
+        for line in headers:
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value.strip())
+        body = await reader.readexactly(length) if length else b''
+        start = time.perf_counter()
+        up_reader, up_writer, proxy = await self._open(
+            url.hostname, url.port or 80)
+        if proxy is None:
+            target = (url.path or '/') + (f'?{url.query}' if url.query
+                                          else '')
+        request = (f'{method} {target} {version}\r\n'
+                   + ''.join(f'{line}\r\n' for line in headers)
+                   + (proxy_authorization(proxy) if proxy else '')
+                   + 'Connection: close\r\n\r\n').encode('latin-1')
+        up_writer.write(request + body)
+        await up_writer.drain()
+        received = await self._pipe(up_reader, writer)
+        up_writer.close()
+        self._report_upstream(proxy, received > 0, time.perf_counter() - start)
+        self._account(url.hostname, len(request) + len(body),
+                      received, start)
+
+    def _report_upstream(self, proxy: Proxy | None, ok: bool,
+                         latency: float | None = None,
+                         challenge: bool = False) -> None:
+        if self.pool is not None and proxy is not None:
+            self.pool.report(proxy, ok, latency if ok else None, challenge)
+
+    async def _pipe(self, reader: asyncio.StreamReader,
+                    writer: asyncio.StreamWriter) -> int:
+        total = 0
+        try:
+            while data := await reader.read(BUFFER_SIZE):
+                writer.write(data)
+                await writer.drain()
+                total += len(data)
+            if writer.can_write_eof():
+                writer.write_eof()
+        except (ConnectionError, OSError):
+            writer.close()
+        return total
+
+    def _account(self, host: str, sent: int, received: int,
+                 start: float) -> None:
+        self.requests += 1
+        self.bytes_sent += sent
+        self.bytes_received += received
+        self.hosts[host][0] += sent
+        self.hosts[host][1] += received
+        METRICS.inc('proxy_bytes_sent', sent)
+        METRICS.inc('proxy_bytes_received', received)
+        METRICS.observe('proxy_request', time.perf_counter() - start)
+        logger.debug(f'{host}: sent {sent}, received {received} bytes '
+                     f'in {time.perf_counter() - start:.2f}s')
@@ -0,0 +1,107 @@
+import os
+import uuid
+import logging
+import multiprocessing as mp
+
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+
+LOG_FILE = os.path.join('logs', 'cenozavr.log')
+LOG_MAX_BYTES = 10 * 1024 ** 2
+LOG_BACKUPS = 5
+LOG_FORMAT = ('%(asctime)s %(run_id)s %(processName)s %(name)s '
+              '%(levelname)s %(message)s')
+
+_config = None
+
+
+class RunIdFilter(logging.Filter):
+    '''
+    Фильтр добавляет в каждую запись id запуска.
+    '''
+
+    def __init__(self, run_id: str):
+        super().__init__()
+        self.run_id = run_id
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.run_id = self.run_id
+        return True
+
+
+def new_run_id() -> str:
+    '''
+    Функция создаёт короткий id запуска.
+
+    :return: str id запуска.
+    '''
+    return uuid.uuid4().hex[:8]
+
+
+def _install_queue_handler(log_queue, run_id: str, level: int) -> None:
+    handler = QueueHandler(log_queue)
+    handler.addFilter(RunIdFilter(run_id))
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def setup_logging(path: str = LOG_FILE,
+                  level: int = logging.INFO,
+                  run_id: str | None = None,
+                  max_bytes: int = LOG_MAX_BYTES,
+                  backups: int = LOG_BACKUPS) -> QueueListener:
+    '''
+    Функция настраивает неблокирующее логирование запуска.
+
+    :param path: str файл журнала.
+    :param level: int уровень логирования.
+    :param run_id: str id запуска, по умолчанию создаётся новый.
+    :param max_bytes: int размер файла, после которого он ротируется.
+    :param backups: int кол-во хранимых старых файлов.
+    :return: QueueListener запущенный слушатель, по завершении
+             запуска его нужно остановить методом stop.
+
+    Описание:
+        записи всех модулей через QueueHandler корневого логгера
+        попадают в очередь multiprocessing, а в файл с ротацией
+        по размеру их пишет фоновый поток QueueListener. Процессы-
+        воркеры подключаются к той же очереди (см. configure_worker),
+        поэтому файл пишет только один процесс, а id запуска
+        и имя процесса есть в каждой строке.
+    '''
+    global _config
+    run_id = run_id or new_run_id()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    file_handler = RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_queue = mp.Queue(-1)
+    listener = QueueListener(log_queue, file_handler,
+                             respect_handler_level=True)
+    listener.start()
+    _install_queue_handler(log_queue, run_id, level)
+    _config = (log_queue, run_id, level)
+    return listener
+
+
+def worker_config() -> tuple | None:
+    '''
+    Функция возвращает настройки логирования для процесса-воркера.
+
+    :return: tuple (очередь, id запуска, уровень) или None,
+             если setup_logging не вызывалась.
+    '''
+    return _config
+
+
+def configure_worker(config: tuple | None) -> None:
+    '''
+    Функция направляет логи процесса-воркера в очередь родителя.
+
+    :param config: tuple результат worker_config родительского процесса.
+    '''
+    if config is not None:
+        _install_queue_handler(*config)
@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import threading
+
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+METRICS_FILE = 'metrics.json'
+PROMETHEUS_FILE = 'metrics.prom'
+PROMETHEUS_PREFIX = 'cenozavr'
+COUNTERS = ('products', 'pages', 'retries', 'errors')
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _write_atomic(path: str, text: str) -> None:
+    # textfile collector не должен видеть недописанный файл
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    os.replace(tmp_path, path)
+
+
+class Metrics:
+    '''
+    Счётчики и гистограммы длительности этапов сбора.
+
+    Описание:
+        этапы (запуск браузера, шаги выбора адреса, открытие категории,
+        ожидание карточек, извлечение, переход на следующую страницу,
+        паузы) измеряются контекстным менеджером timer, для каждого
+        этапа хранится гистограмма с границами LATENCY_BUCKETS.
+        Снимки метрик процессов-воркеров объединяются в родительском
+        процессе методом merge. Методы потокобезопасны.
+    '''
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        '''
+        Метод обнуляет все метрики и время начала запуска.
+        '''
+        with self._lock:
+            self.started = time.time()
+            self.counters = dict.fromkeys(COUNTERS, 0)
+            self.stages = {}
+
+    def inc(self, name: str, value: int = 1) -> None:
+        '''
+        Метод увеличивает счётчик.
+
+        :param name: str название счётчика.
+        :param value: int величина увеличения.
+        '''
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def _stage(self, stage: str) -> dict:
+        if stage not in self.stages:
+            self.stages[stage] = {
+                'count': 0, 'sum': 0.0, 'max': 0.0,
+                'buckets': [0] * len(self.buckets),
+            }
+        return self.stages[stage]
+
+    def observe(self, stage: str, seconds: float) -> None:
+        '''
+        Метод добавляет длительность этапа в его гистограмму.
+
+        :param stage: str название этапа.
+        :param seconds: float длительность в секундах.
+        '''
+        with self._lock:
+            histogram = self._stage(stage)
+            histogram['count'] += 1
+            histogram['sum'] += seconds
+            histogram['max'] = max(histogram['max'], seconds)
+            index = bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                histogram['buckets'][index] += 1
+
+    @contextmanager
+    def timer(self, stage: str):
+        '''
+        Контекстный менеджер измеряет длительность этапа.
+
+        :param stage: str название этапа.
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        '''
+        Метод возвращает копию метрик для передачи между процессами.
+
+        :return: dict счётчики и гистограммы этапов.
+        '''
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'stages': {stage: dict(histogram,
+                                       buckets=list(histogram['buckets']))
+                           for stage, histogram in self.stages.items()},
+            }
+
+    def merge(self, snapshot: dict) -> None:
+        '''
+        Метод добавляет метрики из снимка другого процесса.
+
+        :param snapshot: dict результат snapshot.
+        '''
+        with self._lock:
+            for name, value in snapshot['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for stage, other in snapshot['stages'].items():
+                histogram = self._stage(stage)
+                histogram['count'] += other['count']
+                histogram['sum'] += other['sum']
+                histogram['max'] = max(histogram['max'], other['max'])
+                histogram['buckets'] = [
+                    a + b for a, b in zip(histogram['buckets'],
+                                          other['buckets'])]
+
+    def summary(self) -> dict:
+        '''
+        Метод формирует итог запуска.
+
+        :return: dict время запуска, счётчики и для каждого этапа
+                 кол-во, суммарное, среднее и максимальное время
+                 и накопленные значения гистограммы.
+        '''
+        snapshot = self.snapshot()
+        stages = {}
+        for stage, histogram in sorted(snapshot['stages'].items()):
+            count = histogram['count']
+            cumulative, total = {}, 0
+            for bound, value in zip(self.buckets, histogram['buckets']):
+                total += value
+                cumulative[str(bound)] = total
+            cumulative['+Inf'] = count
+            stages[stage] = {
+                'count': count,
+                'sum_sec': round(histogram['sum'], 4),
+                'mean_sec': round(histogram['sum'] / count, 4)
+                if count else 0.0,
+                'max_sec': round(histogram['max'], 4),
+                'buckets': cumulative,
+            }
+        return {
+            'started_at': self.started,
+            'duration_sec': round(time.time() - self.started, 4),
+            'counters': snapshot['counters'],
+            'stages': stages,
+        }
+
+    def write_json(self, path: str = METRICS_FILE) -> None:
+        '''
+        Метод сохраняет итог запуска в json файл.
+
+        :param path: str путь к файлу.
+        '''
+        _write_atomic(path, json.dumps(self.summary(), ensure_ascii=False,
+                                       indent=2))
+
+    def to_prometheus(self, prefix: str = PROMETHEUS_PREFIX) -> str:
+        '''
+        Метод формирует метрики в текстовом формате Prometheus.
+
+        :param prefix: str префикс названий метрик.
+        :return: str текст для node_exporter textfile collector.
+        '''
+        summary = self.summary()
+        lines = []
+        for name, value in sorted(summary['counters'].items()):
+            lines += [f'# TYPE {prefix}_{name}_total counter',
+                      f'{prefix}_{name}_total {value}']
+        lines += [f'# TYPE {prefix}_run_duration_seconds gauge',
+                  f'{prefix}_run_duration_seconds '
+                  f'{summary["duration_sec"]}',
+                  f'# TYPE {prefix}_last_run_timestamp_seconds gauge',
+                  f'{prefix}_last_run_timestamp_seconds '
+                  f'{int(time.time())}']
+        metric = f'{prefix}_stage_seconds'
+        lines.append(f'# TYPE {metric} histogram')
+        for stage, histogram in summary['stages'].items():
+            label = f'stage="{stage}"'
+            for bound, value in histogram['buckets'].items():
+                lines.append(
+                    f'{metric}_bucket{{{label},le="{bound}"}} {value}')
+            lines += [f'{metric}_sum{{{label}}} {histogram["sum_sec"]}',
+                      f'{metric}_count{{{label}}} {histogram["count"]}']
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str = PROMETHEUS_FILE) -> None:
+        '''
+        Метод атомарно сохраняет метрики в textfile Prometheus.
+
+        :param path: str путь к файлу (обычно в каталоге
+                     --collector.textfile.directory).
+        '''
+        _write_atomic(path, self.to_prometheus())
+
+
+METRICS = Metrics()
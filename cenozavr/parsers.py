@@ -0,0 +1,400 @@
+import re
+import json
+import math
+
+from collections import defaultdict
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit, parse_qsl, urlencode
+
+
+CATEGORY_PATTERN = r'category: "([^"]+)"'
+CARD_CLASSES = {'product', 'ok-theme'}
+JSON_NAME_KEYS = ('name', 'productName', 'title')
+JSON_ID_KEYS = ('productId', 'uniqueID', 'partNumber', 'id')
+JSON_URL_KEYS = ('url', 'href', 'productUrl', 'seoUrl')
+JSON_IMAGE_KEYS = ('thumbnail', 'image', 'imageUrl', 'fullImage')
+JSON_CATEGORY_KEYS = ('category', 'categoryName', 'categoryPath')
+JSON_FULL_PRICE_KEYS = ('listPrice', 'regularPrice', 'oldPrice')
+JSON_PRICE_KEYS = ('offerPrice', 'salePrice', 'discountPrice', 'price')
+PAGE_PARAMS = ('page', 'beginIndex', 'pageNumber', 'offset', 'start')
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr'
+}
+
+
+class ProductCardParser(HTMLParser):
+    '''
+    Парсер карточек товаров из html страницы категории.
+
+    Описание:
+        собирает из каждой карточки '.product.ok-theme' те же поля,
+        что и извлечение через веб-драйвер: текст и ссылку первого <a>,
+        атрибут data-src первого <img>, содержимое первого <script>
+        и текст span-ов внутри '.product-price'.
+    '''
+
+    def __init__(self, page_url: str):
+        super().__init__(convert_charrefs=True)
+        self.page_url = page_url
+        self.cards = []
+        self._card = None
+        self._depth = 0
+        self._card_depth = None
+        self._in_link = False
+        self._link_depth = None
+        self._in_script = False
+        self._script_seen = False
+        self._price_depth = None
+        self._open_spans = []
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        attrs = dict(attrs)
+        if tag not in VOID_TAGS:
+            self._depth += 1
+        classes = set((attrs.get('class') or '').split())
+        if self._card is None:
+            if CARD_CLASSES <= classes and tag not in VOID_TAGS:
+                self._start_card()
+            return
+        card = self._card
+        if tag == 'a' and card['href'] is None:
+            card['href'] = urljoin(self.page_url, attrs.get('href') or '')
+            self._in_link = True
+            self._link_depth = self._depth
+        elif tag == 'img' and card['data_src'] is None:
+            card['data_src'] = attrs.get('data-src') or ''
+        elif tag == 'script' and not self._script_seen:
+            self._in_script = True
+        elif 'product-price' in classes and card['prices'] is None:
+            card['prices'] = []
+            self._price_depth = self._depth
+        elif tag == 'span' and self._price_depth is not None:
+            card['prices'].append('')
+            self._open_spans.append(len(card['prices']) - 1)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in VOID_TAGS:
+            return
+        if self._card is not None:
+            if tag == 'script' and self._in_script:
+                self._in_script = False
+                self._script_seen = True
+            elif tag == 'span' and self._open_spans:
+                self._open_spans.pop()
+            if self._in_link and self._depth == self._link_depth:
+                self._in_link = False
+            if self._depth == self._price_depth:
+                self._price_depth = None
+                self._open_spans = []
+            if self._depth == self._card_depth:
+                self._finish_card()
+        self._depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        if self._card is None:
+            return
+        if self._in_script:
+            self._card['script'] += data
+            return
+        if self._in_link:
+            self._card['name'] += data
+        for index in self._open_spans:
+            self._card['prices'][index] += data
+
+    def _start_card(self) -> None:
+        self._card = {
+            'name': '', 'href': None, 'data_src': None,
+            'script': '', 'prices': None
+        }
+        self._card_depth = self._depth
+        self._script_seen = False
+
+    def _finish_card(self) -> None:
+        card = self._card
+        prices = card['prices'] or []
+        match = re.search(CATEGORY_PATTERN, card['script'])
+        self.cards.append({
+            'name': ' '.join(card['name'].split()),
+            'href': card['href'] or '',
+            'data_src': card['data_src'] or '',
+            'category': match.group(1) if match else None,
+            'full_price': prices[0] if len(prices) > 0 else '',
+            'price': prices[1] if len(prices) > 1 else '',
+        })
+        self._card = None
+        self._card_depth = None
+        self._in_link = False
+        self._in_script = False
+        self._price_depth = None
+        self._open_spans = []
+
+
+def parse_page_source(html: str, page_url: str) -> list:
+    '''
+    Функция разбирает html страницы категории без браузера.
+
+    :param html: str html страницы (driver.page_source или сохранённый файл).
+    :param page_url: str адрес страницы для разрешения относительных ссылок.
+    :return: list карточки товаров в виде словарей с ключами
+             name, href, data_src, category, full_price, price.
+    '''
+    parser = ProductCardParser(page_url)
+    parser.feed(html)
+    parser.close()
+    return parser.cards
+
+
+class LinkParser(HTMLParser):
+    '''
+    Парсер ссылок страницы.
+
+    Описание:
+        собирает для каждого <a> адрес, текст и признак того,
+        что ссылка является (или содержит) стрелкой 'right_arrow'
+        перехода на следующую страницу.
+    '''
+
+    def __init__(self, page_url: str):
+        super().__init__(convert_charrefs=True)
+        self.page_url = page_url
+        self.links = []
+        self._open = []
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        attrs = dict(attrs)
+        classes = (attrs.get('class') or '').split()
+        if tag == 'a':
+            self._open.append({
+                'href': urljoin(self.page_url, attrs.get('href') or ''),
+                'has_href': bool(attrs.get('href')),
+                'text': '',
+                'next': False
+            })
+        if 'right_arrow' in classes and self._open:
+            self._open[-1]['next'] = True
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == 'a' and self._open:
+            link = self._open.pop()
+            link['text'] = ' '.join(link['text'].split())
+            if link['has_href']:
+                self.links.append(link)
+
+    def handle_data(self, data: str) -> None:
+        for link in self._open:
+            link['text'] += data
+
+
+def parse_links(html: str, page_url: str) -> list:
+    '''
+    Функция собирает ссылки страницы.
+
+    :param html: str html страницы.
+    :param page_url: str адрес страницы для разрешения относительных ссылок.
+    :return: list словари с ключами href, text, next.
+    '''
+    parser = LinkParser(page_url)
+    parser.feed(html)
+    parser.close()
+    return parser.links
+
+
+def find_category_url(html: str, page_url: str, category: str) -> str | None:
+    '''
+    Функция ищет ссылку на категорию по её названию.
+
+    :param html: str html главной страницы.
+    :param page_url: str адрес главной страницы.
+    :param category: str название категории.
+    :return: str адрес категории или None.
+    '''
+    for link in parse_links(html, page_url):
+        if category in link['text']:
+            return link['href']
+    return None
+
+
+def parse_next_page_url(html: str, page_url: str) -> str | None:
+    '''
+    Функция ищет адрес следующей страницы категории.
+
+    :param html: str html страницы категории.
+    :param page_url: str адрес страницы категории.
+    :return: str адрес следующей страницы или None, если её нет.
+    '''
+    for link in parse_links(html, page_url):
+        if link['next'] and link['href'] != page_url:
+            return link['href']
+    return None
+
+
+def set_query_param(url: str, name: str, value) -> str:
+    '''
+    Функция задаёт параметр запроса в адресе.
+
+    :param url: str адрес.
+    :param name: str имя параметра.
+    :param value: значение параметра.
+    :return: str адрес с параметром (прежнее значение заменяется).
+    '''
+    parts = urlsplit(url)
+    query = [(key, item) for key, item in parse_qsl(parts.query)
+             if key != name]
+    query.append((name, str(value)))
+    return parts._replace(query=urlencode(query), fragment='').geturl()
+
+
+def parse_page_urls(html: str, page_url: str) -> list | None:
+    '''
+    Функция строит адреса всех страниц категории по её пагинатору.
+
+    :param html: str html первой страницы категории.
+    :param page_url: str адрес первой страницы категории.
+    :return: list адреса страниц по порядку (первый - page_url)
+             или None, если пагинатор не найден.
+
+    Описание:
+        параметром страниц считается целочисленный параметр запроса
+        ссылок на ту же страницу: номер страницы (page=2, с 1)
+        или смещение (beginIndex=24, с 0, шаг - наибольший общий
+        делитель значений). Значения, совпадающие со значением
+        параметра в page_url (например, orderBy=2 во всех ссылках),
+        не учитываются. Из оставшихся параметров выбирается известный
+        параметр страниц (PAGE_PARAMS), затем параметр с наибольшим
+        кол-вом разных значений, при равенстве - первый по имени.
+        Кол-во страниц определяется по наибольшему значению (ссылке
+        на последнюю страницу).
+    '''
+    base = urlsplit(page_url)
+    fixed = dict(parse_qsl(base.query))
+    values = defaultdict(set)
+    for link in parse_links(html, page_url):
+        url = urlsplit(link['href'])
+        if (url.netloc != base.netloc
+                or url.path.rstrip('/') != base.path.rstrip('/')):
+            continue
+        for name, value in parse_qsl(url.query):
+            if value.isdigit() and value != fixed.get(name):
+                values[name].add(int(value))
+    if not values:
+        return None
+    param = max(sorted(values), key=lambda name: (
+        name in PAGE_PARAMS, len(values[name])))
+    numbers = sorted(values[param])
+    if numbers[0] in (1, 2):
+        step, first = 1, 1
+    else:
+        step, first = math.gcd(*numbers), 0
+    if not step:
+        return None
+    count = (numbers[-1] - first) // step + 1
+    return [page_url] + [set_query_param(page_url, param, first + page * step)
+                         for page in range(1, count)]
+
+
+def cards_signature(cards: list) -> tuple:
+    '''
+    Функция формирует отпечаток страницы по ссылкам её товаров.
+
+    :param cards: list карточки товаров (см. parse_page_source).
+    :return: tuple ссылки товаров; одинаковые отпечатки соседних
+             страниц означают, что сайт вернул ту же страницу.
+    '''
+    return tuple(card['href'] for card in cards)
+
+
+def _first(item: dict, keys: tuple):
+    for key in keys:
+        if item.get(key) not in (None, ''):
+            return item[key]
+    return None
+
+
+def format_price(value) -> str:
+    '''
+    Функция приводит цену из json к виду текста цены на странице.
+
+    :param value: цена числом или строкой.
+    :return: str цена вида '168,99 ₽'.
+    '''
+    if isinstance(value, dict):
+        value = _first(value, ('value', 'amount', 'price'))
+    try:
+        number = float(str(value).replace(',', '.').replace(' ', ''))
+    except ValueError:
+        return ''
+    return f'{number:.2f}'.replace('.', ',') + ' ₽'
+
+
+def _json_card(item: dict, page_url: str) -> dict | None:
+    name = _first(item, JSON_NAME_KEYS)
+    price = _first(item, JSON_PRICE_KEYS)
+    pid = _first(item, JSON_ID_KEYS)
+    image = _first(item, JSON_IMAGE_KEYS)
+    if not isinstance(image, str):
+        image = ''
+    if not isinstance(name, str) or price is None or not (pid or image):
+        return None
+    full_price = _first(item, JSON_FULL_PRICE_KEYS)
+    if image.startswith('http'):
+        image = urlsplit(image).path
+    url = _first(item, JSON_URL_KEYS)
+    category = _first(item, JSON_CATEGORY_KEYS)
+    return {
+        'name': ' '.join(name.split()),
+        'href': urljoin(page_url, str(url)) if url is not None else '',
+        'data_src': image,
+        'category': category if isinstance(category, str) else None,
+        'full_price': format_price(
+            full_price if full_price is not None else price),
+        'price': format_price(price),
+        'id': str(pid) if pid is not None else None,
+    }
+
+
+def parse_catalog_json(data, page_url: str) -> list:
+    '''
+    Функция ищет товары в json ответе каталога.
+
+    :param data: разобранный json ответа.
+    :param page_url: str адрес ответа для разрешения относительных ссылок.
+    :return: list карточки товаров в том же виде, что и parse_page_source.
+
+    Описание:
+        товаром считается объект, у которого есть наименование, цена
+        и id товара или изображение (ключи JSON_*_KEYS); если полной
+        цены нет, она равна цене. Карточка дополнительно содержит id
+        товара из json (ключ id, None, если его нет). Вложенные
+        объекты товара повторно не просматриваются.
+    '''
+    cards = []
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(reversed(item))
+        elif isinstance(item, dict):
+            card = _json_card(item, page_url)
+            if card is not None:
+                cards.append(card)
+            else:
+                stack.extend(reversed(list(item.values())))
+    return cards
+
+
+def parse_catalog_response(url: str, mime: str, body: str) -> list:
+    '''
+    Функция разбирает перехваченный ответ каталога.
+
+    :param url: str адрес ответа.
+    :param mime: str mime type ответа.
+    :param body: str тело ответа.
+    :return: list карточки товаров.
+    '''
+    if 'json' in mime or body.lstrip()[:1] in ('{', '['):
+        try:
+            return parse_catalog_json(json.loads(body), url)
+        except ValueError:
+            pass
+    return parse_page_source(body, url)
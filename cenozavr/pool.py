@@ -0,0 +1,187 @@
+import os
+import queue
+import logging
+import multiprocessing as mp
+
+from contextlib import contextmanager
+
+from metrics import METRICS
+from log_config import worker_config, configure_worker
+
+
+logger = logging.getLogger(name=__name__)
+
+RAM_PER_WORKER = 700 * 1024 ** 2
+MAX_WORKERS = 16
+WORKER_PREFIX = 'worker-'
+RESULT_TIMEOUT = 5
+
+_start_lock = None
+
+
+def default_workers() -> int:
+    '''
+    Функция определяет безопасное кол-во браузеров-воркеров.
+
+    :return: int кол-во воркеров: не больше кол-ва ядер и не больше,
+             чем помещается в свободную память из расчёта RAM_PER_WORKER
+             на один браузер.
+    '''
+    cpus = os.cpu_count() or 1
+    try:
+        available = (os.sysconf('SC_AVPHYS_PAGES')
+                     * os.sysconf('SC_PAGE_SIZE'))
+    except (AttributeError, ValueError, OSError):
+        return max(1, min(cpus // 2, MAX_WORKERS))
+    return max(1, min(cpus, available // RAM_PER_WORKER, MAX_WORKERS))
+
+
+def worker_number() -> int:
+    '''
+    Функция возвращает номер текущего процесса-воркера.
+
+    :return: int номер воркера, считая с 0, или 0 вне пула.
+    '''
+    name = mp.current_process().name
+    if name.startswith(WORKER_PREFIX):
+        return int(name[len(WORKER_PREFIX):])
+    return 0
+
+
+@contextmanager
+def start_lock():
+    '''
+    Контекстный менеджер по очереди запускает браузеры воркеров пула.
+
+    Описание:
+        undetected_chromedriver при запуске изменяет файл chromedriver,
+        поэтому одновременный запуск браузеров в нескольких процессах
+        приводит к ошибкам. Внутри процесса-воркера менеджер занимает
+        общую блокировку пула, вне пула ничего не делает.
+    '''
+    if _start_lock is None:
+        yield
+        return
+    with _start_lock:
+        yield
+
+
+def split_tasks(categories: list, pages: int, pages_per_task: int) -> list:
+    '''
+    Функция делит категории на задания по диапазонам страниц.
+
+    :param categories: list категории товаров.
+    :param pages: int кол-во страниц в категории.
+    :param pages_per_task: int кол-во страниц в одном задании.
+    :return: list задания вида (категория, первая страница, последняя
+             страница не включительно), страницы считаются с 0.
+    '''
+    return [(cat, first, min(first + pages_per_task, pages))
+            for cat in categories
+            for first in range(0, pages, pages_per_task)]
+
+
+def _worker(start: callable, run: callable, stop: callable,
+            tasks: mp.Queue, results: mp.Queue,
+            log_config: tuple | None = None,
+            lock=None) -> None:
+    '''
+    Функция процесса-воркера: создаёт своё состояние (браузер)
+    и выполняет задания из очереди до получения None. Если состояние
+    создать не удалось, воркер завершается, не взяв ни одного задания,
+    и их выполняют остальные воркеры. По завершении передаёт снимок
+    своих метрик родительскому процессу. Логи воркера пишутся
+    в очередь логирования родителя.
+    '''
+    global _start_lock
+    _start_lock = lock
+    configure_worker(log_config)
+    METRICS.reset()
+    try:
+        state = start()
+    except Exception as e:
+        logger.error(f'worker start failed: {e}', exc_info=True)
+        state = None
+    if state is None:
+        logger.error('worker did not start, no tasks taken')
+        METRICS.inc('worker_start_failures')
+        results.put((None, METRICS.snapshot()))
+        return
+    try:
+        while (task := tasks.get()) is not None:
+            index, payload = task
+            try:
+                rows = run(state, payload)
+            except Exception as e:
+                logger.error(f'task {payload} failed: {e}', exc_info=True)
+                rows = None
+            results.put((index, rows))
+    finally:
+        stop(state)
+        results.put((None, METRICS.snapshot()))
+
+
+def run_pool(tasks: list, start: callable, run: callable, stop: callable,
+             workers: int):
+    '''
+    Функция выполняет задания в пуле процессов.
+
+    :param tasks: list задания.
+    :param start: callable создаёт состояние воркера (например, браузер
+                  с выбранным адресом доставки), вызывается в процессе.
+    :param run: callable run(state, task) выполняет задание и возвращает
+                list строк.
+    :param stop: callable stop(state) освобождает состояние воркера.
+    :param workers: int кол-во процессов.
+    :return: генератор пар (индекс задания, list строк или None) в порядке
+             завершения заданий; задания, которые не выполнил ни один
+             воркер (например, ни один браузер не запустился), отдаются
+             в конце с None. Метрики воркеров добавляются
+             в metrics.METRICS.
+    '''
+    workers = max(1, min(workers, len(tasks)))
+    task_queue = mp.Queue()
+    results = mp.Queue()
+    lock = mp.Lock()
+    for task in enumerate(tasks):
+        task_queue.put(task)
+    for _ in range(workers):
+        task_queue.put(None)
+    processes = [
+        mp.Process(target=_worker,
+                   args=(start, run, stop, task_queue, results,
+                         worker_config(), lock),
+                   name=f'{WORKER_PREFIX}{number}',
+                   daemon=True)
+        for number in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f'started {workers} workers for {len(tasks)} tasks')
+    finished = 0
+    pending = set(range(len(tasks)))
+    try:
+        while finished < workers:
+            try:
+                result = results.get(timeout=RESULT_TIMEOUT)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    logger.error('all workers exited unexpectedly')
+                    break
+                continue
+            index, rows = result
+            if index is None:
+                METRICS.merge(rows)
+                finished += 1
+            else:
+                pending.discard(index)
+                yield result
+        for index in sorted(pending):
+            yield index, None
+    finally:
+        # задания, не взятые воркерами, не должны задерживать выход
+        task_queue.cancel_join_thread()
+        for process in processes:
+            process.join(timeout=RESULT_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
@@ -0,0 +1,188 @@
+import os
+import time
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from metrics import METRICS
+
+
+logger = logging.getLogger(name=__name__)
+
+PROFILE_DIR = 'profiles'
+MAX_SLOTS = 32
+DISK_CACHE_SIZE = 256 * 1024 ** 2
+PROFILE_MAX_BYTES = 512 * 1024 ** 2
+PRUNE_INTERVAL = 24 * 60 * 60
+PRUNE_STAMP = '.pruned'
+# каталоги кэша внутри профиля Chrome, их можно удалять целиком
+CACHE_DIRS = (
+    os.path.join('Default', 'Cache'),
+    os.path.join('Default', 'Code Cache'),
+    os.path.join('Default', 'GPUCache'),
+    os.path.join('Default', 'Service Worker', 'CacheStorage'),
+    'GrShaderCache',
+    'ShaderCache',
+)
+# файлы блокировки Chrome, остающиеся после аварийного завершения
+SINGLETON_FILES = ('SingletonLock', 'SingletonSocket', 'SingletonCookie')
+
+
+def _lock(file) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(file) -> None:
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    else:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def dir_size(path: str) -> int:
+    '''
+    Функция считает размер каталога.
+
+    :param path: str каталог.
+    :return: int размер всех файлов в байтах.
+    '''
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _cache_files(path: str) -> list:
+    files = []
+    for cache_dir in CACHE_DIRS:
+        for root, _, names in os.walk(os.path.join(path, cache_dir)):
+            for name in names:
+                file = os.path.join(root, name)
+                try:
+                    stat = os.lstat(file)
+                except OSError:
+                    continue
+                files.append((stat.st_atime, stat.st_size, file))
+    return sorted(files)
+
+
+class Profile:
+    '''
+    Постоянный профиль Chrome (user-data-dir) одного слота воркера.
+
+    Описание:
+        профиль хранит дисковый кэш статики сайта (js, css, шрифты,
+        иконки) между запусками, поэтому повторные запуски загружают
+        через proxy только сами страницы. Слот занимается эксклюзивной
+        блокировкой файла slot-<N>.lock, так что одновременно работающие
+        воркеры и процессы никогда не делят один профиль.
+    '''
+
+    def __init__(self, base: str, slot: int, lock_file):
+        self.base = base
+        self.slot = slot
+        self.path = os.path.abspath(os.path.join(base, f'slot-{slot}'))
+        self._lock_file = lock_file
+
+    def prepare(self, max_bytes: int = PROFILE_MAX_BYTES,
+                interval: float = PRUNE_INTERVAL) -> None:
+        '''
+        Метод готовит профиль к запуску Chrome: удаляет оставшиеся
+        после аварийного завершения файлы блокировки Chrome и, если
+        профиль не чистился дольше interval секунд, обрезает кэш.
+
+        :param max_bytes: int предельный размер профиля.
+        :param interval: float период очистки в секундах.
+        '''
+        os.makedirs(self.path, exist_ok=True)
+        for name in SINGLETON_FILES:
+            try:
+                os.unlink(os.path.join(self.path, name))
+            except OSError:
+                pass
+        stamp = os.path.join(self.path, PRUNE_STAMP)
+        try:
+            pruned = os.path.getmtime(stamp)
+        except OSError:
+            pruned = 0
+        if time.time() - pruned >= interval:
+            self.prune(max_bytes)
+
+    def prune(self, max_bytes: int = PROFILE_MAX_BYTES) -> int:
+        '''
+        Метод удаляет давно не использованные файлы кэша, пока профиль
+        не станет меньше max_bytes.
+
+        :param max_bytes: int предельный размер профиля.
+        :return: int кол-во освобождённых байт.
+        '''
+        size = dir_size(self.path)
+        freed = 0
+        for _, file_size, file in _cache_files(self.path):
+            if size - freed <= max_bytes:
+                break
+            try:
+                os.unlink(file)
+            except OSError:
+                continue
+            freed += file_size
+        with open(os.path.join(self.path, PRUNE_STAMP), 'w'):
+            pass
+        if freed:
+            METRICS.inc('profile_pruned_bytes', freed)
+        logger.info(f'profile slot {self.slot}: {size - freed} bytes, '
+                    f'{freed} bytes pruned')
+        return freed
+
+    def release(self) -> None:
+        '''
+        Метод освобождает слот для других воркеров.
+        '''
+        if self._lock_file is None:
+            return
+        _unlock(self._lock_file)
+        self._lock_file.close()
+        self._lock_file = None
+        logger.debug(f'profile slot {self.slot} released')
+
+
+def acquire_profile(slot: int = 0, base: str = PROFILE_DIR,
+                    max_slots: int = MAX_SLOTS) -> Profile | None:
+    '''
+    Функция занимает свободный слот профиля.
+
+    :param slot: int предпочтительный слот (обычно номер воркера),
+                 если он занят, проверяются следующие.
+    :param base: str каталог профилей.
+    :param max_slots: int кол-во слотов.
+    :return: Profile занятый профиль или None, если все слоты заняты.
+    '''
+    os.makedirs(base, exist_ok=True)
+    for offset in range(max_slots):
+        number = (slot + offset) % max_slots
+        lock_file = open(os.path.join(base, f'slot-{number}.lock'), 'a+')
+        if _lock(lock_file):
+            profile = Profile(base, number, lock_file)
+            profile.prepare()
+            logger.info(f'profile slot {number} acquired')
+            return profile
+        lock_file.close()
+    logger.warning(f'all {max_slots} profile slots are busy')
+    return None
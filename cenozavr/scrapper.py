@@ -1,10 +1,17 @@
 import os
 import re
-import csv
+import json
 import time
+import asyncio
 import logging
+import argparse
 
 from random import choice
+from functools import partial
+from contextlib import contextmanager
+from collections import deque
+from urllib.parse import urlsplit
+from concurrent.futures import ProcessPoolExecutor
 
 from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.common.by import By
@@ -26,6 +33,48 @@ import undetected_chromedriver as uc
 from dotenv import load_dotenv
 
 from agents import user_agents
+from parsers import (
+    CATEGORY_PATTERN,
+    parse_page_source,
+    parse_next_page_url,
+    parse_page_urls,
+    cards_signature,
+    parse_catalog_response
+)
+from http_client import PageFetcher, session_from_driver, is_challenge
+from crawler import AsyncCrawler
+from pool import (
+    default_workers,
+    split_tasks,
+    run_pool,
+    worker_number,
+    start_lock
+)
+from devtools import NetworkMonitor, enable_blocking
+from sinks import (
+    Sink,
+    CsvSink,
+    SqliteSink,
+    ParquetSink,
+    MultiSink,
+    product_id
+)
+from checkpoint import CHECKPOINT_FILE, Checkpoint
+from categories import CategoryResolver
+from dedup import MEMBERSHIP_FILE, ProductIndex
+from metrics import METRICS, METRICS_FILE, PROMETHEUS_FILE
+from log_config import LOG_FILE, setup_logging
+from browser_pool import POOL_SIZE, BrowserPool
+from proxy_pool import Proxy, ProxyPool, load_proxies
+from forward_proxy import ForwardProxy
+from profiles import DISK_CACHE_SIZE, acquire_profile
+from session_store import (
+    session_path,
+    save_session,
+    load_session,
+    restore_session,
+    drop_session
+)
 
 
 load_dotenv()
@@ -34,25 +83,70 @@ PROXY_USER: str = os.getenv('PROXY_USER')
 PROXY_PASSWORD: str = os.getenv('PROXY_PASS')
 PROXY_HOST: str = os.getenv('PROXY_HOST')
 PROXY_PORT: str = os.getenv('PROXY_PORT')
-PROXY_DIR = 'proxy_' + PROXY_HOST
-PATH = os.path.join(os.getcwd(), PROXY_DIR)
+PROXY_FILE: str = os.getenv('PROXY_FILE')
+PROXIES = ProxyPool()
 
 USER_AGENT = choice(user_agents)
-URL_MAIN = 'https://www.okeydostavka.ru'
+URL_MAIN = os.getenv('URL_MAIN', 'https://www.okeydostavka.ru')
 ADDRESS = 'Москва, Малая Бронная улица, 32'
 CATEGORIES = ('Товары со скидками', 'Бытовая химия')
+CATEGORY_MAP = CategoryResolver(base_url=URL_MAIN)
+ADDRESS_HEADER_SELECTOR = '#availableReceiptTimeslot'
+ADDRESS_SUGGEST_SELECTOR = (
+    '.ui-autocomplete li, [class*="suggest"] li, ymaps [class*="suggest-item"]'
+)
+ADDRESS_STEP_TIMEOUTS = {
+    'delivery_button': 15,
+    'address_form': 10,
+    'suggestions': 5,
+    'save_button': 10,
+    'modal_closed': 10,
+    'header_address': 10,
+}
+STREET_WORDS = ('улица', 'ул', 'проспект', 'пр-т', 'переулок', 'пер',
+                'шоссе', 'бульвар', 'б-р', 'площадь', 'пл', 'дом', 'д')
+NO_CATEGORY = 'no category'
+PAGE_CHANGE_TIMEOUT = 15
+PAGE_CHANGE_POLL = 0.1
+PAGE_RETRIES = 1
+EXTRACTION_MODE = 'js'
+PARSER_WORKERS = 2
+PAGES_PER_TASK = 5
 
+# извлекает все карточки страницы за один вызов execute_script
+EXTRACT_CARDS_JS = """
+const pattern = new RegExp(arguments[0]);
+const cards = document.querySelectorAll('.product.ok-theme');
+return JSON.stringify(Array.from(cards, card => {
+    const a = card.querySelector('a');
+    const img = card.querySelector('img');
+    const script = card.querySelector('script');
+    const spans = card.querySelectorAll('.product-price span');
+    const match = script ? script.innerHTML.match(pattern) : null;
+    return {
+        name: a ? a.innerText : '',
+        href: a ? a.href : '',
+        data_src: img ? img.getAttribute('data-src') || '' : '',
+        category: match ? match[1] : null,
+        full_price: spans.length > 0 ? spans[0].textContent : '',
+        price: spans.length > 1 ? spans[1].textContent : ''
+    };
+}));
+"""
+# ссылка первой карточки страницы
+FIRST_CARD_JS = """
+const card = document.querySelector('.product.ok-theme');
+const a = card ? card.querySelector('a') : null;
+return a ? a.href : null;
+"""
+# ссылки карточек страницы - отпечаток для поиска повторной страницы
+PAGE_SIGNATURE_JS = """
+return Array.from(document.querySelectorAll('.product.ok-theme'),
+                  card => (card.querySelector('a') || {}).href || '');
+"""
 
-logger = logging.getLogger(name=__name__)
-logger.setLevel(logging.INFO)
-
-handler = logging.FileHandler(
-    f'logs/{__name__}.log', mode='w', encoding='utf-8'
-    )
-formatter = logging.Formatter("%(name)s %(asctime)s %(levelname)s %(message)s")
 
-handler.setFormatter(formatter)
-logger.addHandler(handler)
+logger = logging.getLogger(name=__name__)
 
 
 def handle_exceptions(func: callable) -> callable:
@@ -66,12 +160,21 @@ def handle_exceptions(func: callable) -> callable:
     Описание:
         Этот декоратор пытается выполнить переданную функцию и ловит различные
         исключения, связанные с работой драйвера Selenium. При возникновении
-        исключения, информация о нём логируется. Если возникает неожиданное
+        исключения, информация о нём логируется, а счётчик ошибок
+        увеличивается один раз, даже если исключение проходит через
+        несколько обёрнутых функций. Если возникает неожиданное
         исключение, оно повторно поднимается после логирования.
     """
     def wrapper(*args, **kwargs):
         try:
-            return func(*args, **kwargs)
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                # вложенные обёртки видят одно и то же исключение
+                if not getattr(e, 'error_counted', False):
+                    METRICS.inc('errors')
+                    e.error_counted = True
+                raise
         except NoSuchElementException as e:
             logger.error(f'Element not found: {e}', exc_info=True)
         except TimeoutException as e:
@@ -94,26 +197,27 @@ def handle_exceptions(func: callable) -> callable:
     return wrapper
 
 
-def go_next_page(driver: uc.Chrome) -> uc.Chrome:
+def go_next_page(driver: uc.Chrome) -> bool:
     '''
-    Функция для перехода на следующую страницу категории.
+    Функция для перехода на следующую страницу категории кликом
+    по стрелке пагинатора (если адреса страниц неизвестны).
 
     :param driver: веб-драйвер для управления браузером.
-    :return: веб-драйвер для управления браузером.
-
-    Описание:
-        эта функция пытается выполнить переход на следующую
-        страницу каталога, при возникновении исключения,
-        информация о нём логируется.
+    :return: bool True, если переход выполнен, False, если стрелки
+             нет или она неактивна, т.е. страница последняя.
     '''
-    next = driver.find_elements(By.CLASS_NAME, 'right_arrow')
+    arrows = driver.find_elements(By.CLASS_NAME, 'right_arrow')
+    if not arrows:
+        logger.debug('next page dosnt exist')
+        return False
     try:
-        next[0].click()
-        logger.debug('press next page')
+        with METRICS.timer('next_page'):
+            arrows[0].click()
     except ElementNotInteractableException:
-        logger.debug('next page dosnt exist')
-    finally:
-        return driver
+        logger.info('next page arrow is not clickable, last page')
+        return False
+    logger.debug('press next page')
+    return True
 
 
 @handle_exceptions
@@ -151,12 +255,28 @@ def find_element(driver: uc.Chrome, method: str, loc: str) -> WebElement:
 @handle_exceptions
 def create_webdriver(user_agent: str,
                      headless: bool = True,
-                     proxy: bool = True) -> uc.Chrome:
+                     proxy: bool | Proxy = True,
+                     block_resources: bool = False,
+                     capture_network: bool = False,
+                     profile: bool | int = False) -> uc.Chrome:
     '''
     Функция создаёт веб-драйвер для управления браузером.
     :param user_agent: str заголовок для браузера.
     :param headless: bool режим управления графического отображения
-    :param proxy: str режим proxy server
+    :param proxy: режим proxy server: True - лучший proxy из PROXIES,
+                  Proxy - заданный proxy, False - без proxy. Браузер
+                  подключается к upstream proxy через локальный
+                  ForwardProxy (--proxy-server), который добавляет
+                  авторизацию и меняет забаненный upstream.
+    :param block_resources: bool не загружать изображения, шрифты, медиа
+                            и сторонние трекеры (через Chrome DevTools
+                            Protocol) и вести учёт трафика.
+    :param capture_network: bool сохранять html и json ответы каталога
+                            для режима извлечения 'network'.
+    :param profile: постоянный профиль Chrome с дисковым кэшем:
+                    True - свободный слот начиная с номера воркера,
+                    int - свободный слот начиная с заданного,
+                    False - временный профиль.
     :return: веб-драйвер для управления браузером.
     '''
     options = uc.ChromeOptions()
@@ -165,9 +285,49 @@ def create_webdriver(user_agent: str,
     options.add_experimental_option("prefs", {
         "profile.default_content_setting_values.geolocation": 2})
     options.add_argument(f'--user-agent={user_agent}')
-    if proxy:
-        options.add_argument('--load-extension=' + PATH)
-    driver = uc.Chrome(headless=headless, options=options)
+    if proxy is True:
+        proxy = PROXIES.acquire()
+        if proxy is None:
+            logger.warning('no proxy configured, run without proxy')
+    if block_resources or capture_network:
+        options.set_capability(
+            'goog:loggingPrefs', {'performance': 'ALL'})
+    forward = None
+    driver = None
+    slot = None
+    try:
+        if proxy:
+            forward = ForwardProxy(PROXIES, proxy).start()
+            options.add_argument(f'--proxy-server={forward.url}')
+        user_data_dir = None
+        if profile is not False:
+            slot = acquire_profile(
+                worker_number() if profile is True else profile)
+            if slot is not None:
+                user_data_dir = slot.path
+                options.add_argument(
+                    f'--disk-cache-size={DISK_CACHE_SIZE}')
+        with start_lock(), METRICS.timer('driver_start'):
+            driver = uc.Chrome(headless=headless, options=options,
+                               user_data_dir=user_data_dir)
+        driver.proxy = proxy or None
+        driver.forward_proxy = forward
+        driver.profile = slot
+        driver.network_monitor = None
+        if block_resources:
+            enable_blocking(driver)
+        if block_resources or capture_network:
+            driver.network_monitor = NetworkMonitor(
+                driver, capture_network, (urlsplit(URL_MAIN).hostname,))
+    except Exception:
+        if driver is not None:
+            driver.quit()
+        if forward is not None:
+            forward.stop()
+        if slot is not None:
+            slot.release()
+        PROXIES.release(proxy or None)
+        raise
     return driver
 
 
@@ -189,9 +349,121 @@ def close_driver(driver: uc.Chrome) -> None:
     Функция для закрытия веб-драйвера.
 
     :param driver: веб-драйвер для управления браузером.
+
+    Описание:
+        proxy, локальный ForwardProxy и слот профиля освобождаются,
+        даже если браузер уже не отвечает.
+    '''
+    try:
+        monitor = getattr(driver, 'network_monitor', None)
+        if monitor is not None:
+            monitor.poll()
+            logger.info(f'network traffic: {monitor.summary()}')
+        try:
+            driver.close()
+        finally:
+            driver.quit()
+    finally:
+        PROXIES.release(getattr(driver, 'proxy', None))
+        forward = getattr(driver, 'forward_proxy', None)
+        if forward is not None:
+            forward.stop()
+        profile = getattr(driver, 'profile', None)
+        if profile is not None:
+            profile.release()
+
+
+@contextmanager
+def log_duration(step: str):
+    '''
+    Контекстный менеджер логирует время выполнения шага
+    и добавляет его в метрики этапов.
+
+    :param step: str название шага (этапа в метриках).
+    '''
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        METRICS.observe(step, elapsed)
+        logger.info(f'{step} took {elapsed:.2f}s')
+
+
+def click_until_visible(locator: tuple, target: tuple) -> callable:
+    '''
+    Условие ожидания: кликает по элементу, пока не станет видимым
+    целевой элемент.
+
+    :param locator: tuple локатор элемента для клика.
+    :param target: tuple локатор элемента, который должен появиться.
+    :return: callable условие для WebDriverWait, возвращающее
+             целевой элемент.
+    '''
+    def condition(driver: uc.Chrome) -> WebElement | bool:
+        opened = driver.find_elements(*target)
+        if opened and opened[0].is_displayed():
+            return opened[0]
+        try:
+            driver.find_element(*locator).click()
+        except WebDriverException:
+            pass
+        return False
+    return condition
+
+
+def page_changed(old_card: WebElement, old_first: str | None) -> callable:
+    '''
+    Условие ожидания: страница каталога сменилась после перехода.
+
+    :param old_card: WebElement первая карточка прежней страницы.
+    :param old_first: str ссылка первой карточки прежней страницы.
+    :return: callable условие для WebDriverWait: True, когда прежняя
+             карточка удалена из DOM или первая карточка страницы
+             ведёт на другой товар.
+    '''
+    def condition(driver: uc.Chrome) -> bool:
+        try:
+            old_card.is_enabled()
+        except StaleElementReferenceException:
+            return True
+        first = driver.execute_script(FIRST_CARD_JS)
+        return first is not None and first != old_first
+    return condition
+
+
+def wait_for_page_change(driver: uc.Chrome,
+                         cards: list,
+                         signature: list,
+                         timeout: float = PAGE_CHANGE_TIMEOUT) -> bool:
+    '''
+    Функция ждёт, пока после клика по пагинатору сменятся карточки.
+
+    :param driver: веб-драйвер для управления браузером.
+    :param cards: list карточки прежней страницы.
+    :param signature: list ссылки карточек прежней страницы.
+    :param timeout: float предельное время ожидания в секундах.
+    :return: bool True, если страница сменилась, False по таймауту.
+
+    Описание:
+        вместо фиксированной паузы проверяется, что прежняя первая
+        карточка стала stale или первый товар сменился (при замене
+        списка без перерисовки карточек). Время смены страницы
+        записывается в метрики как этап 'page_change'.
     '''
-    driver.close()
-    driver.quit()
+    wait = WebDriverWait(driver, timeout, poll_frequency=PAGE_CHANGE_POLL)
+    start = time.perf_counter()
+    try:
+        wait.until(page_changed(cards[0], signature[0] if signature
+                                else None))
+    except TimeoutException:
+        METRICS.inc('page_change_timeouts')
+        logger.warning(f'page did not change in {timeout}s')
+        return False
+    elapsed = time.perf_counter() - start
+    METRICS.observe('page_change', elapsed)
+    logger.debug(f'page changed in {elapsed:.2f}s')
+    return True
 
 
 @handle_exceptions
@@ -203,99 +475,1149 @@ def select_delivery_address(driver: uc.Chrome,
     :param driver: веб-драйвер для управления браузером.
     :param delivery_address: str адрес доставки.
     :return: веб-драйвер для управления браузером с выбранным адресом.
+
+    Описание:
+        вместо фиксированных пауз каждый шаг ждёт своего условия
+        с собственным таймаутом (ADDRESS_STEP_TIMEOUTS): кнопка доставки
+        кликабельна, открылась форма адреса, появились подсказки,
+        форма закрылась, в шапке сайта отобразился выбранный адрес.
+        Время каждого шага логируется.
     '''
-    wait = WebDriverWait(driver, timeout=15)
-    driver.get(URL_MAIN)
-    click_element(driver, find_element(
-        driver, 'xpath', "//button[contains(text(),'Принять')]"))
+    timeouts = ADDRESS_STEP_TIMEOUTS
+    with log_duration('address_main_page'):
+        driver.get(URL_MAIN)
+    with log_duration('address_cookie'):
+        click_element(driver, find_element(
+            driver, 'xpath', "//button[contains(text(),'Принять')]"))
     logger.debug('press ok cookie')
 
-    delivery = wait.until(EC.element_to_be_clickable(
-        (By.ID,
-         "availableReceiptTimeslot")))
-    ActionChains(driver).move_to_element(delivery).perform()
-    time.sleep(10)
-    delivery.click()
+    with log_duration('address_form'):
+        delivery = WebDriverWait(driver, timeouts['delivery_button']).until(
+            EC.element_to_be_clickable((By.ID, 'availableReceiptTimeslot')))
+        ActionChains(driver).move_to_element(delivery).perform()
+        address = WebDriverWait(driver, timeouts['address_form']).until(
+            click_until_visible((By.ID, 'availableReceiptTimeslot'),
+                                (By.ID, 'addressSelectionQuery')))
     logger.debug('press delivery button')
 
-    address = find_element(driver, 'css_selector', '#addressSelectionQuery')
-    driver.implicitly_wait(15)
-    address.send_keys(delivery_address)
-    logger.debug('insert address in form')
+    with log_duration('address_input'):
+        address.send_keys(delivery_address)
+        try:
+            WebDriverWait(driver, timeouts['suggestions']).until(
+                EC.visibility_of_element_located(
+                    (By.CSS_SELECTOR, ADDRESS_SUGGEST_SELECTOR)))
+        except TimeoutException:
+            logger.warning('address suggestions did not appear')
+        logger.debug('insert address in form')
+        address.send_keys(Keys.ENTER)
+        address.send_keys(Keys.ENTER)
+        logger.debug('press enter')
+
+    with log_duration('address_save'):
+        save = WebDriverWait(driver, timeouts['save_button']).until(
+            EC.element_to_be_clickable((By.ID, 'addressSelectionButton')))
+        ActionChains(driver).move_to_element(save).perform()
+        save.click()
+        logger.debug('press save delivery address')
+        WebDriverWait(driver, timeouts['modal_closed']).until(
+            EC.invisibility_of_element_located(
+                (By.ID, 'addressSelectionQuery')))
+
+    with log_duration('address_header'):
+        try:
+            WebDriverWait(driver, timeouts['header_address']).until(
+                lambda d: address_is_selected(d, delivery_address))
+        except TimeoutException:
+            logger.warning('header address did not change')
+    return driver
+
+
+def make_row(name: str, href: str, data_src: str,
+             category: str | None, full_price: str, price: str) -> list:
+    '''
+    Функция формирует строку с информацией о товаре.
+
+    :param name: str наименование товара.
+    :param href: str ссылка на страницу товара.
+    :param data_src: str относительная ссылка на изображение.
+    :param category: str категория товара или None (тогда NO_CATEGORY).
+    :param full_price: str текст полной цены.
+    :param price: str текст цены со скидкой.
+    :return: list строка для записи.
+    '''
+    if category is None:
+        category = NO_CATEGORY
+    return [name.strip(), href, URL_MAIN + data_src, category,
+            full_price.strip()[:-2], price.strip()[:-2]]
+
+
+def extract_card(driver: uc.Chrome, prod: WebElement) -> list:
+    '''
+    Функция извлекает информацию о товаре из карточки поэлементно.
+
+    :param driver: веб-драйвер для управления браузером.
+    :param prod: WebElement карточка товара.
+    :return: list строка с информацией о товаре.
+    '''
+    a = prod.find_element(By.TAG_NAME, 'a')
+    img_url = prod.find_element(By.TAG_NAME, 'img')
+    el = prod.find_element(By.TAG_NAME, 'script')
+    js_code = driver.execute_script("return arguments[0].innerHTML;", el)
+    category_match = re.search(CATEGORY_PATTERN, js_code)
+    div_price = prod.find_element(By.CLASS_NAME, 'product-price')
+    prices = div_price.find_elements(By.TAG_NAME, 'span')
+    return make_row(
+        a.text,
+        a.get_attribute('href'),
+        img_url.get_attribute('data-src'),
+        category_match.group(1) if category_match else None,
+        prices[0].get_attribute('textContent'),
+        prices[1].get_attribute('textContent'),
+    )
+
+
+def cards_to_rows(cards: list) -> list:
+    '''
+    Функция формирует строки из карточек, извлечённых
+    через execute_script или из html страницы.
+
+    :param cards: list словари с ключами name, href, data_src,
+                  category, full_price, price.
+    :return: list список товаров.
+    '''
+    return [make_row(card['name'], card['href'], card['data_src'],
+                     card['category'], card['full_price'], card['price'])
+            for card in cards]
+
+
+def extract_cards_js(driver: uc.Chrome) -> list:
+    '''
+    Функция извлекает информацию обо всех товарах страницы
+    одним вызовом execute_script.
+
+    :param driver: веб-драйвер для управления браузером.
+    :return: list список товаров страницы.
+    '''
+    cards = json.loads(driver.execute_script(
+        EXTRACT_CARDS_JS, CATEGORY_PATTERN))
+    return cards_to_rows(cards)
+
+
+def extract_cards_network(driver: uc.Chrome) -> list:
+    '''
+    Функция собирает товары из перехваченных ответов каталога.
+
+    :param driver: веб-драйвер, созданный с capture_network=True.
+    :return: list список товаров страницы.
+
+    Описание:
+        разбираются html и json ответы сайта, полученные с момента
+        перехода на страницу (ответы предыдущих страниц отбрасываются
+        перед навигацией). Карточки из разных ответов объединяются
+        по ссылке на изображение или id товара. Если товаров в ответах
+        нет, они извлекаются из DOM.
+    '''
+    monitor = driver.network_monitor
+    monitor.poll()
+    cards = {}
+    for url, mime, body in monitor.pop_responses():
+        for card in parse_catalog_response(url, mime, body):
+            cards.setdefault(card['data_src'] or card.get('id'), card)
+    if not cards:
+        logger.warning('no catalog responses captured, fallback to DOM')
+        return extract_cards_js(driver)
+    return cards_to_rows(list(cards.values()))
+
+
+def log_page(products: list,
+             elapsed: float | None = None,
+             failures: int = 0,
+             duplicates: int = 0) -> None:
+    '''
+    Функция логирует итог обработки страницы одной записью.
+
+    :param products: list товары страницы.
+    :param elapsed: float время обработки страницы в секундах или None.
+    :param failures: int кол-во карточек, которые не удалось извлечь.
+    :param duplicates: int кол-во пропущенных повторных товаров.
+    '''
+    missing = sum(1 for row in products if row[3] == NO_CATEGORY)
+    message = f'page done: {len(products)} products, {failures} failures'
+    if missing:
+        message += f', {missing} without category'
+    if duplicates:
+        message += f', {duplicates} duplicates'
+    if elapsed is not None:
+        message += f', {elapsed:.2f}s'
+    logger.info(message)
+
+
+def dedup_rows(products: list, index: ProductIndex | None,
+               category: str) -> tuple:
+    '''
+    Функция убирает товары, уже собранные в этом запуске.
+
+    :param products: list товары страницы.
+    :param index: ProductIndex индекс товаров или None (без проверки).
+    :param category: str категория, в которой собраны товары.
+    :return: tuple (list новые товары, int кол-во повторов).
+    '''
+    if index is None:
+        return products, 0
+    rows = index.filter_rows(products, category)
+    return rows, len(products) - len(rows)
+
+
+def extract_products(driver: uc.Chrome,
+                     cards: list,
+                     mode: str = 'elements',
+                     index: ProductIndex | None = None,
+                     category: str | None = None) -> list:
+    '''
+    Функция извлекает информацию о товарах текущей страницы.
+
+    :param driver: веб-драйвер для управления браузером.
+    :param cards: list карточки товаров страницы.
+    :param mode: str способ извлечения: 'elements' - запрос к драйверу
+                 на каждое поле карточки, 'js' - один вызов execute_script
+                 на страницу, 'html' - разбор driver.page_source без
+                 обращений к элементам, 'network' - разбор ответов
+                 сайта из журнала сети.
+    :param index: ProductIndex индекс товаров этого запуска: повторно
+                  встреченные товары не возвращаются, а их категория
+                  записывается в индекс.
+    :param category: str категория, страница которой обрабатывается.
+    :return: list список товаров страницы.
+
+    Описание:
+        карточки, которые не удалось разобрать в режиме 'elements',
+        пропускаются; итог страницы (кол-во товаров, пропусков, повторов
+        и время) логируется одной записью. В режиме 'elements' повтор
+        определяется по id из ссылки на изображение до извлечения
+        остальных полей карточки.
+    '''
+    start = time.perf_counter()
+    failures = 0
+    duplicates = 0
+    with METRICS.timer(f'extract_{mode}'):
+        match mode:
+            case 'elements':
+                products = []
+                for prod in cards:
+                    try:
+                        pid = None
+                        if index is not None:
+                            pid = product_id(prod.find_element(
+                                By.TAG_NAME, 'img').get_attribute('data-src'))
+                        if pid is not None and index.seen(pid):
+                            index.add(pid, category)
+                            duplicates += 1
+                            continue
+                        with METRICS.timer('extract_card'):
+                            products.append(extract_card(driver, prod))
+                        if index is not None:
+                            index.add(pid, category)
+                    except (NoSuchElementException,
+                            StaleElementReferenceException,
+                            IndexError) as e:
+                        failures += 1
+                        logger.debug(f'card skipped: {e}')
+                if index is not None:
+                    index.flush()
+            case 'js':
+                products = extract_cards_js(driver)
+            case 'html':
+                products = cards_to_rows(parse_page_source(
+                    driver.page_source, driver.current_url))
+            case 'network':
+                products = extract_cards_network(driver)
+            case _:
+                raise AttributeError('invalid name for parametr')
+        if mode != 'elements':
+            products, duplicates = dedup_rows(products, index, category)
+    METRICS.inc('errors', failures)
+    log_page(products, time.perf_counter() - start, failures, duplicates)
+    return products
+
+
+@handle_exceptions
+def compare_extraction(driver: uc.Chrome, repeat: int = 3) -> dict:
+    '''
+    Функция сравнивает время извлечения товаров текущей страницы
+    поэлементным способом, одним вызовом execute_script
+    и разбором html страницы.
+
+    :param driver: веб-драйвер с открытой страницей категории.
+    :param repeat: int кол-во повторов для каждого способа.
+    :return: dict среднее время (сек.) и кол-во товаров по способам.
+    '''
+    wait = WebDriverWait(driver, timeout=10)
+    cards = wait.until(
+        EC.presence_of_all_elements_located(
+            (By.CLASS_NAME, 'product.ok-theme'))
+        )
+    timings = {}
+    for mode in ('elements', 'js', 'html'):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            products = extract_products(driver, cards, mode)
+        elapsed = (time.perf_counter() - start) / repeat
+        timings[mode] = {'seconds': elapsed, 'products': len(products)}
+        logger.info(f'extraction {mode}: {len(products)} products '
+                    f'in {elapsed:.3f}s')
+    return timings
+
+
+def refresh_category_map(driver: uc.Chrome,
+                         fetch: callable = None) -> None:
+    '''
+    Функция строит карту категорий, если сохранённая устарела.
+
+    :param driver: веб-драйвер для управления браузером.
+    :param fetch: callable функция загрузки страницы по адресу
+                  (PageFetcher.fetch), по умолчанию главная страница
+                  открывается в браузере (если он уже не на ней).
+    '''
+    if CATEGORY_MAP.fresh():
+        return
+    with METRICS.timer('category_map'):
+        if fetch is not None:
+            html = fetch(URL_MAIN)
+        else:
+            if driver.current_url.rstrip('/') != URL_MAIN.rstrip('/'):
+                driver.get(URL_MAIN)
+            html = driver.page_source
+        CATEGORY_MAP.refresh(html, URL_MAIN)
+
+
+def category_url(driver: uc.Chrome, category: str,
+                 fetch: callable = None) -> str:
+    '''
+    Функция определяет адрес первой страницы категории.
+
+    :param driver: веб-драйвер для управления браузером.
+    :param category: str название категории.
+    :param fetch: callable функция загрузки главной страницы,
+                  см. refresh_category_map.
+    :return: str адрес категории.
+
+    Описание:
+        адрес берётся из карты категорий CATEGORY_MAP. Если категории
+        в карте нет, она открывается кликом по тексту на главной
+        странице, а найденный адрес добавляется в карту.
+    '''
+    refresh_category_map(driver, fetch)
+    url = CATEGORY_MAP.resolve(category)
+    if url is not None:
+        return url
+    driver.get(URL_MAIN)
+    xpass_category = f"//div[contains(text(),'{category}')]"
+    click_element(driver, find_element(driver, 'xpath', xpass_category))
+    url = driver.current_url
+    if url.rstrip('/') == URL_MAIN.rstrip('/'):
+        logger.warning(f'category {category} not found')
+        return url
+    CATEGORY_MAP.add(category, url)
+    logger.info(f'category {category} found by browser: {url}')
+    return url
+
+
+def open_category(driver: uc.Chrome, category: str) -> None:
+    '''
+    Функция открывает первую страницу категории прямым переходом
+    по адресу из карты категорий.
+
+    :param driver: веб-драйвер для управления браузером.
+    :param category: str название категории.
+    '''
+    with METRICS.timer('category_open'):
+        url = category_url(driver, category)
+        monitor = getattr(driver, 'network_monitor', None)
+        if monitor is not None:
+            monitor.clear()
+        if driver.current_url != url:
+            driver.get(url)
+    logger.debug('find category')
     driver.implicitly_wait(15)
-    address.send_keys(Keys.ENTER)
-    address.send_keys(Keys.ENTER)
-    logger.debug('press enter')
-
-    save = wait.until(EC.element_to_be_clickable(
-        (By.ID, 'addressSelectionButton')))
-    ActionChains(driver).move_to_element(save).perform()
-    save.click()
-    logger.debug('press save delivery address')
-    time.sleep(10)
+
+
+def wait_for_cards(driver: uc.Chrome,
+                   navigation: float = 0.0,
+                   required: bool = True) -> list:
+    '''
+    Функция ждёт карточки товаров открытой страницы.
+
+    :param driver: веб-драйвер для управления браузером.
+    :param navigation: float время перехода на страницу, учитывается
+                       во времени ответа proxy.
+    :param required: bool страница должна содержать товары: иначе
+                     по таймауту возникает TimeoutException, а не
+                     возвращается пустой список.
+    :return: list карточки товаров (WebElement).
+    '''
+    forward = getattr(driver, 'forward_proxy', None)
+    wait = WebDriverWait(driver, timeout=10)
+    start = time.perf_counter()
+    try:
+        with METRICS.timer('wait_cards'):
+            cards = wait.until(
+                EC.presence_of_all_elements_located(
+                    (By.CLASS_NAME, 'product.ok-theme'))
+                )
+    except TimeoutException:
+        challenge = is_challenge(200, driver.page_source)
+        if not (required or challenge):
+            return []
+        if forward is not None:
+            forward.report(False, challenge=challenge)
+        raise
+    if forward is not None:
+        forward.report(True, navigation + time.perf_counter() - start)
+    logger.debug('find products cards')
+    return cards
+
+
+def iter_category_pages(driver: uc.Chrome,
+                        category: str,
+                        pages: int | None = None,
+                        skip: int = 0,
+                        on_count: callable = None):
+    '''
+    Функция открывает категорию и обходит её страницы.
+
+    :param driver: веб-драйвер для управления браузером.
+    :param category: str название категории.
+    :param pages: int кол-во необходимых страниц, None - все страницы.
+    :param skip: int кол-во страниц, пропускаемых без извлечения.
+    :param on_count: callable on_count(кол-во страниц категории),
+                     вызывается, когда кол-во страниц стало известно.
+    :return: генератор пар (номер страницы, карточки товаров).
+
+    Описание:
+        адреса всех страниц строятся по пагинатору первой страницы
+        (parse_page_urls), и каждая следующая страница, в том числе
+        первая после skip, открывается прямым переходом. Если
+        пагинатор не распознан, страницы перебираются кликом
+        по стрелке. Обход останавливается на последней странице,
+        на пустой странице и на странице, повторяющей предыдущую.
+        Если кол-во страниц известно по пагинатору, незагрузившаяся
+        страница до последней считается ошибкой: она загружается
+        повторно (PAGE_RETRIES раз), затем обход категории прерывается
+        без записи кол-ва страниц. При переходе кликом по стрелке
+        страница не загружается повторно (адрес страницы неизвестен):
+        по странице проверки или таймауту смены страницы обход
+        категории прерывается сразу. Оставшиеся страницы собираются
+        при продолжении сбора.
+    '''
+    start = time.perf_counter()
+    open_category(driver, category)
+    navigation = time.perf_counter() - start
+    end = None if pages is None else skip + pages
+    urls, page, previous = None, 0, None
+    retries = 0
+    while end is None or page < end:
+        try:
+            cards = wait_for_cards(driver, navigation,
+                                   required=previous is None or bool(urls))
+        except TimeoutException:
+            if previous is None:
+                raise
+            if urls and retries < PAGE_RETRIES:
+                retries += 1
+                METRICS.inc('page_retries')
+                logger.warning(f'category {category} page {page} '
+                               'did not load, retry')
+                monitor = getattr(driver, 'network_monitor', None)
+                if monitor is not None:
+                    monitor.clear()
+                start = time.perf_counter()
+                driver.get(urls[page])
+                navigation = time.perf_counter() - start
+                continue
+            METRICS.inc('errors')
+            logger.error(f'category {category} stopped at page {page}: '
+                         'page did not load')
+            return
+        retries = 0
+        signature = driver.execute_script(PAGE_SIGNATURE_JS) if cards else []
+        if not cards or signature == previous:
+            logger.info(f'category {category} ends at page {page}: '
+                        f'{"duplicate" if cards else "empty"} page')
+            if on_count is not None:
+                on_count(page)
+            return
+        previous = signature
+        driver.pages_loaded = getattr(driver, 'pages_loaded', 0) + 1
+        if urls is None:
+            urls = parse_page_urls(driver.page_source,
+                                   driver.current_url) or []
+            if urls:
+                logger.debug(f'category {category}: {len(urls)} pages')
+                end = len(urls) if end is None else min(end, len(urls))
+                if on_count is not None:
+                    on_count(len(urls))
+        if page >= skip:
+            yield page, cards
+        monitor = getattr(driver, 'network_monitor', None)
+        if monitor is not None:
+            monitor.clear()
+        page = skip if urls and page < skip else page + 1
+        if end is not None and page >= end:
+            return
+        start = time.perf_counter()
+        if urls:
+            with METRICS.timer('next_page'):
+                driver.get(urls[page])
+        elif not go_next_page(driver):
+            if on_count is not None:
+                on_count(page)
+            return
+        elif not wait_for_page_change(driver, cards, signature):
+            METRICS.inc('errors')
+            logger.error(f'category {category} stopped at page {page}: '
+                         'page did not change')
+            return
+        navigation = time.perf_counter() - start
+
+
+def address_matches(text: str, delivery_address: str) -> bool:
+    '''
+    Функция проверяет, что текст содержит выбранный адрес доставки.
+
+    :param text: str текст с адресом, отображаемым сайтом.
+    :param delivery_address: str адрес доставки.
+    :return: bool True, если улица и номер дома присутствуют в тексте.
+    '''
+    text = text.lower().replace('ё', 'е')
+    street = delivery_address.split(',', 1)[-1].lower().replace('ё', 'е')
+    words = [word.strip('.') for word in street.replace(',', ' ').split()]
+    return all(word in text for word in words
+               if word and word not in STREET_WORDS)
+
+
+def address_is_selected(driver: uc.Chrome, delivery_address: str) -> bool:
+    '''
+    Функция проверяет, что в шапке сайта отображается адрес доставки.
+
+    :param driver: веб-драйвер для управления браузером.
+    :param delivery_address: str адрес доставки.
+    :return: bool True, если адрес выбран.
+    '''
+    text = driver.execute_script(
+        'const el = document.querySelector(arguments[0]);'
+        'return el ? el.textContent : "";', ADDRESS_HEADER_SELECTOR)
+    return address_matches(text or '', delivery_address)
+
+
+def proxy_key(driver: uc.Chrome) -> str | None:
+    '''
+    Функция возвращает proxy server браузера для ключа сессии.
+
+    :param driver: веб-драйвер для управления браузером.
+    :return: str host:port proxy или None, если браузер без proxy.
+    '''
+    proxy = getattr(driver, 'proxy', None)
+    return proxy.key if proxy is not None else None
+
+
+def configure_proxies(path: str | None = PROXY_FILE) -> None:
+    '''
+    Функция наполняет пул proxy servers PROXIES.
+
+    :param path: str файл со списком proxy (см. proxy_pool.load_proxies),
+                 если не задан - используется proxy из переменных
+                 окружения PROXY_*.
+    '''
+    if path:
+        PROXIES.add(load_proxies(path))
+    elif PROXY_HOST:
+        PROXIES.add([Proxy(PROXY_HOST, PROXY_PORT,
+                           PROXY_USER, PROXY_PASSWORD)])
+    logger.info(f'{len(PROXIES)} proxies configured')
+
+
+@handle_exceptions
+def ensure_delivery_address(driver: uc.Chrome,
+                            delivery_address: str,
+                            proxy: str | None = None) -> uc.Chrome:
+    '''
+    Функция выбирает адрес доставки, по возможности восстанавливая
+    сохранённую сессию.
+
+    :param driver: веб-драйвер для управления браузером.
+    :param delivery_address: str адрес доставки.
+    :param proxy: str proxy server браузера или None.
+    :return: веб-драйвер для управления браузером с выбранным адресом.
+
+    Описание:
+        cookies и localStorage сессии хранятся на диске с ключом по адресу
+        и proxy server. Если сохранённая сессия свежая и сайт после её
+        восстановления показывает нужный адрес, ввод адреса через
+        интерфейс пропускается. Иначе адрес выбирается через
+        select_delivery_address, и сессия сохраняется заново.
+    '''
+    path = session_path(delivery_address, proxy)
+    state = load_session(path)
+    if state is not None:
+        restore_session(driver, state, URL_MAIN)
+        if address_is_selected(driver, delivery_address):
+            logger.info('delivery address restored from saved session')
+            return driver
+        logger.info('saved session rejected')
+        drop_session(path)
+    driver = select_delivery_address(driver, delivery_address)
+    if driver is not None:
+        save_session(driver, path, delivery_address)
     return driver
 
 
+def emit_products(products: list,
+                  products_main: list,
+                  sink: Sink | None,
+                  checkpoint: Checkpoint | None = None,
+                  page_key: tuple | None = None) -> None:
+    '''
+    Функция передаёт товары страницы в sink или в общий список.
+
+    :param products: list товары страницы.
+    :param products_main: list общий список товаров.
+    :param sink: Sink приёмник товаров или None.
+    :param checkpoint: Checkpoint контрольная точка или None.
+    :param page_key: tuple (категория, номер страницы) для отметки
+                     в контрольной точке: страница отмечается, когда
+                     sink сохранил её товары на диск.
+    '''
+    if sink is not None:
+        sink.write_rows(products)
+    else:
+        products_main.extend(products)
+    METRICS.inc('pages')
+    METRICS.inc('products', len(products))
+    if checkpoint is not None:
+        checkpoint.mark_done(*page_key, len(products),
+                             durable=sink is None or not sink.pending())
+
+
+@handle_exceptions
+def parse_products_http(driver: uc.Chrome,
+                        categories: list,
+                        pages: int | None = None,
+                        proxy: bool = True,
+                        sink: Sink | None = None,
+                        checkpoint: Checkpoint | None = None,
+                        close: bool = True,
+                        index: ProductIndex | None = None) -> list:
+    '''
+    Функция собирает информацию о товарах по http без рендеринга страниц.
+
+    :param driver: веб-драйвер с выбранным адресом доставки.
+    :param categories: list категории товаров для парсинга.
+    :param pages: int кол-во необходимых страниц, None - все страницы.
+    :param proxy: bool использовать proxy server.
+    :param sink: Sink приёмник товаров, см. parse_products.
+    :param checkpoint: Checkpoint контрольная точка, см. parse_products.
+    :param close: bool закрыть браузер по завершении.
+    :param index: ProductIndex индекс товаров, см. parse_products.
+    :return: list список товаров.
+
+    Описание:
+        cookies и заголовки браузера переносятся в http-сессию с пулом
+        keep-alive соединений, после чего страницы категорий загружаются
+        без браузера. Браузер используется только если сайт вернул
+        страницу проверки.
+    '''
+    forward = getattr(driver, 'forward_proxy', None) if proxy else None
+    session = session_from_driver(driver, forward.url if forward else None)
+    fetcher = PageFetcher(session, driver, forward)
+    products_main = []
+    for cat in categories:
+        limit = checkpoint.page_limit(cat, pages) if checkpoint else pages
+        first = checkpoint.next_page(cat, pages) if checkpoint else 0
+        if limit is not None and first >= limit:
+            continue
+        url = category_url(driver, cat, fetcher.fetch)
+        logger.debug('find category')
+        urls, page, previous = None, 0, None
+        while limit is None or page < limit:
+            start = time.perf_counter()
+            html = fetcher.fetch(url)
+            cards = parse_page_source(html, url)
+            if not cards or cards_signature(cards) == previous:
+                logger.info(f'category {cat} ends at page {page}')
+                if checkpoint is not None:
+                    checkpoint.set_page_count(cat, page)
+                break
+            previous = cards_signature(cards)
+            if urls is None:
+                urls = parse_page_urls(html, url) or []
+                if urls:
+                    limit = len(urls) if limit is None \
+                        else min(limit, len(urls))
+                    if checkpoint is not None:
+                        checkpoint.set_page_count(cat, len(urls))
+            if not (checkpoint and checkpoint.is_done(cat, page)):
+                products, duplicates = dedup_rows(
+                    cards_to_rows(cards), index, cat)
+                emit_products(products, products_main, sink,
+                              checkpoint, (cat, page))
+                log_page(products, time.perf_counter() - start,
+                         duplicates=duplicates)
+            # по известным адресам страниц обработанные пропускаются
+            page = max(page + 1, first) if urls else page + 1
+            if urls:
+                if page >= len(urls):
+                    break
+                url = urls[page]
+                continue
+            url = parse_next_page_url(html, url)
+            if url is None:
+                logger.debug('next page dosnt exist')
+                if checkpoint is not None:
+                    checkpoint.set_page_count(cat, page)
+                break
+    logger.info(f'pages loaded by browser: {fetcher.fallbacks}')
+    session.close()
+    if close:
+        close_driver(driver)
+        logger.debug('close driver')
+    return products_main
+
+
+@handle_exceptions
+def parse_products_async(driver: uc.Chrome,
+                         categories: list,
+                         pages: int | None = None,
+                         proxy: bool = True,
+                         sink: Sink | None = None,
+                         checkpoint: Checkpoint | None = None,
+                         close: bool = True,
+                         index: ProductIndex | None = None) -> list:
+    '''
+    Функция собирает информацию о товарах, загружая страницы
+    категорий по http параллельно.
+
+    :param driver: веб-драйвер с выбранным адресом доставки.
+    :param categories: list категории товаров для парсинга.
+    :param pages: int кол-во необходимых страниц, None - все страницы.
+    :param proxy: bool использовать proxy server.
+    :param sink: Sink приёмник товаров, см. parse_products.
+    :param checkpoint: Checkpoint контрольная точка, см. parse_products.
+    :param close: bool закрыть браузер по завершении.
+    :param index: ProductIndex индекс товаров, см. parse_products.
+    :return: list список товаров.
+    '''
+    forward = getattr(driver, 'forward_proxy', None) if proxy else None
+    session = session_from_driver(driver, forward.url if forward else None)
+    fetcher = PageFetcher(session, driver, forward)
+    if checkpoint is not None:
+        categories = [cat for cat in categories
+                      if not checkpoint.is_complete(cat, pages)]
+    urls = {category_url(driver, cat, fetcher.fetch): cat
+            for cat in categories}
+    products_main = []
+
+    def is_done(url: str, page: int) -> bool:
+        return checkpoint is not None and checkpoint.is_done(urls[url], page)
+
+    crawler = AsyncCrawler(fetcher)
+
+    async def collect() -> None:
+        async for url, page, cards in crawler.crawl(urls, pages, is_done):
+            products, duplicates = dedup_rows(
+                cards_to_rows(cards), index, urls[url])
+            emit_products(products, products_main, sink,
+                          checkpoint, (urls[url], page))
+            log_page(products, duplicates=duplicates)
+
+    asyncio.run(collect())
+    if checkpoint is not None:
+        for url, count in crawler.page_counts.items():
+            checkpoint.set_page_count(urls[url], count)
+    logger.info(f'pages loaded by browser: {fetcher.fallbacks}')
+    session.close()
+    if close:
+        close_driver(driver)
+        logger.debug('close driver')
+    return products_main
+
+
+def emit_parsed_page(page: tuple, products_main: list,
+                     sink: Sink | None,
+                     checkpoint: Checkpoint | None = None,
+                     index: ProductIndex | None = None) -> None:
+    '''
+    Функция передаёт товары страницы, разобранной в отдельном процессе.
+
+    :param page: tuple (категория, номер страницы, Future результат
+                 parse_page_source).
+    :param products_main: list общий список товаров.
+    :param sink: Sink приёмник товаров или None.
+    :param checkpoint: Checkpoint контрольная точка или None.
+    :param index: ProductIndex индекс товаров или None.
+    '''
+    category, number, future = page
+    products, duplicates = dedup_rows(
+        cards_to_rows(future.result()), index, category)
+    emit_products(products, products_main, sink,
+                  checkpoint, (category, number))
+    log_page(products, duplicates=duplicates)
+
+
 @handle_exceptions
 def parse_products(driver: uc.Chrome,
                    categories: list,
-                   pages: int = 2) -> list:
+                   pages: int | None = None,
+                   mode: str = 'elements',
+                   proxy: bool = True,
+                   sink: Sink | None = None,
+                   checkpoint: Checkpoint | None = None,
+                   close: bool = True,
+                   index: ProductIndex | None = None) -> list:
     '''
     Функция собирает информацию о товарах, представленных на сайте.
 
     :param driver: веб-драйвер для управления браузером.
     :param categories: list категории товаров для парсинга.
-    :param pages: int кол-во необходимых страниц.
-    :return: list список товаров.
+    :param pages: int кол-во необходимых страниц, None - все страницы.
+    :param mode: str способ извлечения товаров (см. extract_products).
+    :param proxy: bool использовать proxy server для http-запросов.
+    :param sink: Sink приёмник товаров: если задан, товары каждой
+                 страницы сразу записываются в него и не накапливаются
+                 в памяти.
+    :param checkpoint: Checkpoint контрольная точка: обработанные
+                       страницы пропускаются, каждая записанная страница
+                       отмечается в ней.
+    :param close: bool закрыть браузер по завершении (False для браузера
+                  из BrowserPool).
+    :param index: ProductIndex индекс товаров запуска: товар, уже
+                  собранный в другой категории, не записывается
+                  повторно, а его категория сохраняется в индексе.
+    :return: list список товаров (пустой, если задан sink).
+
+    Описание:
+        в режиме 'html' браузер только получает page_source, а разбор
+        страниц выполняется в отдельных процессах, пока браузер
+        переходит к следующей странице. В режимах 'http' и 'async'
+        браузер используется только для сессии (см. parse_products_http
+        и parse_products_async).
     '''
+    if mode == 'http':
+        return parse_products_http(driver, categories, pages, proxy,
+                                   sink, checkpoint, close, index)
+    if mode == 'async':
+        return parse_products_async(driver, categories, pages, proxy,
+                                    sink, checkpoint, close, index)
     products_main = []
-    for cat in categories:
-        driver.get(URL_MAIN)
-        xpass_category = f"//div[contains(text(),'{cat}')]"
-        click_element(driver, find_element(driver, 'xpath', xpass_category))
-        logger.debug('find category')
-        driver.implicitly_wait(15)
-        for _ in range(pages):
-            wait = WebDriverWait(driver, timeout=10)
-            cards = wait.until(
-                EC.presence_of_all_elements_located(
-                    (By.CLASS_NAME, 'product.ok-theme'))
-                )
-            logger.debug('find products cards')
-            for prod in cards:
-                lst = []
-                a = prod.find_element(By.TAG_NAME, 'a')
-                lst.append(a.text)
-                lst.append(a.get_attribute('href'))
-                img_url = prod.find_element(By.TAG_NAME, 'img')
-                lst.append(URL_MAIN + img_url.get_attribute('data-src'))
-                el = prod.find_element(By.TAG_NAME, 'script')
-                js_code = driver.execute_script(
-                    "return arguments[0].innerHTML;", el
-                    )
-                category_pattern = r'category: "([^"]+)"'
-                try:
-                    category_match = re.search(category_pattern, js_code)
-                    lst.append(category_match.group(1))
-                except AttributeError:
-                    lst.append('no category')
-                    logger.warning('category not found')
-                div_price = prod.find_element(By.CLASS_NAME, 'product-price')
-                prices = div_price.find_elements(By.TAG_NAME, 'span')
-                full_price = prices[0].get_attribute('textContent')
-                price = prices[1].get_attribute('textContent')
-                lst.append(full_price.strip()[:-2])
-                lst.append(price.strip()[:-2])
-                products_main.append(lst)
-                logger.info('products added to main list')
-            driver = go_next_page(driver)
-            time.sleep(5)
+    parsed_pages = deque()
+    executor = None
+    if mode == 'html':
+        executor = ProcessPoolExecutor(max_workers=PARSER_WORKERS)
+    try:
+        for cat in categories:
+            limit = pages
+            first = 0
+            on_count = None
+            if checkpoint is not None:
+                limit = checkpoint.page_limit(cat, pages)
+                first = checkpoint.next_page(cat, pages)
+                on_count = partial(checkpoint.set_page_count, cat)
+            if limit is not None and first >= limit:
+                continue
+            category_pages = iter_category_pages(
+                driver, cat, None if limit is None else limit - first,
+                first, on_count)
+            for page, cards in category_pages:
+                if checkpoint and checkpoint.is_done(cat, page):
+                    continue
+                if executor is not None:
+                    parsed_pages.append((cat, page, executor.submit(
+                        parse_page_source,
+                        driver.page_source,
+                        driver.current_url)))
+                else:
+                    emit_products(
+                        extract_products(driver, cards, mode, index, cat),
+                        products_main, sink, checkpoint, (cat, page))
+                while parsed_pages and parsed_pages[0][2].done():
+                    emit_parsed_page(parsed_pages.popleft(), products_main,
+                                     sink, checkpoint, index)
+        while parsed_pages:
+            emit_parsed_page(parsed_pages.popleft(), products_main,
+                             sink, checkpoint, index)
+    finally:
+        if executor is not None:
+            executor.shutdown()
     logger.debug('add products in main list')
-    close_driver(driver)
-    logger.debug('close driver')
+    if close:
+        close_driver(driver)
+        logger.debug('close driver')
     return products_main
 
 
+def start_worker(address: str,
+                 headless: bool,
+                 proxy: bool,
+                 block_resources: bool = False,
+                 capture_network: bool = False,
+                 profile: bool = False) -> uc.Chrome:
+    '''
+    Функция создаёт браузер воркера с выбранным адресом доставки.
+
+    :param address: str адрес доставки.
+    :param headless: bool режим без графического отображения.
+    :param proxy: bool использовать proxy server: воркеры берут proxy
+                  с разных мест рейтинга PROXIES.
+    :param block_resources: bool не загружать изображения, шрифты и трекеры.
+    :param capture_network: bool сохранять ответы каталога.
+    :param profile: bool постоянный профиль Chrome слота воркера.
+    :return: веб-драйвер для управления браузером или None, если браузер
+             не запустился или адрес не выбран (браузер при этом
+             закрывается).
+    '''
+    if proxy:
+        proxy = PROXIES.acquire(worker_number()) or False
+    driver = create_webdriver(user_agent=choice(user_agents),
+                              headless=headless,
+                              proxy=proxy,
+                              block_resources=block_resources,
+                              capture_network=capture_network,
+                              profile=profile)
+    if driver is None:
+        return None
+    selected = ensure_delivery_address(driver, address, proxy_key(driver))
+    if selected is None:
+        logger.error('delivery address not selected, close browser')
+        close_driver(driver)
+    return selected
+
+
+def run_task(mode: str, driver: uc.Chrome, task: tuple,
+             dedup: bool = False) -> tuple:
+    '''
+    Функция собирает товары одного задания воркера.
+
+    :param mode: str способ извлечения товаров (см. extract_products).
+    :param driver: веб-драйвер воркера.
+    :param task: tuple (категория, первая страница, последняя страница
+                 или None - до конца категории).
+    :param dedup: bool пропускать товары, уже собранные этим воркером.
+    :return: tuple (list номера обработанных страниц, int кол-во
+             страниц категории или None, если не найдено,
+             list список товаров, list принадлежности пропущенных
+             товаров к категориям).
+    '''
+    category, first, last = task
+    index = getattr(driver, 'product_index', None)
+    if dedup and index is None:
+        index = driver.product_index = ProductIndex()
+    counts = []
+    done = []
+    products = []
+    for page, cards in iter_category_pages(
+            driver, category, None if last is None else last - first,
+            first, counts.append):
+        done.append(page)
+        products.extend(
+            extract_products(driver, cards, mode, index, category))
+    memberships = index.pop_memberships() if index is not None else []
+    return done, counts[-1] if counts else None, products, memberships
+
+
+def plan_tasks(categories: list, pages: int | None,
+               checkpoint: Checkpoint | None = None) -> list:
+    '''
+    Функция делит категории на задания воркеров.
+
+    :param categories: list категории товаров для парсинга.
+    :param pages: int кол-во необходимых страниц, None - все страницы.
+    :param checkpoint: Checkpoint контрольная точка или None.
+    :return: list задания (категория, первая страница, последняя
+             страница не включительно или None - до конца категории).
+
+    Описание:
+        если кол-во страниц известно, категория делится на диапазоны
+        по PAGES_PER_TASK страниц, а обработанные страницы из них
+        исключаются: частично обработанный диапазон делится на части
+        из необработанных страниц, поэтому при продолжении сбора
+        страницы не собираются повторно.
+    '''
+    tasks = []
+    for cat in categories:
+        limit = checkpoint.page_limit(cat, pages) if checkpoint else pages
+        if limit is None:
+            first = checkpoint.next_page(cat, None) if checkpoint else 0
+            tasks.append((cat, first, None))
+            continue
+        for _, first, last in split_tasks([cat], limit, PAGES_PER_TASK):
+            if checkpoint is None:
+                tasks.append((cat, first, last))
+                continue
+            tasks.extend((cat, start, end) for start, end
+                         in checkpoint.undone_ranges(cat, first, last))
+    return tasks
+
+
+@handle_exceptions
+def parse_products_parallel(categories: list,
+                            pages: int | None = None,
+                            mode: str = 'elements',
+                            workers: int | None = None,
+                            address: str = ADDRESS,
+                            headless: bool = True,
+                            proxy: bool = True,
+                            block_resources: bool = False,
+                            sink: Sink | None = None,
+                            checkpoint: Checkpoint | None = None,
+                            profile: bool = False,
+                            index: ProductIndex | None = None) -> list:
+    '''
+    Функция собирает информацию о товарах несколькими браузерами
+    в отдельных процессах.
+
+    :param categories: list категории товаров для парсинга.
+    :param pages: int кол-во необходимых страниц, None - все страницы.
+    :param mode: str способ извлечения товаров (см. extract_products).
+    :param workers: int кол-во процессов, по умолчанию определяется
+                    по кол-ву ядер и свободной памяти.
+    :param address: str адрес доставки.
+    :param headless: bool режим без графического отображения.
+    :param proxy: bool использовать proxy server.
+    :param block_resources: bool не загружать изображения, шрифты и трекеры.
+    :param sink: Sink приёмник товаров: если задан, товары заданий
+                 записываются в него по мере завершения.
+    :param checkpoint: Checkpoint контрольная точка: обработанные
+                       страницы в задания не включаются (см. plan_tasks).
+    :param profile: bool постоянные профили Chrome, по слоту на воркер.
+    :param index: ProductIndex индекс товаров: воркеры пропускают
+                  повторы до извлечения, а повторы между воркерами
+                  убираются в родительском процессе.
+    :return: list список товаров в порядке категорий и страниц
+             (пустой, если задан sink).
+
+    Описание:
+        каждый процесс создаёт свой браузер и выбирает в нём адрес
+        доставки, затем берёт из общей очереди задания - категорию
+        и диапазон её страниц (по PAGES_PER_TASK). Если кол-во страниц
+        категории неизвестно (pages=None и его нет в контрольной
+        точке), категория обходится одним заданием до конца.
+        Результаты объединяются в родительском процессе.
+    '''
+    tasks = plan_tasks(categories, pages, checkpoint)
+    if not tasks:
+        return []
+    results = {}
+    for number, result in run_pool(
+            tasks,
+            start=partial(start_worker, address, headless, proxy,
+                          block_resources, mode == 'network', profile),
+            run=partial(run_task, mode, dedup=index is not None),
+            stop=close_driver,
+            workers=workers or default_workers()):
+        if result is None:
+            METRICS.inc('errors')
+            logger.error(f'task {tasks[number]} failed')
+            continue
+        done, count, products, memberships = result
+        cat = tasks[number][0]
+        if index is not None:
+            index.record(memberships)
+            products = index.filter_rows(products, cat)
+        if sink is not None:
+            sink.write_rows(products)
+        else:
+            results[number] = products
+        METRICS.inc('pages', len(done))
+        METRICS.inc('products', len(products))
+        if checkpoint is not None:
+            if count is not None:
+                checkpoint.set_page_count(cat, count)
+            durable = sink is None or not sink.pending()
+            for page in done:
+                checkpoint.mark_done(
+                    cat, page, len(products) if page == done[0] else 0,
+                    durable)
+        logger.info(f'task {tasks[number]} done: {len(products)} products')
+    return [row for number in sorted(results) for row in results[number]]
+
+
+def driver_is_healthy(driver: uc.Chrome, delivery_address: str) -> bool:
+    '''
+    Функция проверяет, что браузер отвечает и адрес доставки сохранён.
+
+    :param driver: веб-драйвер для управления браузером.
+    :param delivery_address: str адрес доставки.
+    :return: bool True, если браузер можно выдать следующему заданию
+             (браузер, чей proxy был забанен и заменён, пересоздаётся,
+             чтобы сессия сайта не продолжалась с другого адреса).
+    '''
+    forward = getattr(driver, 'forward_proxy', None)
+    if forward is not None and forward.upstream is not driver.proxy:
+        logger.info(f'proxy {proxy_key(driver)} was rotated, '
+                    'recycle browser')
+        return False
+    try:
+        driver.current_url
+        return address_is_selected(driver, delivery_address)
+    except WebDriverException as e:
+        logger.warning(f'browser is not responding: {e}')
+        return False
+
+
+def create_browser_pool(address: str = ADDRESS,
+                        size: int = POOL_SIZE,
+                        headless: bool = True,
+                        proxy: bool = True,
+                        block_resources: bool = False,
+                        profile: bool = False) -> BrowserPool:
+    '''
+    Функция создаёт и запускает пул браузеров с выбранным адресом.
+
+    :param address: str адрес доставки.
+    :param size: int кол-во браузеров в пуле.
+    :param headless: bool режим без графического отображения.
+    :param proxy: bool использовать proxy server.
+    :param block_resources: bool не загружать изображения, шрифты и трекеры.
+    :param profile: bool постоянные профили Chrome, каждый браузер пула
+                    занимает свой свободный слот.
+    :return: BrowserPool запущенный пул, по завершении его нужно закрыть.
+    '''
+    return BrowserPool(
+        factory=partial(start_worker, address, headless, proxy,
+                        block_resources, profile=profile),
+        size=size,
+        health_check=partial(driver_is_healthy,
+                             delivery_address=address),
+        destroy=close_driver).start()
+
+
+def parse_products_pooled(pool: BrowserPool,
+                          categories: list,
+                          pages: int | None = None,
+                          mode: str = 'elements',
+                          proxy: bool = True,
+                          sink: Sink | None = None,
+                          checkpoint: Checkpoint | None = None) -> list:
+    '''
+    Функция собирает товары браузером из пула, не закрывая его.
+
+    :param pool: BrowserPool пул браузеров (см. create_browser_pool).
+    :param categories: list категории товаров для парсинга.
+    :param pages: int кол-во необходимых страниц, None - все страницы.
+    :param mode: str способ извлечения товаров (см. extract_products),
+                 кроме 'network'.
+    :param proxy: bool использовать proxy server для http-запросов.
+    :param sink: Sink приёмник товаров, см. parse_products.
+    :param checkpoint: Checkpoint контрольная точка, см. parse_products.
+    :return: list список товаров или None, если сбор завершился ошибкой.
+    '''
+    with pool.lease() as browser:
+        products = parse_products(browser.driver, categories, pages, mode,
+                                  proxy, sink, checkpoint, close=False)
+        browser.pages = getattr(browser.driver, 'pages_loaded', 0)
+        browser.broken = products is None
+    return products
+
+
 @handle_exceptions
 def save_to_csv(products: list) -> None:
     '''
@@ -303,25 +1625,175 @@ def save_to_csv(products: list) -> None:
 
     :param products: list список для записи.
     '''
-    csv_file = 'products.csv'
-    with open(csv_file, mode='w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        writer.writerow(
-            ['Наименование', 'Url_товара', 'Url_изображения', 'Категория',
-             'Полная цена', 'Цена соскидкой']
-            )
-        for row in products:
-            writer.writerow(row)
+    with CsvSink('products.csv') as sink:
+        sink.write_rows(products)
+
+
+def parse_args() -> argparse.Namespace:
+    '''
+    Функция разбирает аргументы командной строки.
+
+    :return: argparse.Namespace аргументы запуска.
+    '''
+    parser = argparse.ArgumentParser(description='Парсер okeydostavka.ru')
+    parser.add_argument(
+        '--mode', default=EXTRACTION_MODE,
+        choices=('elements', 'js', 'html', 'network', 'http', 'async'),
+        help='способ извлечения товаров')
+    parser.add_argument(
+        '--pages', type=int, default=None,
+        help='кол-во страниц в каждой категории, по умолчанию все')
+    parser.add_argument(
+        '--workers', type=int, default=None,
+        help='кол-во браузеров, по умолчанию по кол-ву ядер и памяти')
+    parser.add_argument(
+        '--no-headless', dest='headless', action='store_false',
+        help='показывать окно браузера')
+    parser.add_argument(
+        '--no-proxy', dest='proxy', action='store_false',
+        help='не использовать proxy server')
+    parser.add_argument(
+        '--proxies', default=PROXY_FILE,
+        help='файл со списком proxy servers, по одному в строке')
+    parser.add_argument(
+        '--block-resources', action='store_true',
+        help='не загружать изображения, шрифты, медиа и трекеры')
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='постоянный профиль Chrome с дисковым кэшем статики '
+             '(profiles/, по слоту на воркер)')
+    parser.add_argument(
+        '--refresh-categories', action='store_true',
+        help='заново построить карту категорий с главной страницы')
+    parser.add_argument(
+        '--no-dedup', dest='dedup', action='store_false',
+        help='записывать товар в каждой категории, где он встречен')
+    parser.add_argument(
+        '--memberships', default=MEMBERSHIP_FILE,
+        help='csv файл с категориями повторно встреченных товаров')
+    parser.add_argument(
+        '--output', default='products.csv',
+        help='csv файл для записи товаров')
+    parser.add_argument(
+        '--sqlite', default=None,
+        help='база SQLite для товаров и истории цен')
+    parser.add_argument(
+        '--parquet', default=None,
+        help='файл Parquet с числовыми ценами (нужен pyarrow)')
+    parser.add_argument(
+        '--checkpoint', default=CHECKPOINT_FILE,
+        help='файл контрольной точки')
+    parser.add_argument(
+        '--resume', action='store_true',
+        help='продолжить прерванный сбор по контрольной точке, '
+             'дописывая результаты в существующие файлы')
+    parser.add_argument(
+        '--log-file', default=LOG_FILE,
+        help='файл журнала, ротируется по размеру')
+    parser.add_argument(
+        '--metrics', default=METRICS_FILE,
+        help='json файл с итогом запуска: счётчики и время этапов')
+    parser.add_argument(
+        '--prometheus', default=PROMETHEUS_FILE,
+        help='textfile с метриками в формате Prometheus')
+    return parser.parse_args()
+
 
+def open_outputs(args: argparse.Namespace) -> tuple:
+    '''
+    Функция открывает контрольную точку, приёмники товаров и индекс
+    товаров запуска.
 
-# создайте webdriver с необходимыми настройками
-browser = create_webdriver(user_agent=USER_AGENT)
+    :param args: argparse.Namespace аргументы запуска (см. parse_args).
+    :return: tuple (Checkpoint контрольная точка, MultiSink приёмник
+             товаров, ProductIndex индекс или None, если дедупликация
+             отключена).
 
-# выберите адрес доставки
-browser = select_delivery_address(browser, ADDRESS)
+    Описание:
+        новый запуск сразу сохраняет пустую контрольную точку. При
+        продолжении сбора из csv удаляются строки страниц, не отмеченных
+        в контрольной точке (например, ждавших записи в Parquet при
+        сбое), и индекс заполняется только оставшимися товарами,
+        поэтому заново собранные страницы попадают во все приёмники.
+    '''
+    if args.resume:
+        checkpoint = Checkpoint.load(args.checkpoint, args.output)
+    else:
+        checkpoint = Checkpoint(args.checkpoint, args.output)
+        checkpoint.save()
+    keep = checkpoint.rows if args.resume and checkpoint.resumed else None
+    sinks = [CsvSink(args.output, append=args.resume, keep=keep)]
+    if args.sqlite:
+        sinks.append(SqliteSink(args.sqlite, ADDRESS))
+    if args.parquet:
+        parquet = args.parquet
+        if args.resume and os.path.exists(parquet):
+            # Parquet не дописывается, продолжение пишется в новый файл
+            root, ext = os.path.splitext(parquet)
+            parquet = f'{root}-{int(time.time())}{ext}'
+        sinks.append(ParquetSink(parquet, ADDRESS))
+    index = None
+    if args.dedup:
+        index = ProductIndex(args.memberships, append=args.resume)
+        if args.resume:
+            index.load_products(args.output)
+    return checkpoint, MultiSink(*sinks), index
+
+
+def main() -> None:
+    '''
+    Функция запускает сбор товаров.
+    '''
+    args = parse_args()
+    listener = setup_logging(args.log_file)
+    workers = args.workers or default_workers()
+    if args.proxy:
+        configure_proxies(args.proxies)
+    if args.refresh_categories:
+        CATEGORY_MAP.invalidate()
+    logger.info(f'run started: mode {args.mode}, pages {args.pages}, '
+                f'workers {workers}')
+    checkpoint, sink, index = open_outputs(args)
+    try:
+        # товары записываются по мере сбора
+        with sink:
+            if workers > 1 and args.mode not in ('http', 'async'):
+                # соберите информацию несколькими браузерами
+                parse_products_parallel(
+                    CATEGORIES, args.pages, args.mode, workers, ADDRESS,
+                    args.headless, args.proxy, args.block_resources,
+                    sink, checkpoint, args.profile, index)
+                return
+
+            # создайте webdriver с необходимыми настройками
+            browser = create_webdriver(user_agent=USER_AGENT,
+                                       headless=args.headless,
+                                       proxy=args.proxy,
+                                       block_resources=args.block_resources,
+                                       capture_network=args.mode == 'network',
+                                       profile=args.profile)
+
+            # выберите адрес доставки
+            browser = ensure_delivery_address(
+                browser, ADDRESS, proxy_key(browser))
+
+            # соберите информацию
+            parse_products(browser, CATEGORIES, args.pages,
+                           args.mode, args.proxy, sink, checkpoint,
+                           index=index)
+    finally:
+        # страницы, чьи товары sink сохранил при закрытии
+        if not sink.pending():
+            checkpoint.commit()
+        if index is not None:
+            index.close()
+        METRICS.write_json(args.metrics)
+        METRICS.write_prometheus(args.prometheus)
+        logger.info(f'run counters: {METRICS.counters}')
+        if len(PROXIES):
+            logger.info(f'proxies: {PROXIES.summary()}')
+        listener.stop()
 
-# соберите информацию
-prods = parse_products(browser, CATEGORIES)
 
-# сохраните информацию в csv файл
-save_to_csv(prods)
+if __name__ == '__main__':
+    main()
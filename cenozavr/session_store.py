@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import hashlib
+import logging
+
+import undetected_chromedriver as uc
+from selenium.common.exceptions import WebDriverException
+
+
+logger = logging.getLogger(name=__name__)
+
+SESSION_DIR = 'sessions'
+SESSION_TTL = 12 * 60 * 60
+COOKIE_FIELDS = (
+    'name', 'value', 'path', 'domain', 'secure', 'httpOnly', 'expiry',
+    'sameSite'
+)
+
+
+def session_path(address: str, proxy: str | None,
+                 directory: str = SESSION_DIR) -> str:
+    '''
+    Функция определяет файл сохранённой сессии.
+
+    :param address: str адрес доставки.
+    :param proxy: str proxy server, через который получена сессия, или None.
+    :param directory: str папка для файлов сессий.
+    :return: str путь к файлу сессии.
+    '''
+    key = hashlib.sha1(f'{address}|{proxy or "direct"}'.encode()).hexdigest()
+    return os.path.join(directory, f'{key[:16]}.json')
+
+
+def save_session(driver: uc.Chrome, path: str, address: str) -> None:
+    '''
+    Функция сохраняет cookies и localStorage браузера на диск.
+
+    :param driver: веб-драйвер с выбранным адресом доставки.
+    :param path: str путь к файлу сессии.
+    :param address: str адрес доставки.
+    '''
+    state = {
+        'saved_at': time.time(),
+        'address': address,
+        'cookies': driver.get_cookies(),
+        'local_storage': driver.execute_script(
+            'return Object.assign({}, window.localStorage);'),
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # воркеры с тем же адресом и proxy сохраняют сессию одновременно
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(state, file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    logger.info(f'session saved to {path}')
+
+
+def load_session(path: str, ttl: int = SESSION_TTL) -> dict | None:
+    '''
+    Функция загружает сохранённую сессию.
+
+    :param path: str путь к файлу сессии.
+    :param ttl: int срок годности сессии в секундах.
+    :return: dict состояние сессии или None, если файла нет,
+             он повреждён или сессия устарела.
+    '''
+    try:
+        with open(path, encoding='utf-8') as file:
+            state = json.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f'session file {path} is broken: {e}')
+        return None
+    if time.time() - state.get('saved_at', 0) > ttl:
+        logger.info(f'session {path} is stale')
+        return None
+    return state
+
+
+def restore_session(driver: uc.Chrome, state: dict, url: str) -> None:
+    '''
+    Функция переносит сохранённую сессию в браузер.
+
+    :param driver: веб-драйвер для управления браузером.
+    :param state: dict состояние сессии из load_session.
+    :param url: str адрес сайта, для которого сохранена сессия.
+    '''
+    driver.get(url)
+    driver.delete_all_cookies()
+    for cookie in state['cookies']:
+        cookie = {key: value for key, value in cookie.items()
+                  if key in COOKIE_FIELDS}
+        try:
+            driver.add_cookie(cookie)
+        except WebDriverException as e:
+            logger.warning(f'cookie {cookie["name"]} not restored: {e}')
+    driver.execute_script(
+        'for (const [key, value] of Object.entries(arguments[0])) '
+        'window.localStorage.setItem(key, value);',
+        state.get('local_storage') or {})
+    driver.refresh()
+
+
+def drop_session(path: str) -> None:
+    '''
+    Функция удаляет файл сессии, отвергнутой сайтом.
+
+    :param path: str путь к файлу сессии.
+    '''
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,423 @@
+import os
+import re
+import csv
+import time
+import sqlite3
+import logging
+
+from datetime import datetime, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+logger = logging.getLogger(name=__name__)
+
+CSV_HEADER = [
+    'Наименование', 'Url_товара', 'Url_изображения', 'Категория',
+    'Полная цена', 'Цена соскидкой'
+]
+PRODUCT_ID_PATTERN = r'cat_entries/(\d+)/'
+PARQUET_ROW_GROUP = 50_000
+
+SQLITE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS products (
+    product_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    url TEXT,
+    image_url TEXT,
+    category TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS price_observations (
+    product_id INTEGER NOT NULL REFERENCES products (product_id),
+    observed_at REAL NOT NULL,
+    full_price INTEGER,
+    price INTEGER,
+    address TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_products_category
+    ON products (category);
+CREATE INDEX IF NOT EXISTS idx_observations_product_time
+    ON price_observations (product_id, observed_at);
+CREATE INDEX IF NOT EXISTS idx_observations_time
+    ON price_observations (observed_at);
+'''
+UPSERT_PRODUCT = '''
+INSERT INTO products
+    (product_id, name, url, image_url, category, first_seen, last_seen)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (product_id) DO UPDATE SET
+    name = excluded.name,
+    url = excluded.url,
+    image_url = excluded.image_url,
+    category = excluded.category,
+    last_seen = excluded.last_seen
+'''
+INSERT_OBSERVATION = '''
+INSERT INTO price_observations
+    (product_id, observed_at, full_price, price, address)
+VALUES (?, ?, ?, ?, ?)
+'''
+
+
+def product_id(image_url: str) -> int | None:
+    '''
+    Функция определяет постоянный id товара по ссылке на изображение.
+
+    :param image_url: str ссылка вида .../cat_entries/915205/...jpg.
+    :return: int id товара или None.
+    '''
+    match = re.search(PRODUCT_ID_PATTERN, image_url or '')
+    return int(match.group(1)) if match else None
+
+
+def price_to_kopecks(price: str) -> int | None:
+    '''
+    Функция переводит текст цены в копейки.
+
+    :param price: str цена вида '168,99' или '1 299,00'.
+    :return: int цена в копейках или None, если цена не распознана.
+    '''
+    price = re.sub(r'\s', '', price or '').replace(',', '.')
+    try:
+        return round(float(price) * 100)
+    except ValueError:
+        return None
+
+
+class Sink:
+    '''
+    Базовый приёмник товаров.
+
+    Описание:
+        товары передаются постранично методом write_rows, строки имеют
+        формат make_row. Метод pending возвращает кол-во принятых строк,
+        которые ещё не сохранены на диск и пропадут при сбое.
+        Приёмник используется как контекстный менеджер.
+    '''
+
+    def write_rows(self, rows: list) -> None:
+        raise NotImplementedError
+
+    def pending(self) -> int:
+        return 0
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class MultiSink(Sink):
+    '''
+    Запись товаров сразу в несколько приёмников.
+    '''
+
+    def __init__(self, *sinks: Sink):
+        self.sinks = sinks
+
+    def write_rows(self, rows: list) -> None:
+        for sink in self.sinks:
+            sink.write_rows(rows)
+
+    def pending(self) -> int:
+        return max((sink.pending() for sink in self.sinks), default=0)
+
+    def flush(self) -> None:
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
+
+
+class CsvSink(Sink):
+    '''
+    Построчная запись товаров в csv файл.
+
+    Описание:
+        строки записываются по мере сбора, после каждых flush_every
+        страниц файл сбрасывается на диск (flush и fsync), поэтому
+        при сбое теряется не больше flush_every страниц. В режиме
+        append строки дописываются в существующий файл без повторного
+        заголовка; если задан keep, из файла сначала удаляются строки
+        после первых keep (строки страниц, не отмеченных в контрольной
+        точке, которые будут собраны заново).
+    '''
+
+    def __init__(self, path: str = 'products.csv',
+                 append: bool = False,
+                 flush_every: int = 1,
+                 keep: int | None = None):
+        self.path = path
+        self.flush_every = flush_every
+        self.rows = 0
+        self._pages = 0
+        self._pending = 0
+        if append and keep is not None and os.path.exists(path):
+            self._truncate(keep)
+        has_data = append and os.path.exists(path) and os.path.getsize(path)
+        self._file = open(path, mode='a' if append else 'w',
+                          newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        if not has_data:
+            self._writer.writerow(CSV_HEADER)
+
+    def _truncate(self, keep: int) -> None:
+        tmp_path = self.path + '.tmp'
+        dropped = 0
+        with open(self.path, newline='', encoding='utf-8') as source, \
+                open(tmp_path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            # первая строка файла - заголовок
+            for number, row in enumerate(csv.reader(source)):
+                if number <= keep:
+                    writer.writerow(row)
+                else:
+                    dropped += 1
+            file.flush()
+            os.fsync(file.fileno())
+        if not dropped:
+            os.remove(tmp_path)
+            return
+        os.replace(tmp_path, self.path)
+        logger.warning(f'{dropped} rows of unfinished pages removed '
+                       f'from {self.path}')
+
+    def write_rows(self, rows: list) -> None:
+        '''
+        Метод записывает строки одной страницы.
+
+        :param rows: list строки товаров.
+        '''
+        self._writer.writerows(rows)
+        self.rows += len(rows)
+        self._pending += len(rows)
+        self._pages += 1
+        if self._pages % self.flush_every == 0:
+            self.flush()
+
+    def pending(self) -> int:
+        '''
+        Метод возвращает кол-во строк, ещё не сброшенных на диск.
+
+        :return: int кол-во строк.
+        '''
+        return self._pending
+
+    def flush(self) -> None:
+        '''
+        Метод сбрасывает записанные строки на диск.
+        '''
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def close(self) -> None:
+        '''
+        Метод сбрасывает данные на диск и закрывает файл.
+        '''
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        logger.info(f'{self.rows} rows written to {self.path}')
+
+
+class SqliteSink(Sink):
+    '''
+    Запись товаров в базу SQLite с историей цен.
+
+    Описание:
+        таблица products хранит последнее состояние товара с ключом
+        по id из ссылки на изображение (cat_entries/<id>), таблица
+        price_observations - все наблюдения цен в копейках. Строки
+        страницы записываются одной транзакцией, база работает
+        в режиме WAL. Товары без id пропускаются.
+    '''
+
+    def __init__(self, path: str = 'products.sqlite3', address: str = ''):
+        self.path = path
+        self.address = address
+        self.rows = 0
+        self.skipped = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SQLITE_SCHEMA)
+
+    def write_rows(self, rows: list) -> None:
+        '''
+        Метод записывает строки одной страницы одной транзакцией.
+
+        :param rows: list строки товаров.
+        '''
+        observed_at = time.time()
+        products = []
+        observations = []
+        for name, url, image_url, category, full_price, price in rows:
+            pid = product_id(image_url)
+            if pid is None:
+                self.skipped += 1
+                continue
+            products.append((pid, name, url, image_url, category,
+                             observed_at, observed_at))
+            observations.append((pid, observed_at,
+                                 price_to_kopecks(full_price),
+                                 price_to_kopecks(price), self.address))
+        with self._conn:
+            self._conn.executemany(UPSERT_PRODUCT, products)
+            self._conn.executemany(INSERT_OBSERVATION, observations)
+        self.rows += len(observations)
+
+    def close(self) -> None:
+        '''
+        Метод закрывает соединение с базой.
+        '''
+        if self._conn is None:
+            return
+        self._conn.close()
+        self._conn = None
+        logger.info(f'{self.rows} rows written to {self.path}, '
+                    f'{self.skipped} without product id skipped')
+
+
+class ParquetSink(Sink):
+    '''
+    Запись товаров в колоночный файл Parquet.
+
+    Описание:
+        цены записываются целыми копейками, категория и адрес -
+        словарными колонками, время сбора - колонкой timestamp (UTC).
+        Строки накапливаются до PARQUET_ROW_GROUP и записываются
+        со сжатием zstd отдельным закрытым файлом: первый - path,
+        следующие - <имя>.part<N>.parquet. Незакрытый файл Parquet
+        без footer не читается, поэтому каждый файл записывается
+        целиком и атомарно, а строки до записи считаются несохранёнными
+        (pending), и контрольная точка отмечает их страницы только
+        после записи. Все части читаются вместе через
+        pyarrow.parquet.read_table(sink.paths).
+        Требует пакет pyarrow (poetry install -E parquet).
+    '''
+
+    def __init__(self, path: str = 'products.parquet', address: str = '',
+                 row_group: int = PARQUET_ROW_GROUP):
+        if pa is None:
+            raise ImportError('pyarrow is required for parquet output')
+        self.path = path
+        self.address = address
+        self.row_group = row_group
+        self.rows = 0
+        self.paths = []
+        self.schema = pa.schema([
+            ('name', pa.string()),
+            ('url', pa.string()),
+            ('image_url', pa.string()),
+            ('product_id', pa.int64()),
+            ('category', pa.dictionary(pa.int32(), pa.string())),
+            ('full_price', pa.int64()),
+            ('price', pa.int64()),
+            ('scraped_at', pa.timestamp('ms', tz='UTC')),
+            ('address', pa.dictionary(pa.int32(), pa.string())),
+        ])
+        self._buffer = []
+        self._closed = False
+
+    def write_rows(self, rows: list) -> None:
+        '''
+        Метод добавляет строки одной страницы.
+
+        :param rows: list строки товаров.
+        '''
+        scraped_at = datetime.now(timezone.utc)
+        for name, url, image_url, category, full_price, price in rows:
+            self._buffer.append((
+                name, url, image_url, product_id(image_url), category,
+                price_to_kopecks(full_price), price_to_kopecks(price),
+                scraped_at, self.address))
+        if len(self._buffer) >= self.row_group:
+            self.flush()
+
+    def pending(self) -> int:
+        '''
+        Метод возвращает кол-во строк, ещё не записанных в файл.
+
+        :return: int кол-во строк.
+        '''
+        return len(self._buffer)
+
+    def _next_path(self) -> str:
+        if not self.paths:
+            return self.path
+        root, ext = os.path.splitext(self.path)
+        return f'{root}.part{len(self.paths)}{ext}'
+
+    def flush(self) -> None:
+        '''
+        Метод записывает накопленные строки в новый файл.
+        '''
+        if not self._buffer:
+            return
+        columns = list(zip(*self._buffer))
+        table = pa.Table.from_arrays(
+            [pa.array(column).cast(field.type)
+             if pa.types.is_dictionary(field.type)
+             else pa.array(column, type=field.type)
+             for column, field in zip(columns, self.schema)],
+            schema=self.schema)
+        self._write(table)
+        self.rows += len(self._buffer)
+        self._buffer = []
+
+    def _write(self, table) -> None:
+        path = self._next_path()
+        tmp_path = path + '.tmp'
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+        self.paths.append(path)
+
+    def close(self) -> None:
+        '''
+        Метод записывает остаток строк; если строк не было,
+        записывается пустой файл со схемой.
+        '''
+        if self._closed:
+            return
+        self.flush()
+        if not self.paths:
+            self._write(self.schema.empty_table())
+        self._closed = True
+        logger.info(f'{self.rows} rows written to {self.path} '
+                    f'({len(self.paths)} files)')
+
+
+def price_history(path: str, pid: int, days: int = 90) -> list:
+    '''
+    Функция возвращает историю цены товара.
+
+    :param path: str путь к базе SQLite.
+    :param pid: int id товара.
+    :param days: int глубина истории в днях.
+    :return: list наблюдения вида (время unix, полная цена, цена
+             со скидкой, адрес), цены в копейках.
+    '''
+    since = time.time() - days * 24 * 60 * 60
+    with sqlite3.connect(path) as conn:
+        return conn.execute(
+            'SELECT observed_at, full_price, price, address '
+            'FROM price_observations '
+            'WHERE product_id = ? AND observed_at >= ? '
+            'ORDER BY observed_at', (pid, since)).fetchall()
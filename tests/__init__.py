@@ -0,0 +1,23 @@
+import os
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'tests', 'fixtures')
+
+# модули cenozavr и benchmarks импортируют друг друга как скрипты
+for folder in ('cenozavr', 'benchmarks'):
+    path = os.path.join(ROOT, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def load_fixture(name: str) -> str:
+    '''
+    Функция читает сохранённую страницу или ответ сайта.
+
+    :param name: str имя файла в tests/fixtures.
+    :return: str содержимое файла.
+    '''
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as file:
+        return file.read()
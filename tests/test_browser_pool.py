@@ -0,0 +1,139 @@
+import time
+import unittest
+import itertools
+import threading
+from unittest import mock
+
+import tests  # noqa: F401
+import browser_pool
+from metrics import METRICS
+from browser_pool import BrowserPool
+
+
+class FakeFactory:
+    '''
+    Фабрика нумерованных браузеров, запоминающая закрытые.
+    '''
+
+    def __init__(self, fail: int = 0):
+        self.numbers = itertools.count()
+        self.fail = fail
+        self.destroyed = []
+        self.unhealthy = set()
+        self.lock = threading.Lock()
+
+    def __call__(self) -> int:
+        with self.lock:
+            if self.fail:
+                self.fail -= 1
+                raise RuntimeError('chrome did not start')
+            return next(self.numbers)
+
+    def health_check(self, driver: int) -> bool:
+        if driver == 'raise':
+            raise RuntimeError('no session')
+        return driver not in self.unhealthy
+
+    def destroy(self, driver: int) -> None:
+        self.destroyed.append(driver)
+
+
+def wait_until(condition: callable, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class BrowserPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        METRICS.reset()
+        self.factory = FakeFactory()
+
+    def pool(self, **kwargs) -> BrowserPool:
+        options = {'size': 2, 'health_check': self.factory.health_check,
+                   'destroy': self.factory.destroy}
+        options.update(kwargs)
+        pool = BrowserPool(self.factory, **options).start()
+        self.addCleanup(pool.close)
+        self.assertTrue(wait_until(
+            lambda: pool.stats() == {'idle': options['size'],
+                                     'total': options['size']}))
+        return pool
+
+    def test_lease_reuses_browser(self):
+        pool = self.pool()
+        drivers = set()
+        for _ in range(4):
+            with pool.lease() as browser:
+                browser.pages += 1
+                drivers.add(browser.driver)
+        self.assertEqual(drivers, {0, 1})
+        self.assertEqual(self.factory.destroyed, [])
+        self.assertEqual(pool.stats(), {'idle': 2, 'total': 2})
+
+    def test_recycle_after_max_pages(self):
+        pool = self.pool(size=1, max_pages=3)
+        with pool.lease() as browser:
+            browser.pages = 3
+        self.assertEqual(self.factory.destroyed, [0])
+        with pool.lease(timeout=5) as browser:
+            self.assertEqual(browser.driver, 1)
+        self.assertEqual(METRICS.counters['browsers_recycled'], 1)
+
+    def test_recycle_after_max_age(self):
+        pool = self.pool(size=1, max_age=60)
+        browser = pool.acquire()
+        browser.created -= 120
+        pool.release(browser)
+        self.assertEqual(self.factory.destroyed, [0])
+        self.assertEqual(pool.acquire(timeout=5).driver, 1)
+
+    def test_broken_browser_recycled(self):
+        pool = self.pool(size=1)
+        with self.assertRaises(ValueError):
+            with pool.lease():
+                raise ValueError('page failed')
+        self.assertEqual(self.factory.destroyed, [0])
+        self.assertEqual(pool.acquire(timeout=5).driver, 1)
+
+    def test_failed_health_check_recycled(self):
+        pool = self.pool(size=1)
+        self.factory.unhealthy.add(0)
+        with pool.lease():
+            pass
+        self.assertEqual(self.factory.destroyed, [0])
+        browser = pool.acquire(timeout=5)
+        browser.driver = 'raise'
+        pool.release(browser)
+        self.assertEqual(self.factory.destroyed, [0, 'raise'])
+
+    def test_acquire_timeout(self):
+        pool = self.pool(size=1)
+        browser = pool.acquire()
+        with self.assertRaises(TimeoutError):
+            pool.acquire(timeout=0.05)
+        pool.release(browser)
+        self.assertIs(pool.acquire(timeout=0.05), browser)
+
+    def test_factory_failure_retried(self):
+        self.factory.fail = 1
+        with mock.patch.object(browser_pool, 'REFILL_RETRY', 0.01):
+            pool = self.pool(size=1)
+        self.assertEqual(pool.acquire(timeout=5).driver, 0)
+
+    def test_close(self):
+        pool = self.pool()
+        browser = pool.acquire()
+        pool.close()
+        self.assertEqual(self.factory.destroyed, [1 - browser.driver])
+        with self.assertRaises(RuntimeError):
+            pool.acquire()
+        pool.release(browser)
+        self.assertEqual(sorted(self.factory.destroyed), [0, 1])
+        self.assertEqual(pool.stats(), {'idle': 0, 'total': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+import tests  # noqa: F401
+import scrapper
+from tests import load_fixture
+from mock_server import start_server
+from http_client import PageFetcher
+from categories import (
+    CategoryResolver,
+    build_category_map,
+    build_category_tree
+)
+
+
+URL_MAIN = 'https://www.okeydostavka.ru'
+MSK = URL_MAIN + '/msk/'
+DAIRY = URL_MAIN + '/msk/molochnye-produkty'
+CHEESE = DAIRY + '/syry'
+
+
+class CategoryMapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.categories = build_category_map(
+            load_fixture('home_menu.html'), URL_MAIN + '/')
+
+    def test_menu_links(self):
+        self.assertEqual(self.categories['Товары со скидками'],
+                         URL_MAIN + '/msk/skidki')
+        self.assertEqual(self.categories['Сыры'], CHEESE)
+        # первая ссылка с текстом, ссылки на другие сайты пропускаются
+        self.assertEqual(self.categories['Молоко'], DAIRY + '/moloko')
+        self.assertEqual(self.categories['Бытовая химия'],
+                         URL_MAIN + '/msk/bytovaia-khimiia')
+        self.assertNotIn('', self.categories)
+        self.assertEqual(len(self.categories), 7)
+
+    def test_tree(self):
+        tree = build_category_tree(set(self.categories.values()))
+        self.assertEqual(tree[''], [MSK])
+        self.assertEqual(tree[MSK], [URL_MAIN + '/msk/bytovaia-khimiia',
+                                     DAIRY, URL_MAIN + '/msk/skidki'])
+        self.assertEqual(tree[DAIRY], [DAIRY + '/moloko', CHEESE])
+        self.assertEqual(tree[CHEESE], [CHEESE + '/tverdye'])
+
+
+class CategoryResolverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'cache', 'categories.json')
+        self.resolver = self.new()
+        self.resolver.refresh(load_fixture('home_menu.html'), URL_MAIN)
+
+    def new(self, **kwargs) -> CategoryResolver:
+        kwargs.setdefault('base_url', URL_MAIN)
+        return CategoryResolver(self.path, **kwargs)
+
+    def test_resolve(self):
+        self.assertTrue(self.resolver.fresh())
+        self.assertEqual(self.resolver.resolve('Сыры'), CHEESE)
+        self.assertEqual(self.resolver.resolve('Молочные продукты'), DAIRY)
+        self.assertIsNone(self.resolver.resolve('Хлеб'))
+        self.assertEqual(self.resolver.subcategories(CHEESE),
+                         [CHEESE + '/tverdye'])
+        self.assertEqual(self.resolver.subcategories(URL_MAIN + '/msk/x'),
+                         [])
+
+    def test_saved_map_shared(self):
+        resolver = self.new()
+        self.assertTrue(resolver.fresh())
+        self.assertEqual(resolver.categories, self.resolver.categories)
+        self.assertEqual(resolver.subcategories(DAIRY),
+                         self.resolver.subcategories(DAIRY))
+        self.assertEqual(os.listdir(os.path.dirname(self.path)),
+                         ['categories.json'])
+
+    def test_other_site_ignored(self):
+        resolver = self.new(base_url='http://127.0.0.1:8000')
+        self.assertFalse(resolver.fresh())
+        self.assertIsNone(resolver.resolve('Сыры'))
+
+    def test_stale_map(self):
+        with open(self.path, encoding='utf-8') as file:
+            state = json.load(file)
+        state['saved_at'] = time.time() - 120
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+        resolver = self.new(ttl=60)
+        self.assertFalse(resolver.fresh())
+        self.assertEqual(resolver.resolve('Сыры'), CHEESE)
+
+    def test_broken_file(self):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write('{"categories": ')
+        resolver = self.new()
+        self.assertFalse(resolver.load())
+        self.assertFalse(resolver.fresh())
+
+    def test_add(self):
+        url = CHEESE + '/plavlenye'
+        self.resolver.add('Плавленые сыры', url)
+        resolver = self.new()
+        self.assertEqual(resolver.resolve('Плавленые сыры'), url)
+        self.assertIn(url, resolver.subcategories(CHEESE))
+
+    def test_invalidate(self):
+        self.resolver.invalidate()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(self.resolver.fresh())
+        self.assertIsNone(self.resolver.resolve('Сыры'))
+        self.resolver.invalidate()
+
+
+class CategoryUrlTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = start_server(products=30, per_page=24)
+        cls.url_main = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.resolver = CategoryResolver(
+            os.path.join(self.tmp.name, 'categories.json'),
+            base_url=self.url_main)
+        session = requests.Session()
+        session.trust_env = False
+        self.addCleanup(session.close)
+        self.fetcher = PageFetcher(session)
+        self.pages = []
+        for patch in (
+                mock.patch.object(scrapper, 'CATEGORY_MAP', self.resolver),
+                mock.patch.object(scrapper, 'URL_MAIN', self.url_main)):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def fetch(self, url: str) -> str:
+        self.pages.append(url)
+        return self.fetcher.fetch(url)
+
+    def test_map_built_once(self):
+        driver = mock.Mock()
+        for _ in range(2):
+            url = scrapper.category_url(driver, 'Бытовая химия', self.fetch)
+            self.assertEqual(url, self.url_main + '/msk/bytovaia-khimiia')
+        self.assertEqual(scrapper.category_url(driver, 'Овощи', self.fetch),
+                         self.url_main + '/msk/ovoshchi-i-frukty')
+        self.assertEqual(self.pages, [self.url_main])
+        driver.get.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import json
+import tempfile
+import unittest
+
+import tests  # noqa: F401
+from checkpoint import Checkpoint
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'checkpoint.json')
+        self.checkpoint = Checkpoint(self.path, 'products.csv')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_page_limit(self):
+        checkpoint = self.checkpoint
+        self.assertIsNone(checkpoint.page_limit('Молоко', None))
+        self.assertEqual(checkpoint.page_limit('Молоко', 5), 5)
+        checkpoint.set_page_count('Молоко', 3)
+        self.assertEqual(checkpoint.page_limit('Молоко', None), 3)
+        self.assertEqual(checkpoint.page_limit('Молоко', 5), 3)
+        self.assertEqual(checkpoint.page_limit('Молоко', 2), 2)
+
+    def test_next_page_skips_done_pages(self):
+        checkpoint = self.checkpoint
+        self.assertEqual(checkpoint.next_page('Молоко', None), 0)
+        checkpoint.mark_done('Молоко', 0, 24)
+        checkpoint.mark_done('Молоко', 1, 24)
+        checkpoint.mark_done('Молоко', 3, 24)
+        self.assertEqual(checkpoint.next_page('Молоко', None), 2)
+        self.assertEqual(checkpoint.next_page('Молоко', 1), 1)
+        self.assertFalse(checkpoint.is_complete('Молоко', None))
+        self.assertTrue(checkpoint.is_complete('Молоко', 2))
+
+    def test_complete_by_page_count(self):
+        checkpoint = self.checkpoint
+        checkpoint.set_page_count('Молоко', 2)
+        checkpoint.mark_done('Молоко', 0, 24)
+        self.assertFalse(checkpoint.is_complete('Молоко', None))
+        checkpoint.mark_done('Молоко', 1, 10)
+        self.assertTrue(checkpoint.is_complete('Молоко', None))
+        self.assertEqual(checkpoint.next_page('Молоко', None), 2)
+
+    def test_undone_ranges(self):
+        checkpoint = self.checkpoint
+        for page in (0, 2, 3, 6):
+            checkpoint.mark_done('Молоко', page, 24)
+        self.assertEqual(checkpoint.undone_ranges('Молоко', 0, 8),
+                         [(1, 2), (4, 6), (7, 8)])
+        self.assertEqual(checkpoint.undone_ranges('Молоко', 2, 4), [])
+        self.assertEqual(checkpoint.undone_ranges('Сыр', 0, 3), [(0, 3)])
+
+    def test_pending_marks_wait_for_commit(self):
+        checkpoint = self.checkpoint
+        checkpoint.mark_done('Молоко', 0, 24, durable=False)
+        self.assertFalse(checkpoint.is_done('Молоко', 0))
+        self.assertFalse(os.path.exists(self.path))
+        checkpoint.commit()
+        self.assertTrue(checkpoint.is_done('Молоко', 0))
+        self.assertEqual(checkpoint.rows, 24)
+        self.assertEqual(checkpoint.pending, [])
+
+    def test_save_and_load(self):
+        self.checkpoint.set_page_count('Молоко', 4)
+        self.checkpoint.mark_done('Молоко', 0, 24)
+        self.checkpoint.mark_done('Сыр', 0, 5, durable=False)
+        loaded = Checkpoint.load(self.path, 'products.csv')
+        self.assertEqual(loaded.done, {('Молоко', 0)})
+        self.assertEqual(loaded.rows, 24)
+        self.assertEqual(loaded.page_counts, {'Молоко': 4})
+        with open(self.path, encoding='utf-8') as file:
+            self.assertEqual(json.load(file)['output'], 'products.csv')
+
+    def test_load_missing_file(self):
+        loaded = Checkpoint.load(self.path)
+        self.assertEqual((loaded.done, loaded.rows), (set(), 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
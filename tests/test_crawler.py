@@ -0,0 +1,143 @@
+import asyncio
+import unittest
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import tests  # noqa: F401
+from mock_server import start_server
+from crawler import AsyncCrawler
+from http_client import PageFetcher
+from metrics import METRICS
+from parsers import parse_page_source, parse_page_urls, parse_next_page_url
+
+
+PRODUCTS = 50
+PER_PAGE = 24
+SLUGS = ('bytovaia-khimiia', 'ovoshchi-i-frukty')
+
+
+class MockServerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = start_server(products=PRODUCTS, per_page=PER_PAGE)
+        cls.url_main = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.session = requests.Session()
+        self.session.trust_env = False
+        self.addCleanup(self.session.close)
+        self.fetcher = PageFetcher(self.session)
+
+    def category_url(self, slug: str) -> str:
+        return f'{self.url_main}/msk/{slug}'
+
+    def crawl(self, pages: int | None, is_done: callable = None,
+              slugs: tuple = SLUGS) -> tuple:
+        crawler = AsyncCrawler(self.fetcher, max_concurrency=4, per_host=2)
+
+        async def collect() -> list:
+            return [page async for page in crawler.crawl(
+                [self.category_url(slug) for slug in slugs], pages,
+                is_done)]
+        return asyncio.run(collect()), crawler.page_counts
+
+    def test_pages_of_mock_category(self):
+        url = self.category_url(SLUGS[0])
+        html = self.fetcher.fetch(url)
+        cards = parse_page_source(html, url)
+        self.assertEqual(len(cards), PER_PAGE)
+        self.assertTrue(all(card['href'].startswith(self.url_main)
+                            for card in cards))
+        urls = parse_page_urls(html, url)
+        self.assertEqual(urls, [url, url + '?page=2', url + '?page=3'])
+        self.assertEqual(parse_next_page_url(html, url), urls[1])
+        last = self.fetcher.fetch(urls[-1])
+        self.assertEqual(len(parse_page_source(last, urls[-1])),
+                         PRODUCTS - 2 * PER_PAGE)
+        self.assertIsNone(parse_next_page_url(last, urls[-1]))
+
+    def test_async_crawl_all_pages(self):
+        pages, counts = self.crawl(None)
+        self.assertEqual(counts, {self.category_url(slug): 3
+                                  for slug in SLUGS})
+        self.assertEqual(len(pages), 6)
+        for slug in SLUGS:
+            hrefs = {card['href']
+                     for url, _, cards in pages
+                     if url == self.category_url(slug)
+                     for card in cards}
+            self.assertEqual(len(hrefs), PRODUCTS)
+
+    def test_async_crawl_skips_done_pages(self):
+        done = {(self.category_url(SLUGS[0]), 1)}
+        pages, _ = self.crawl(2, lambda url, page: (url, page) in done)
+        self.assertEqual(sorted((url, page) for url, page, _ in pages), [
+            (self.category_url(SLUGS[0]), 0),
+            (self.category_url(SLUGS[1]), 0),
+            (self.category_url(SLUGS[1]), 1),
+        ])
+
+    def test_failed_category_counted(self):
+        METRICS.reset()
+        pages, counts = self.crawl(None, slugs=(SLUGS[0], 'no-such-slug'))
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(list(counts), [self.category_url(SLUGS[0])])
+        self.assertEqual(METRICS.counters['errors'], 1)
+
+    def test_session_per_thread(self):
+        url = self.category_url(SLUGS[0])
+        sessions = []
+
+        def fetch() -> None:
+            self.fetcher.fetch(url)
+            sessions.append(self.fetcher.thread_session())
+        threads = [threading.Thread(target=fetch) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(session) for session in sessions}), 3)
+        self.assertNotIn(self.session, sessions)
+        for session in sessions:
+            self.assertIs(session.get_adapter(url),
+                          self.session.get_adapter(url))
+
+    def test_browser_cookies_reach_thread_sessions(self):
+        driver = FakeDriver({'address': 'Tverskaya'})
+        fetcher = PageFetcher(self.session, driver)
+        url = self.category_url(SLUGS[0])
+        with ThreadPoolExecutor(max_workers=1) as worker:
+            self.assertIn('Выберите адрес доставки',
+                          worker.submit(fetcher.fetch, url).result())
+            fetcher.fetch(self.url_main + '/missing')
+            self.assertEqual(fetcher.fallbacks, 1)
+            self.assertIn('Tverskaya',
+                          worker.submit(fetcher.fetch, url).result())
+        self.assertIn('Tverskaya', fetcher.fetch(url))
+
+
+class FakeDriver:
+
+    def __init__(self, cookies: dict):
+        self.cookies = cookies
+        self.page_source = ''
+
+    def get(self, url: str) -> None:
+        self.page_source = f'<html>{url}</html>'
+
+    def get_cookies(self) -> list:
+        return [{'name': name, 'value': value, 'domain': '127.0.0.1',
+                 'path': '/'} for name, value in self.cookies.items()]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import time
+import threading
+import unittest
+from unittest import mock
+
+import tests  # noqa: F401
+import scrapper
+from daemon import JobManager, Scraper, validate_job
+
+
+PARAMS = {'address': 'Москва, улица Тверская, 7',
+          'categories': ['Молоко'], 'pages': 1, 'mode': 'js'}
+WAIT = 5
+
+
+class JobManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self.rows = [['Молоко 1 л', '/msk/moloko', '', 'Молоко',
+                      '168,99', '139,99']]
+
+    def run_job(self, **params) -> list | None:
+        self.calls += 1
+        self.release.wait(WAIT)
+        return self.rows
+
+    def test_same_jobs_are_coalesced(self):
+        manager = JobManager(self.run_job, workers=2)
+        self.addCleanup(manager.close)
+        job, created = manager.submit(PARAMS)
+        same, again = manager.submit(dict(PARAMS))
+        other, other_created = manager.submit(dict(PARAMS, pages=2))
+        self.assertTrue(created)
+        self.assertIs(same, job)
+        self.assertFalse(again)
+        self.assertIsNot(other, job)
+        self.assertTrue(other_created)
+        self.release.set()
+        self.assertTrue(job.done.wait(WAIT))
+        self.assertTrue(other.done.wait(WAIT))
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(job.to_dict()['rows'][0]['price'], '139,99')
+
+    def test_result_is_cached_for_ttl(self):
+        self.release.set()
+        manager = JobManager(self.run_job, workers=1, ttl=0.2)
+        self.addCleanup(manager.close)
+        job, _ = manager.submit(PARAMS)
+        self.assertTrue(job.done.wait(WAIT))
+        self.assertIs(manager.submit(PARAMS)[0], job)
+        self.assertIs(manager.get(job.id), job)
+        time.sleep(0.3)
+        self.assertIsNone(manager.get(job.id))
+        new, created = manager.submit(PARAMS)
+        self.assertTrue(created)
+        self.assertIsNot(new, job)
+        self.assertTrue(new.done.wait(WAIT))
+        self.assertEqual(self.calls, 2)
+
+    def test_failed_job_is_not_reused(self):
+        self.release.set()
+        self.rows = None
+        manager = JobManager(self.run_job, workers=1)
+        self.addCleanup(manager.close)
+        job, _ = manager.submit(PARAMS)
+        self.assertTrue(job.done.wait(WAIT))
+        self.assertEqual(job.status, 'failed')
+        new, created = manager.submit(PARAMS)
+        self.assertTrue(created)
+        self.assertTrue(new.done.wait(WAIT))
+
+
+class FakePool:
+
+    def __init__(self, address: str):
+        self.address = address
+        self.closed = False
+
+    def stats(self) -> dict:
+        return {'idle': 0, 'total': 0}
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class ScraperTest(unittest.TestCase):
+
+    def setUp(self):
+        self.created = []
+        self.release = threading.Event()
+        self.release.set()
+
+        def create_pool(address, *args) -> FakePool:
+            self.created.append(FakePool(address))
+            return self.created[-1]
+
+        def run(pool, categories, pages, mode, proxy) -> list:
+            self.release.wait(WAIT)
+            return [pool.address]
+
+        for name, value in (('create_browser_pool', create_pool),
+                            ('parse_products_pooled', run)):
+            patch = mock.patch.object(scrapper, name, value)
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.scraper = Scraper(max_pools=2)
+
+    def test_least_recently_used_pool_is_evicted(self):
+        scraper = self.scraper
+        self.assertEqual(scraper('A', ['Молоко'], 1, 'js'), ['A'])
+        scraper('B', ['Молоко'], 1, 'js')
+        scraper('A', ['Молоко'], 1, 'js')
+        scraper('C', ['Молоко'], 1, 'js')
+        self.assertEqual(list(scraper.pools), ['A', 'C'])
+        self.assertEqual([(pool.address, pool.closed)
+                          for pool in self.created],
+                         [('A', False), ('B', True), ('C', False)])
+
+    def test_busy_pools_are_not_evicted(self):
+        self.release.clear()
+        threads = [threading.Thread(target=self.scraper,
+                                    args=(address, ['Молоко'], 1, 'js'))
+                   for address in ('A', 'B')]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + WAIT
+        while len(self.created) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        with self.assertRaises(RuntimeError):
+            self.scraper('C', ['Молоко'], 1, 'js')
+        self.release.set()
+        for thread in threads:
+            thread.join(WAIT)
+        self.assertEqual(self.scraper('C', ['Молоко'], 1, 'js'), ['C'])
+        self.assertEqual(len(self.scraper.pools), 2)
+
+
+class ValidateJobTest(unittest.TestCase):
+
+    def test_defaults_and_normalization(self):
+        params = validate_job({'address': ' Москва ',
+                               'categories': ['Сыр', 'Молоко', 'Сыр']})
+        self.assertEqual(params['address'], 'Москва')
+        self.assertEqual(params['categories'], ['Молоко', 'Сыр'])
+
+    def test_invalid(self):
+        for params in ({'address': ''}, {'categories': []},
+                       {'pages': 0}, {'pages': '2'}, {'mode': 'fast'}):
+            with self.assertRaises(ValueError):
+                validate_job(params)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import csv
+import tempfile
+import unittest
+
+import tests  # noqa: F401
+from dedup import BloomFilter, ProductIndex
+from sinks import CSV_HEADER
+
+
+IMAGE = '/wcsstore/OKMarketCAS/cat_entries/{0}/{0}_thumbnail.jpg'
+
+
+def make_row(pid: int, category: str = 'Молоко') -> list:
+    return [f'Товар {pid}', f'/msk/product-{pid}', IMAGE.format(pid),
+            category, '100,99', '90,49']
+
+
+class BloomFilterTest(unittest.TestCase):
+
+    def test_add_and_contains(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        self.assertTrue(bloom.add(915205))
+        self.assertFalse(bloom.add(915205))
+        self.assertIn(915205, bloom)
+        self.assertIn('915205', bloom)
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for key in range(1000):
+            bloom.add(key)
+        false_positives = sum(key in bloom for key in range(1000, 11000))
+        self.assertLess(false_positives / 10000, 0.03)
+
+
+class ProductIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.memberships = os.path.join(self.tmp.name, 'memberships.csv')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_memberships(self) -> list:
+        with open(self.memberships, newline='', encoding='utf-8') as file:
+            return list(csv.reader(file))
+
+    def test_duplicates_are_recorded_as_memberships(self):
+        index = ProductIndex()
+        self.assertTrue(index.add(1, 'Молоко'))
+        self.assertFalse(index.add(1, 'Скидки'))
+        self.assertTrue(index.add(None, 'Скидки'))
+        self.assertTrue(index.seen(1))
+        self.assertEqual((len(index), index.duplicates), (1, 1))
+        self.assertEqual(index.pop_memberships(), [(1, 'Скидки')])
+
+    def test_switch_to_bloom(self):
+        index = ProductIndex(threshold=3, capacity=100)
+        for pid in range(3):
+            index.add(pid, 'Молоко')
+        self.assertIsNotNone(index.bloom)
+        self.assertEqual(index.ids, set())
+        self.assertTrue(index.seen(2))
+        self.assertFalse(index.add(0, 'Скидки'))
+        self.assertTrue(index.add(3, 'Молоко'))
+
+    def test_filter_rows_flushes_memberships(self):
+        index = ProductIndex(self.memberships)
+        rows = [make_row(1), make_row(2)]
+        self.assertEqual(index.filter_rows(rows, 'Молоко'), rows)
+        self.assertEqual(
+            index.filter_rows([make_row(2), make_row(3)], 'Скидки'),
+            [make_row(3)])
+        # принадлежности на диске до закрытия индекса
+        self.assertEqual(self.read_memberships(),
+                         [['product_id', 'category'], ['2', 'Скидки']])
+        index.close()
+
+    def test_load_products_on_resume(self):
+        output = os.path.join(self.tmp.name, 'products.csv')
+        with open(output, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(CSV_HEADER)
+            writer.writerows([make_row(1), make_row(2)])
+        with open(self.memberships, 'w', newline='',
+                  encoding='utf-8') as file:
+            file.write('product_id,category\r\n1,Скидки\r\n')
+        index = ProductIndex(self.memberships, append=True)
+        self.assertEqual(index.load_products(output), 2)
+        self.assertEqual(index.load_products(output + '.missing'), 0)
+        self.assertEqual(index.filter_rows([make_row(1), make_row(3)],
+                                           'Сыр'), [make_row(3)])
+        index.close()
+        self.assertEqual(self.read_memberships(),
+                         [['product_id', 'category'], ['1', 'Скидки'],
+                          ['1', 'Сыр']])
+
+
+if __name__ == '__main__':
+    unittest.main()
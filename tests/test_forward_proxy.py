@@ -0,0 +1,205 @@
+import time
+import socket
+import unittest
+import threading
+import socketserver
+
+import requests
+
+import tests  # noqa: F401
+from metrics import METRICS
+from mock_server import start_server
+from forward_proxy import ForwardProxy, proxy_authorization
+from proxy_pool import ProxyPool, parse_proxy
+
+
+class RecordingUpstream(socketserver.ThreadingTCPServer):
+    '''
+    Upstream proxy, который запоминает заголовки запросов и отвечает
+    заданным ответом.
+    '''
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, response: bytes):
+        self.response = response
+        self.heads = []
+        super().__init__(('127.0.0.1', 0), RecordingHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def close(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class RecordingHandler(socketserver.BaseRequestHandler):
+
+    def handle(self) -> None:
+        head = b''
+        while b'\r\n\r\n' not in head:
+            data = self.request.recv(4096)
+            if not data:
+                return
+            head += data
+        self.server.heads.append(head.decode('latin-1'))
+        self.request.sendall(self.server.response)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def requests_done(proxy: ForwardProxy, count: int = 1) -> int:
+    # туннель учитывается после закрытия обоих направлений
+    deadline = time.monotonic() + 5
+    while (proxy.summary()['requests'] < count
+           and time.monotonic() < deadline):
+        time.sleep(0.01)
+    return proxy.summary()['requests']
+
+
+def connect_get(proxy: ForwardProxy, host: str, port: int,
+                path: str) -> tuple:
+    '''
+    Функция открывает туннель CONNECT и выполняет в нём http запрос.
+
+    :return: tuple (ответ на CONNECT, ответ сервера).
+    '''
+    with socket.create_connection((proxy.host, proxy.port), 5) as sock:
+        sock.sendall(f'CONNECT {host}:{port} HTTP/1.1\r\n'
+                     f'Host: {host}:{port}\r\n\r\n'.encode())
+        established = b''
+        while b'\r\n\r\n' not in established:
+            data = sock.recv(4096)
+            if not data:
+                return established.decode('latin-1'), ''
+            established += data
+        sock.sendall(f'GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n'
+                     f'Connection: close\r\n\r\n'.encode())
+        response = b''
+        while data := sock.recv(65536):
+            response += data
+    return established.decode('latin-1'), response.decode()
+
+
+class ForwardProxyTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = start_server(products=30, per_page=24)
+        cls.port = cls.server.server_address[1]
+        cls.url = f'http://127.0.0.1:{cls.port}/msk/bytovaia-khimiia'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        METRICS.reset()
+        self.session = requests.Session()
+        self.session.trust_env = False
+        self.addCleanup(self.session.close)
+
+    def start(self, *args, **kwargs) -> ForwardProxy:
+        proxy = ForwardProxy(*args, pool_size=1, **kwargs).start()
+        self.addCleanup(proxy.stop)
+        return proxy
+
+    def get(self, proxy: ForwardProxy, url: str) -> requests.Response:
+        return self.session.get(url, timeout=5, proxies={'http': proxy.url})
+
+    def upstream(self, response: bytes) -> RecordingUpstream:
+        upstream = RecordingUpstream(response)
+        self.addCleanup(upstream.close)
+        return upstream
+
+    def test_direct_http(self):
+        proxy = self.start()
+        response = self.get(proxy, self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('product ok-theme', response.text)
+        summary = proxy.summary()
+        self.assertEqual(summary['requests'], 1)
+        self.assertGreater(summary['bytes_received'], len(response.text))
+        self.assertEqual(list(summary['hosts']), ['127.0.0.1'])
+        self.assertEqual(METRICS.counters['proxy_bytes_received'],
+                         summary['bytes_received'])
+
+    def test_direct_connect(self):
+        proxy = self.start()
+        established, response = connect_get(
+            proxy, '127.0.0.1', self.port, '/msk/bytovaia-khimiia')
+        self.assertIn('200 Connection established', established)
+        self.assertIn('product ok-theme', response)
+        self.assertEqual(requests_done(proxy), 1)
+
+    def test_upstream_authorization(self):
+        upstream = self.upstream(b'HTTP/1.1 200 OK\r\nContent-Length: 2'
+                                 b'\r\nConnection: close\r\n\r\nok')
+        proxy = self.start(upstream=parse_proxy(
+            f'user:secret@127.0.0.1:{upstream.port}'))
+        response = self.session.get(
+            self.url, timeout=5, proxies={'http': proxy.url},
+            headers={'Proxy-Authorization': 'Basic browser'})
+        self.assertEqual(response.text, 'ok')
+        head = upstream.heads[-1]
+        self.assertTrue(head.startswith(f'GET {self.url} HTTP/1.1\r\n'))
+        self.assertIn(proxy_authorization(proxy.upstream), head)
+        self.assertNotIn('Basic browser', head)
+
+    def test_connect_through_upstream(self):
+        direct = self.start()
+        proxy = self.start(upstream=parse_proxy(f'127.0.0.1:{direct.port}'))
+        established, response = connect_get(
+            proxy, '127.0.0.1', self.port, '/msk/bytovaia-khimiia')
+        self.assertIn('200 Connection established', established)
+        self.assertIn('product ok-theme', response)
+        self.assertEqual(requests_done(direct), 1)
+
+    def test_rejected_upstream_rotated(self):
+        rejecting = self.upstream(
+            b'HTTP/1.1 407 Proxy Authentication Required\r\n'
+            b'Content-Length: 0\r\n\r\n')
+        direct = self.start()
+        bad = parse_proxy(f'127.0.0.1:{rejecting.port}')
+        good = parse_proxy(f'127.0.0.1:{direct.port}')
+        good.latency = 10.0
+        pool = ProxyPool([bad, good])
+        proxy = self.start(pool, bad)
+        established, response = connect_get(
+            proxy, '127.0.0.1', self.port, '/msk/bytovaia-khimiia')
+        self.assertIn('200 Connection established', established)
+        self.assertIn('product ok-theme', response)
+        self.assertTrue(pool.is_banned(bad))
+        self.assertIs(proxy.upstream, good)
+        self.assertEqual(proxy.rotations, 1)
+        self.assertEqual(METRICS.counters['proxy_rotations'], 1)
+
+    def test_dead_upstream_falls_back(self):
+        direct = self.start()
+        dead = parse_proxy(f'127.0.0.1:{free_port()}')
+        good = parse_proxy(f'127.0.0.1:{direct.port}')
+        pool = ProxyPool([dead, good])
+        proxy = self.start(pool, dead)
+        response = self.get(proxy, self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(dead.errors, 0)
+        self.assertEqual(requests_done(direct), 1)
+
+    def test_no_upstream_available(self):
+        proxy = self.start(upstream=parse_proxy(f'127.0.0.1:{free_port()}'))
+        response = self.get(proxy, self.url)
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(proxy.summary()['failures'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+import tests  # noqa: F401
+from metrics import Metrics
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = Metrics(buckets=(0.1, 1))
+        self.metrics.inc('products', 24)
+        self.metrics.observe('open_category', 0.05)
+        self.metrics.observe('open_category', 0.5)
+        self.metrics.observe('open_category', 3)
+
+    def test_prometheus_counters_and_histogram(self):
+        lines = self.metrics.to_prometheus('test').splitlines()
+        self.assertIn('# TYPE test_products_total counter', lines)
+        self.assertIn('test_products_total 24', lines)
+        self.assertIn('test_errors_total 0', lines)
+        self.assertIn('# TYPE test_stage_seconds histogram', lines)
+        label = 'stage="open_category"'
+        self.assertIn(f'test_stage_seconds_bucket{{{label},le="0.1"}} 1',
+                      lines)
+        self.assertIn(f'test_stage_seconds_bucket{{{label},le="1"}} 2',
+                      lines)
+        self.assertIn(f'test_stage_seconds_bucket{{{label},le="+Inf"}} 3',
+                      lines)
+        self.assertIn(f'test_stage_seconds_sum{{{label}}} 3.55', lines)
+        self.assertIn(f'test_stage_seconds_count{{{label}}} 3', lines)
+
+    def test_prometheus_format(self):
+        text = self.metrics.to_prometheus()
+        self.assertTrue(text.endswith('\n'))
+        for line in text.splitlines():
+            if not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                self.assertTrue(name.startswith('cenozavr_'))
+                float(value)
+
+    def test_merge_snapshot(self):
+        other = Metrics(buckets=(0.1, 1))
+        other.merge(self.metrics.snapshot())
+        other.merge(self.metrics.snapshot())
+        summary = other.summary()
+        self.assertEqual(summary['counters']['products'], 48)
+        self.assertEqual(summary['stages']['open_category']['count'], 6)
+        self.assertEqual(summary['stages']['open_category']['max_sec'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
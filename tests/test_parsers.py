@@ -0,0 +1,155 @@
+import unittest
+
+from tests import load_fixture
+from parsers import (
+    parse_page_source,
+    parse_page_urls,
+    parse_next_page_url,
+    parse_catalog_response,
+    cards_signature
+)
+
+
+SITE = 'https://www.okeydostavka.ru'
+CATEGORY_URL = SITE + '/msk/molochnye-produkty'
+OFFSET_URL = SITE + '/msk/ovoshchi?orderBy=2'
+IMAGE = '/wcsstore/OKMarketCAS/cat_entries/{0}/{0}_thumbnail.jpg'
+
+
+class ParsePageSourceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cards = parse_page_source(
+            load_fixture('category_page.html'), CATEGORY_URL)
+
+    def test_card_fields(self):
+        self.assertEqual(len(self.cards), 3)
+        self.assertEqual(self.cards[0], {
+            'name': 'Молоко Parmalat 3,5% 1 л',
+            'href': SITE + '/msk/moloko-parmalat-3-5-1-l',
+            'data_src': IMAGE.format(915205),
+            'category': 'Молочные продукты/Молоко',
+            'full_price': '168,99 ₽',
+            'price': '139,99 ₽',
+        })
+
+    def test_entities_and_spaces_in_prices(self):
+        card = self.cards[1]
+        self.assertEqual(card['name'], 'Сыр «Российский» 200 г')
+        self.assertEqual(card['href'],
+                         SITE + '/msk/skidki/syr-rossiyskiy-200-g')
+        self.assertEqual(card['full_price'], '1 299,00 ₽')
+
+    def test_card_without_discount_script_and_image(self):
+        card = self.cards[2]
+        self.assertEqual(card['href'], SITE + '/msk/kefir-1-l')
+        self.assertEqual(card['data_src'], '')
+        self.assertIsNone(card['category'])
+        self.assertEqual((card['full_price'], card['price']),
+                         ('89,90 ₽', ''))
+
+    def test_page_without_cards(self):
+        self.assertEqual(parse_page_source(
+            load_fixture('category_last_page.html'), CATEGORY_URL), [])
+
+    def test_signature(self):
+        self.assertEqual(cards_signature(self.cards[:1]),
+                         (SITE + '/msk/moloko-parmalat-3-5-1-l',))
+
+
+class PaginationTest(unittest.TestCase):
+
+    def test_page_number_urls(self):
+        urls = parse_page_urls(load_fixture('category_page.html'),
+                               CATEGORY_URL)
+        self.assertEqual(urls, [CATEGORY_URL] + [
+            f'{CATEGORY_URL}?page={page}' for page in range(2, 8)])
+
+    def test_offset_urls(self):
+        urls = parse_page_urls(load_fixture('category_offset.html'),
+                               OFFSET_URL)
+        self.assertEqual(urls, [OFFSET_URL] + [
+            f'{OFFSET_URL}&beginIndex={offset}'
+            for offset in (24, 48, 72, 96)])
+
+    def test_two_pages_with_sort_links(self):
+        url = SITE + '/msk/syry'
+        urls = parse_page_urls(load_fixture('category_two_pages.html'), url)
+        self.assertEqual(urls, [url, url + '?page=2'])
+
+    def test_two_pages_by_offset(self):
+        urls = parse_page_urls(
+            load_fixture('category_offset_two_pages.html'), OFFSET_URL)
+        self.assertEqual(urls, [OFFSET_URL, OFFSET_URL + '&beginIndex=24'])
+
+    def test_page_param_in_page_url(self):
+        url = SITE + '/msk/syry?page=1'
+        urls = parse_page_urls(load_fixture('category_two_pages.html'), url)
+        self.assertEqual(urls, [url, SITE + '/msk/syry?page=2'])
+
+    def test_no_paginator(self):
+        html = load_fixture('category_page.html').split(
+            '<div class="pagination">')[0]
+        self.assertIsNone(parse_page_urls(html, CATEGORY_URL))
+
+    def test_next_page_url(self):
+        self.assertEqual(parse_next_page_url(
+            load_fixture('category_page.html'), CATEGORY_URL),
+            CATEGORY_URL + '?page=2')
+
+    def test_next_page_url_inside_arrow(self):
+        self.assertEqual(parse_next_page_url(
+            load_fixture('category_offset.html'), OFFSET_URL),
+            OFFSET_URL + '&beginIndex=24')
+
+    def test_last_page_has_no_next(self):
+        self.assertIsNone(parse_next_page_url(
+            load_fixture('category_last_page.html'),
+            CATEGORY_URL + '?page=7'))
+
+
+class ParseCatalogResponseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cards = parse_catalog_response(
+            SITE + '/api/catalog', 'application/json',
+            load_fixture('catalog.json'))
+
+    def test_json_cards(self):
+        self.assertEqual(len(self.cards), 2)
+        self.assertEqual(self.cards[0], {
+            'name': 'Молоко Parmalat 3,5% 1 л',
+            'href': SITE + '/msk/moloko-parmalat-3-5-1-l',
+            'data_src': IMAGE.format(915205),
+            'category': 'Молочные продукты/Молоко',
+            'full_price': '168,99 ₽',
+            'price': '139,99 ₽',
+            'id': '915205',
+        })
+
+    def test_card_without_url_and_full_price(self):
+        card = self.cards[1]
+        self.assertEqual((card['id'], card['href'], card['data_src']),
+                         ('102030', '', ''))
+        self.assertEqual((card['full_price'], card['price']),
+                         ('999,00 ₽', '999,00 ₽'))
+
+    def test_delivery_slots_are_not_products(self):
+        names = [card['name'] for card in self.cards]
+        self.assertNotIn('Сегодня 18:00-20:00', names)
+
+    def test_json_detected_by_body(self):
+        cards = parse_catalog_response(
+            SITE + '/api/catalog', 'text/plain',
+            load_fixture('catalog.json'))
+        self.assertEqual(cards, self.cards)
+
+    def test_html_response(self):
+        html = load_fixture('category_page.html')
+        self.assertEqual(
+            parse_catalog_response(CATEGORY_URL, 'text/html', html),
+            parse_page_source(html, CATEGORY_URL))
+
+
+if __name__ == '__main__':
+    unittest.main()
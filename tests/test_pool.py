@@ -0,0 +1,43 @@
+import unittest
+import multiprocessing as mp
+
+import tests  # noqa: F401
+from pool import WORKER_PREFIX, run_pool
+
+
+def start_all_but_first():
+    # первый воркер не запускается, как браузер без выбранного адреса
+    if mp.current_process().name == f'{WORKER_PREFIX}0':
+        return None
+    return 'state'
+
+
+def start_never():
+    return None
+
+
+def run(state, task):
+    return [[task, state]]
+
+
+def stop(state):
+    pass
+
+
+class RunPoolTest(unittest.TestCase):
+
+    def test_tasks_done_by_started_workers(self):
+        results = dict(run_pool(list(range(10)), start_all_but_first,
+                                run, stop, workers=4))
+        self.assertEqual(results, {index: [[index, 'state']]
+                                   for index in range(10)})
+
+    def test_no_worker_started(self):
+        results = list(run_pool(list(range(3)), start_never, run, stop,
+                                workers=2))
+        self.assertEqual(sorted(results),
+                         [(0, None), (1, None), (2, None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
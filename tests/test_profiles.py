@@ -0,0 +1,148 @@
+import os
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+import tests  # noqa: F401
+import scrapper
+from metrics import METRICS
+from profiles import (
+    PRUNE_STAMP,
+    SINGLETON_FILES,
+    acquire_profile,
+    dir_size
+)
+
+
+def write_file(path: str, size: int, age: float = 0) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(b'x' * size)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+
+
+class ProfileLockTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_busy_slot_is_skipped(self):
+        first = acquire_profile(0, base=self.base, max_slots=3)
+        second = acquire_profile(0, base=self.base, max_slots=3)
+        self.assertEqual((first.slot, second.slot), (0, 1))
+        self.assertNotEqual(first.path, second.path)
+        first.release()
+        again = acquire_profile(0, base=self.base, max_slots=3)
+        self.assertEqual(again.slot, 0)
+        again.release()
+        second.release()
+
+    def test_slots_wrap_around(self):
+        last = acquire_profile(2, base=self.base, max_slots=3)
+        wrapped = acquire_profile(2, base=self.base, max_slots=3)
+        self.assertEqual((last.slot, wrapped.slot), (2, 0))
+        last.release()
+        wrapped.release()
+
+    def test_all_slots_busy(self):
+        profiles = [acquire_profile(0, base=self.base, max_slots=2)
+                    for _ in range(2)]
+        self.assertIsNone(acquire_profile(0, base=self.base, max_slots=2))
+        for profile in profiles:
+            profile.release()
+            profile.release()
+        profile = acquire_profile(0, base=self.base, max_slots=2)
+        self.assertEqual(profile.slot, 0)
+        profile.release()
+
+    def test_stale_chrome_locks_removed(self):
+        path = os.path.join(self.base, 'slot-0')
+        for name in SINGLETON_FILES:
+            write_file(os.path.join(path, name), 1)
+        profile = acquire_profile(0, base=self.base, max_slots=1)
+        self.assertEqual(profile.path, os.path.abspath(path))
+        for name in SINGLETON_FILES:
+            self.assertFalse(os.path.exists(os.path.join(path, name)))
+        profile.release()
+
+
+class ProfilePruneTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = self.tmp.name
+        self.profile = acquire_profile(0, base=self.base, max_slots=1)
+        self.path = self.profile.path
+        self.cache = os.path.join(self.path, 'Default', 'Cache')
+        METRICS.reset()
+
+    def tearDown(self):
+        self.profile.release()
+        self.tmp.cleanup()
+
+    def test_prune_removes_oldest_cache_files(self):
+        write_file(os.path.join(self.cache, 'old'), 400, age=300)
+        write_file(os.path.join(self.cache, 'mid'), 400, age=200)
+        write_file(os.path.join(self.cache, 'new'), 400, age=100)
+        write_file(os.path.join(self.path, 'Default', 'Cookies'), 400,
+                   age=1000)
+        freed = self.profile.prune(max_bytes=1000)
+        self.assertEqual(freed, 800)
+        self.assertEqual(sorted(os.listdir(self.cache)), ['new'])
+        self.assertTrue(os.path.exists(
+            os.path.join(self.path, 'Default', 'Cookies')))
+        self.assertLessEqual(dir_size(self.path), 1000)
+        self.assertEqual(METRICS.counters['profile_pruned_bytes'], 800)
+
+    def test_prune_within_limit(self):
+        write_file(os.path.join(self.cache, 'file'), 400)
+        self.assertEqual(self.profile.prune(max_bytes=1000), 0)
+        self.assertTrue(os.path.exists(os.path.join(self.cache, 'file')))
+
+    def test_prepare_prunes_once_per_interval(self):
+        write_file(os.path.join(self.cache, 'file'), 400)
+        os.utime(os.path.join(self.path, PRUNE_STAMP))
+        self.profile.prepare(max_bytes=0, interval=60)
+        self.assertTrue(os.path.exists(os.path.join(self.cache, 'file')))
+        stamp = time.time() - 120
+        os.utime(os.path.join(self.path, PRUNE_STAMP), (stamp, stamp))
+        self.profile.prepare(max_bytes=0, interval=60)
+        self.assertFalse(os.path.exists(os.path.join(self.cache, 'file')))
+
+
+class CreateWebdriverProfileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def acquire(self, slot: int):
+        return acquire_profile(slot, base=self.base, max_slots=1)
+
+    def test_slot_released_when_browser_fails(self):
+        error = scrapper.SessionNotCreatedException('no chrome')
+        with mock.patch.object(scrapper, 'acquire_profile', self.acquire), \
+                mock.patch.object(scrapper.uc, 'Chrome',
+                                  side_effect=error):
+            self.assertIsNone(scrapper.create_webdriver(
+                'agent', proxy=False, profile=True))
+        profile = self.acquire(0)
+        self.assertIsNotNone(profile)
+        profile.release()
+
+    def test_error_before_slot_is_not_masked(self):
+        error = OSError('profiles dir is read-only')
+        with mock.patch.object(scrapper, 'acquire_profile',
+                               side_effect=error):
+            with self.assertRaises(OSError):
+                scrapper.create_webdriver('agent', proxy=False,
+                                          profile=True)
@@ -0,0 +1,97 @@
+import os
+import csv
+import argparse
+import tempfile
+import unittest
+
+import tests  # noqa: F401
+from sinks import pa
+from scrapper import dedup_rows, emit_products, make_row, open_outputs
+
+
+IMAGE = '/wcsstore/OKMarketCAS/cat_entries/{0}/{0}_thumbnail.jpg'
+
+
+def page(pids: list, category: str) -> list:
+    return [make_row(f'Товар {pid}', f'/msk/product-{pid}',
+                     IMAGE.format(pid), category, '100,99 ₽', '90,49 ₽')
+            for pid in pids]
+
+
+PAGES = [
+    ('Молоко', 0, page([1, 2, 3], 'Молоко')),
+    ('Молоко', 1, page([4, 5], 'Молоко')),
+    ('Скидки', 0, page([2, 6], 'Скидки')),
+]
+
+
+@unittest.skipIf(pa is None, 'pyarrow is not installed')
+class ResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.args = argparse.Namespace(
+            output=self.path('products.csv'),
+            checkpoint=self.path('checkpoint.json'),
+            memberships=self.path('memberships.csv'),
+            parquet=self.path('products.parquet'),
+            sqlite=None, dedup=True, resume=False)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.tmp.name, name)
+
+    def run_pages(self, pages: list, crash: bool = False):
+        checkpoint, sink, index = open_outputs(self.args)
+        for category, number, rows in pages:
+            if checkpoint.is_done(category, number):
+                continue
+            rows, _ = dedup_rows(rows, index, category)
+            emit_products(rows, [], sink, checkpoint, (category, number))
+        if crash:
+            # строки Parquet остались в памяти, csv уже на диске
+            sink.sinks[0].close()
+            index.close()
+            return checkpoint, None
+        sink.close()
+        if not sink.pending():
+            checkpoint.commit()
+        index.close()
+        return checkpoint, sink.sinks[-1]
+
+    def read_csv(self, name: str) -> list:
+        with open(self.path(name), newline='', encoding='utf-8') as file:
+            return list(csv.reader(file))[1:]
+
+    def test_crash_before_parquet_write(self):
+        import pyarrow.parquet as pq
+        checkpoint, _ = self.run_pages(PAGES, crash=True)
+        self.assertEqual(checkpoint.done, set())
+        self.assertEqual(len(self.read_csv('products.csv')), 6)
+        self.args.resume = True
+        checkpoint, parquet = self.run_pages(PAGES)
+        self.assertEqual(len(checkpoint.done), 3)
+        self.assertEqual(checkpoint.rows, 6)
+        products = self.read_csv('products.csv')
+        self.assertEqual(sorted(row[0] for row in products),
+                         [f'Товар {pid}' for pid in range(1, 7)])
+        table = pq.read_table(parquet.paths)
+        self.assertEqual(sorted(table.column('product_id').to_pylist()),
+                         list(range(1, 7)))
+        self.assertNotIn(['2', 'Молоко'], self.read_csv('memberships.csv'))
+        self.assertIn(['2', 'Скидки'], self.read_csv('memberships.csv'))
+
+    def test_resume_after_committed_pages(self):
+        import pyarrow.parquet as pq
+        self.run_pages(PAGES[:1])
+        self.args.resume = True
+        checkpoint, parquet = self.run_pages(PAGES)
+        self.assertEqual(checkpoint.rows, 6)
+        self.assertEqual(len(self.read_csv('products.csv')), 6)
+        table = pq.read_table(parquet.paths)
+        self.assertEqual(sorted(table.column('product_id').to_pylist()),
+                         [4, 5, 6])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,297 @@
+import unittest
+from unittest import mock
+
+import requests
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException
+)
+
+import tests  # noqa: F401
+import scrapper
+from checkpoint import Checkpoint
+from metrics import METRICS
+from mock_server import start_server
+from parsers import parse_page_source, parse_next_page_url
+from scrapper import (
+    address_matches,
+    handle_exceptions,
+    iter_category_pages,
+    plan_tasks,
+    wait_for_page_change
+)
+
+
+ADDRESS = 'Москва, улица Тверская, 7'
+PRODUCTS = 50
+PER_PAGE = 24
+
+
+class AddressMatchesTest(unittest.TestCase):
+
+    def test_selected_address(self):
+        self.assertTrue(address_matches('ул. Тверская, д. 7', ADDRESS))
+        self.assertTrue(address_matches(
+            'Доставка: Москва, Тверская улица, дом 7', ADDRESS))
+
+    def test_yo_is_e(self):
+        self.assertTrue(address_matches(
+            'ул. Щелковское шоссе, 3', 'Москва, Щёлковское шоссе, 3'))
+
+    def test_other_address(self):
+        self.assertFalse(address_matches('Выберите адрес доставки',
+                                         ADDRESS))
+        self.assertFalse(address_matches('ул. Арбат, 7', ADDRESS))
+
+
+class HandleExceptionsTest(unittest.TestCase):
+
+    def setUp(self):
+        METRICS.reset()
+
+    def test_swallowed_error_counted(self):
+        @handle_exceptions
+        def find():
+            raise NoSuchElementException('no card')
+
+        self.assertIsNone(find())
+        self.assertEqual(METRICS.counters['errors'], 1)
+
+    def test_unexpected_error_counted_once(self):
+        @handle_exceptions
+        def inner():
+            raise KeyError('price')
+
+        @handle_exceptions
+        def middle():
+            return inner()
+
+        @handle_exceptions
+        def outer():
+            return middle()
+
+        with self.assertRaises(KeyError):
+            outer()
+        self.assertEqual(METRICS.counters['errors'], 1)
+
+
+class FakeCard:
+
+    def __init__(self, stale_after: int | None = None):
+        self.stale_after = stale_after
+        self.checks = 0
+
+    def is_enabled(self) -> bool:
+        self.checks += 1
+        if self.stale_after is not None and self.checks > self.stale_after:
+            raise StaleElementReferenceException('card removed')
+        return True
+
+
+class FirstCardDriver:
+    '''
+    Браузер, первая карточка которого меняется по заданному списку.
+    '''
+
+    def __init__(self, firsts: list):
+        self.firsts = list(firsts)
+
+    def execute_script(self, script: str):
+        assert script == scrapper.FIRST_CARD_JS
+        if len(self.firsts) > 1:
+            return self.firsts.pop(0)
+        return self.firsts[0]
+
+
+class WaitForPageChangeTest(unittest.TestCase):
+
+    def setUp(self):
+        METRICS.reset()
+        patch = mock.patch.object(scrapper, 'PAGE_CHANGE_POLL', 0.01)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def wait(self, card: FakeCard, firsts: list,
+             timeout: float = 1) -> bool:
+        return wait_for_page_change(FirstCardDriver(firsts), [card],
+                                    ['/msk/a'], timeout)
+
+    def test_old_card_removed(self):
+        card = FakeCard(stale_after=2)
+        self.assertTrue(self.wait(card, ['/msk/a']))
+        self.assertEqual(card.checks, 3)
+        self.assertEqual(METRICS.stages['page_change']['count'], 1)
+
+    def test_first_product_changed(self):
+        self.assertTrue(self.wait(FakeCard(),
+                                  ['/msk/a', None, '/msk/a', '/msk/b']))
+        self.assertEqual(METRICS.stages['page_change']['count'], 1)
+
+    def test_timeout(self):
+        self.assertFalse(self.wait(FakeCard(), ['/msk/a', None],
+                                   timeout=0.05))
+        self.assertEqual(METRICS.counters['page_change_timeouts'], 1)
+        self.assertNotIn('page_change', METRICS.stages)
+
+
+class PlanTasksTest(unittest.TestCase):
+
+    def test_split_by_pages(self):
+        with mock.patch.object(scrapper, 'PAGES_PER_TASK', 5):
+            self.assertEqual(plan_tasks(['Молоко', 'Сыр'], 7), [
+                ('Молоко', 0, 5), ('Молоко', 5, 7),
+                ('Сыр', 0, 5), ('Сыр', 5, 7)])
+            self.assertEqual(plan_tasks(['Молоко'], None),
+                             [('Молоко', 0, None)])
+
+    def test_resume_skips_done_pages(self):
+        checkpoint = Checkpoint('unused.json')
+        checkpoint.page_counts = {'Молоко': 12, 'Сыр': 3}
+        checkpoint.done = {('Молоко', page) for page in (0, 1, 2, 5, 7)}
+        checkpoint.done |= {('Сыр', 0), ('Сыр', 1), ('Сыр', 2)}
+        with mock.patch.object(scrapper, 'PAGES_PER_TASK', 5):
+            self.assertEqual(plan_tasks(['Молоко', 'Сыр'], None, checkpoint),
+                             [('Молоко', 3, 5), ('Молоко', 6, 7),
+                              ('Молоко', 8, 10), ('Молоко', 10, 12)])
+
+    def test_resume_unknown_page_count(self):
+        checkpoint = Checkpoint('unused.json')
+        checkpoint.done = {('Молоко', 0), ('Молоко', 1)}
+        self.assertEqual(plan_tasks(['Молоко'], None, checkpoint),
+                         [('Молоко', 2, None)])
+
+
+class FakeArrow:
+
+    def __init__(self, driver, url: str):
+        self.driver = driver
+        self.url = url
+
+    def click(self) -> None:
+        self.driver.get(self.url)
+
+
+class FakeDriver:
+    '''
+    Браузер, загружающий страницы mock сервера по http.
+    '''
+
+    def __init__(self, session: requests.Session):
+        self.session = session
+        self.current_url = None
+        self.page_source = ''
+        self.network_monitor = None
+        self.forward_proxy = None
+        self.visits = []
+
+    def get(self, url: str) -> None:
+        self.visits.append(url)
+        self.current_url = url
+        self.page_source = self.session.get(url).text
+
+    def refresh(self) -> None:
+        self.get(self.current_url)
+
+    def cards(self) -> list:
+        return parse_page_source(self.page_source, self.current_url)
+
+    def execute_script(self, script: str, *args):
+        assert script == scrapper.PAGE_SIGNATURE_JS
+        return [card['href'] for card in self.cards()]
+
+    def find_elements(self, by: str, value: str) -> list:
+        url = parse_next_page_url(self.page_source, self.current_url)
+        return [FakeArrow(self, url)] if url else []
+
+
+class IterCategoryPagesTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = start_server(products=PRODUCTS, per_page=PER_PAGE)
+        port = cls.server.server_address[1]
+        cls.url = f'http://127.0.0.1:{port}/msk/bytovaia-khimiia'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        session = requests.Session()
+        session.trust_env = False
+        self.addCleanup(session.close)
+        self.driver = FakeDriver(session)
+        # сколько раз страница с данным адресом не загрузится
+        self.failures = {}
+        self.counts = []
+        patches = [
+            mock.patch.object(scrapper, 'open_category',
+                              lambda driver, category: driver.get(self.url)),
+            mock.patch.object(scrapper, 'wait_for_cards', self.wait_for_cards),
+            mock.patch.object(scrapper, 'wait_for_page_change',
+                              lambda driver, cards, signature: True),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def wait_for_cards(self, driver, navigation=0.0, required=True) -> list:
+        if self.failures.get(driver.current_url):
+            self.failures[driver.current_url] -= 1
+            raise TimeoutException('no cards')
+        return driver.cards()
+
+    def iterate(self, pages=None, skip=0) -> list:
+        return [page for page, _ in iter_category_pages(
+            self.driver, 'Бытовая химия', pages, skip, self.counts.append)]
+
+    def test_all_pages_by_url(self):
+        self.assertEqual(self.iterate(), [0, 1, 2])
+        self.assertEqual(self.counts, [3])
+        self.assertEqual(self.driver.visits, [
+            self.url, self.url + '?page=2', self.url + '?page=3'])
+
+    def test_skip_done_pages(self):
+        self.assertEqual(self.iterate(pages=1, skip=1), [1])
+        self.assertEqual(self.driver.visits,
+                         [self.url, self.url + '?page=2'])
+
+    def test_retry_page(self):
+        retries = METRICS.counters.get('page_retries', 0)
+        self.failures[self.url + '?page=2'] = 1
+        self.assertEqual(self.iterate(), [0, 1, 2])
+        self.assertEqual(METRICS.counters['page_retries'], retries + 1)
+        self.assertEqual(self.driver.visits.count(self.url + '?page=2'), 2)
+
+    def test_stop_without_short_count(self):
+        errors = METRICS.counters['errors']
+        self.failures[self.url + '?page=2'] = 2
+        self.assertEqual(self.iterate(), [0])
+        self.assertEqual(self.counts, [3])
+        self.assertEqual(METRICS.counters['errors'], errors + 1)
+
+    def test_first_page_timeout_is_raised(self):
+        self.failures[self.url] = 1
+        with self.assertRaises(TimeoutException):
+            self.iterate()
+
+    def test_click_mode(self):
+        with mock.patch.object(scrapper, 'parse_page_urls',
+                               lambda html, url: None):
+            self.assertEqual(self.iterate(), [0, 1, 2])
+        self.assertEqual(self.counts, [3])
+
+    def test_click_mode_timeout_stops_category(self):
+        self.failures[self.url + '?page=2'] = 1
+        with mock.patch.object(scrapper, 'parse_page_urls',
+                               lambda html, url: None):
+            self.assertEqual(self.iterate(), [0])
+        self.assertEqual(self.counts, [])
+        self.assertEqual(self.driver.visits,
+                         [self.url, self.url + '?page=2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import tempfile
+import unittest
+import multiprocessing as mp
+
+import tests  # noqa: F401
+from session_store import (
+    drop_session,
+    load_session,
+    restore_session,
+    save_session,
+    session_path
+)
+
+
+ADDRESS = 'Москва, улица Тверская, 7'
+COOKIES = [{'name': 'address', 'value': 'Tverskaya', 'path': '/',
+            'domain': '.okeydostavka.ru', 'secure': True,
+            'httpOnly': False, 'expiry': 2000000000, 'sameSite': 'Lax',
+            'extra': 'dropped'}]
+
+
+class FakeDriver:
+
+    def __init__(self, cookies: list = (), storage: dict | None = None):
+        self.cookies = list(cookies)
+        self.storage = dict(storage or {})
+        self.calls = []
+
+    def get_cookies(self) -> list:
+        return list(self.cookies)
+
+    def get(self, url: str) -> None:
+        self.calls.append(('get', url))
+
+    def delete_all_cookies(self) -> None:
+        self.cookies = []
+
+    def add_cookie(self, cookie: dict) -> None:
+        self.cookies.append(cookie)
+
+    def refresh(self) -> None:
+        self.calls.append(('refresh',))
+
+    def execute_script(self, script: str, *args):
+        if args:
+            self.storage.update(args[0])
+            return None
+        return dict(self.storage)
+
+
+def save_many(path: str, count: int) -> None:
+    driver = FakeDriver(COOKIES, {'address': ADDRESS})
+    for _ in range(count):
+        save_session(driver, path, ADDRESS)
+
+
+class SessionStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = session_path(ADDRESS, '10.0.0.1:8080', self.tmp.name)
+
+    def test_session_path_depends_on_address_and_proxy(self):
+        self.assertEqual(
+            self.path, session_path(ADDRESS, '10.0.0.1:8080', self.tmp.name))
+        self.assertNotEqual(self.path,
+                            session_path(ADDRESS, None, self.tmp.name))
+        self.assertNotEqual(self.path, session_path(
+            'Москва, Арбат, 1', '10.0.0.1:8080', self.tmp.name))
+
+    def test_save_load_restore(self):
+        save_session(FakeDriver(COOKIES, {'address': ADDRESS}),
+                     self.path, ADDRESS)
+        self.assertEqual(os.listdir(self.tmp.name),
+                         [os.path.basename(self.path)])
+        state = load_session(self.path)
+        self.assertEqual(state['address'], ADDRESS)
+        driver = FakeDriver([{'name': 'old', 'value': '1'}])
+        restore_session(driver, state, 'https://www.okeydostavka.ru')
+        self.assertEqual([cookie['name'] for cookie in driver.cookies],
+                         ['address'])
+        self.assertNotIn('extra', driver.cookies[0])
+        self.assertEqual(driver.storage, {'address': ADDRESS})
+        self.assertEqual(driver.calls, [
+            ('get', 'https://www.okeydostavka.ru'), ('refresh',)])
+
+    def test_stale_and_broken_sessions(self):
+        self.assertIsNone(load_session(self.path))
+        save_session(FakeDriver(), self.path, ADDRESS)
+        with open(self.path, encoding='utf-8') as file:
+            state = json.load(file)
+        state['saved_at'] = time.time() - 3600
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+        self.assertIsNone(load_session(self.path, ttl=60))
+        self.assertIsNotNone(load_session(self.path, ttl=7200))
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write('{broken')
+        self.assertIsNone(load_session(self.path))
+        drop_session(self.path)
+        drop_session(self.path)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_parallel_workers_save_same_session(self):
+        processes = [mp.Process(target=save_many, args=(self.path, 50))
+                     for _ in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+        self.assertEqual([process.exitcode for process in processes],
+                         [0, 0, 0])
+        self.assertEqual(load_session(self.path)['address'], ADDRESS)
+        self.assertEqual(os.listdir(self.tmp.name),
+                         [os.path.basename(self.path)])
+
+
+if __name__ == '__main__':
+    unittest.main()
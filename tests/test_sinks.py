@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+
+import tests  # noqa: F401
+from sinks import (
+    CSV_HEADER,
+    CsvSink,
+    MultiSink,
+    ParquetSink,
+    SqliteSink,
+    price_history,
+    price_to_kopecks,
+    product_id,
+    pa
+)
+
+
+IMAGE = '/wcsstore/OKMarketCAS/cat_entries/{0}/{0}_thumbnail.jpg'
+ROWS = [
+    ['Молоко 1 л', '/msk/moloko', IMAGE.format(915205),
+     'Молочные продукты', '168,99', '139,99'],
+    ['Сыр 200 г', '/msk/syr', IMAGE.format(102030),
+     'Молочные продукты', '1 299,00', '999,00'],
+    ['Кефир 1 л', '/msk/kefir', '', 'Молочные продукты', '89,90', ''],
+]
+
+
+class PriceTest(unittest.TestCase):
+
+    def test_price_to_kopecks(self):
+        self.assertEqual(price_to_kopecks('168,99'), 16899)
+        self.assertEqual(price_to_kopecks('1 299,00'), 129900)
+        self.assertEqual(price_to_kopecks('1\xa0299,5'), 129950)
+        self.assertEqual(price_to_kopecks('0,29'), 29)
+        self.assertIsNone(price_to_kopecks(''))
+        self.assertIsNone(price_to_kopecks(None))
+        self.assertIsNone(price_to_kopecks('нет в наличии'))
+
+    def test_product_id(self):
+        self.assertEqual(product_id(IMAGE.format(915205)), 915205)
+        self.assertIsNone(product_id('/img/blank.gif'))
+        self.assertIsNone(product_id(None))
+
+
+class SinkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.tmp.name, name)
+
+    def test_csv_append(self):
+        path = self.path('products.csv')
+        with CsvSink(path, flush_every=2) as sink:
+            sink.write_rows(ROWS[:1])
+            self.assertEqual(sink.pending(), 1)
+            sink.write_rows(ROWS[1:])
+            self.assertEqual(sink.pending(), 0)
+        with CsvSink(path, append=True) as sink:
+            sink.write_rows(ROWS[:1])
+        with open(path, encoding='utf-8') as file:
+            lines = file.read().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(lines[0], ','.join(CSV_HEADER))
+
+    def test_sqlite_price_history(self):
+        path = self.path('products.sqlite3')
+        with SqliteSink(path, address='Москва') as sink:
+            sink.write_rows(ROWS)
+            sink.write_rows(ROWS[:1])
+        self.assertEqual((sink.rows, sink.skipped), (3, 1))
+        history = price_history(path, 915205)
+        self.assertEqual([row[1:] for row in history],
+                         [(16899, 13999, 'Москва')] * 2)
+        self.assertEqual(price_history(path, 1), [])
+
+    @unittest.skipIf(pa is None, 'pyarrow is not installed')
+    def test_parquet_parts_and_pending(self):
+        import pyarrow.parquet as pq
+        path = self.path('products.parquet')
+        csv_sink = CsvSink(self.path('products.csv'), flush_every=100)
+        sink = ParquetSink(path, address='Москва', row_group=4)
+        with MultiSink(csv_sink, sink) as multi:
+            multi.write_rows(ROWS)
+            self.assertEqual(multi.pending(), 3)
+            self.assertEqual(sink.paths, [])
+            multi.write_rows(ROWS)
+            self.assertEqual(sink.pending(), 0)
+            self.assertEqual(sink.paths, [path])
+            multi.write_rows(ROWS[:1])
+            self.assertEqual(multi.pending(), 7)
+        self.assertEqual(sink.paths, [path, self.path(
+            'products.part1.parquet')])
+        table = pq.read_table(sink.paths)
+        self.assertEqual(table.num_rows, 7)
+        self.assertEqual(table.column('product_id').to_pylist()[:3],
+                         [915205, 102030, None])
+        self.assertEqual(table.column('price').to_pylist()[:3],
+                         [13999, 99900, None])
+
+    @unittest.skipIf(pa is None, 'pyarrow is not installed')
+    def test_parquet_empty(self):
+        import pyarrow.parquet as pq
+        path = self.path('products.parquet')
+        ParquetSink(path).close()
+        table = pq.read_table(path)
+        self.assertEqual(table.num_rows, 0)
+        self.assertIn('scraped_at', table.column_names)
+
+
+if __name__ == '__main__':
+    unittest.main()